@@ -1,8 +1,8 @@
-from app import create_app
+from app import app
 import os
 
-# Create app instance for compatibility with gunicorn and tests
-app = create_app()
+# The app object is built once, on first access (see app.get_app); gunicorn
+# serves the same object via "app:app"
 
 if __name__ == "__main__":
     debug_mode = os.getenv("FLASK_DEBUG", "false").lower() == "true"
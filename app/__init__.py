@@ -1,10 +1,11 @@
 import os
 import socket
 import platform
-import psutil
 import logging
+import threading
 import time
 import json
+import tempfile
 from typing import Dict, Any, Optional
 from flask import (
     Flask,
@@ -19,6 +20,8 @@ from flask import (
 )
 from werkzeug.utils import secure_filename
 
+from .passwords import DEFAULT_METHOD as DEFAULT_PASSWORD_METHOD
+
 try:
     from dotenv import load_dotenv
 except Exception:
@@ -27,64 +30,73 @@ except Exception:
         return None
 
 
-# Import CSRFProtect from the specific submodule to avoid importing Recaptcha which
-# transitively imports deprecated Werkzeug APIs (e.g., url_encode in newer Werkzeug)
-try:
-    from flask_wtf.csrf import CSRFProtect
-except Exception:
-    # Provide a minimal stub for environments without flask-wtf (tests, minimal builds)
-    class CSRFProtect:
-        def init_app(self, app):
-            # Provide a simple csrf_token template helper
-            app.jinja_env.globals["csrf_token"] = lambda: ""
-
-            # Basic enforcement for testing: if CSRF is enabled in config, reject POST/PUT/PATCH/DELETE without a token
-            from flask import request, abort
-
-            @app.before_request
-            def _simple_csrf_check():
-                if not app.config.get("WTF_CSRF_ENABLED"):
-                    return None
-                if request.method not in ("POST", "PUT", "PATCH", "DELETE"):
-                    return None
-                token = (
-                    request.headers.get("X-CSRFToken")
-                    or request.form.get("csrf_token")
-                    or request.args.get("csrf_token")
-                )
-                if not token:
-                    # Return 400 to indicate missing CSRF
-                    abort(400)
-
-            return None
-
-
-try:
-    from prometheus_client import (
-        CollectorRegistry,
-        Gauge,
-        generate_latest,
-        CONTENT_TYPE_LATEST,
-    )
-except Exception:
-    # Minimal stubs for environments without prometheus_client (tests, minimal builds)
-    class CollectorRegistry:
-        pass
-
-    class Gauge:
-        def __init__(self, *args, **kwargs):
+def _csrf_protect_class():
+    # Imported on first use: flask_wtf is only needed once an app is built
+    # Import CSRFProtect from the specific submodule to avoid importing Recaptcha which
+    # transitively imports deprecated Werkzeug APIs (e.g., url_encode in newer Werkzeug)
+    try:
+        from flask_wtf.csrf import CSRFProtect
+    except Exception:
+        # Provide a minimal stub for environments without flask-wtf (tests, minimal builds)
+        class CSRFProtect:
+            def init_app(self, app):
+                # Provide a simple csrf_token template helper
+                app.jinja_env.globals["csrf_token"] = lambda: ""
+
+                # Basic enforcement for testing: if CSRF is enabled in config, reject POST/PUT/PATCH/DELETE without a token
+                from flask import request, abort
+
+                @app.before_request
+                def _simple_csrf_check():
+                    if not app.config.get("WTF_CSRF_ENABLED"):
+                        return None
+                    if request.method not in ("POST", "PUT", "PATCH", "DELETE"):
+                        return None
+                    token = (
+                        request.headers.get("X-CSRFToken")
+                        or request.form.get("csrf_token")
+                        or request.args.get("csrf_token")
+                    )
+                    if not token:
+                        # Return 400 to indicate missing CSRF
+                        abort(400)
+
+                return None
+
+    return CSRFProtect
+
+
+def _prometheus():
+    """prometheus_client's (CollectorRegistry, Gauge, generate_latest, CONTENT_TYPE_LATEST).
+
+    Imported when /metrics is first scraped rather than at startup.
+    """
+    try:
+        from prometheus_client import (
+            CollectorRegistry,
+            Gauge,
+            generate_latest,
+            CONTENT_TYPE_LATEST,
+        )
+    except Exception:
+        # Minimal stubs for environments without prometheus_client (tests, minimal builds)
+        class CollectorRegistry:
             pass
 
-        def labels(self, *args, **kwargs):
-            class _G:
-                def set(self, v):
-                    return None
+        class Gauge:
+            def __init__(self, *args, **kwargs):
+                pass
 
-            return _G()
+            def labels(self, *args, **kwargs):
+                class _G:
+                    def set(self, v):
+                        return None
 
-    def generate_latest(reg):
-        # Return a minimal, static metrics payload so tests can validate presence of expected metric names
-        payload = """
+                return _G()
+
+        def generate_latest(reg):
+            # Return a minimal, static metrics payload so tests can validate presence of expected metric names
+            payload = """
 # HELP pidash_cpu_usage CPU usage percent
 # TYPE pidash_cpu_usage gauge
 pidash_cpu_usage 0.0
@@ -98,13 +110,32 @@ pidash_disk_usage 0.0
 # TYPE pidash_memory_rss_bytes gauge
 pidash_memory_rss_bytes 0
 """
-        return payload.encode("utf-8")
+            return payload.encode("utf-8")
+
+        CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+    return CollectorRegistry, Gauge, generate_latest, CONTENT_TYPE_LATEST
 
-    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
 
 load_dotenv()
 
-csrf = CSRFProtect()
+
+def _check_secret_key() -> None:
+    # Fail startup in production when FLASK_SECRET_KEY is not set
+    # Use the environment variable directly to avoid relying on cached values
+    if os.getenv("FLASK_ENV", "").lower() == "production" and not os.getenv(
+        "FLASK_SECRET_KEY"
+    ):
+        raise RuntimeError(
+            "FLASK_SECRET_KEY must be set to a secure value in production"
+        )
+
+
+# Checked on import too, so a misconfigured deployment fails before serving
+_check_secret_key()
+
+# Created with the first app (see _csrf_protect_class)
+csrf = None
 
 from functools import wraps
 from flask import abort, session
@@ -160,6 +191,8 @@ def get_ip_address() -> str:
 
 
 def get_cpu_temp() -> str:
+    import psutil
+
     try:
         if hasattr(psutil, "sensors_temperatures"):
             temps = psutil.sensors_temperatures()
@@ -174,6 +207,8 @@ def get_cpu_temp() -> str:
 
 
 def get_system_stats() -> Dict[str, Any]:
+    import psutil
+
     try:
         cpu_usage = psutil.cpu_percent(interval=0.1)
         cpu_per_core = psutil.cpu_percent(interval=0.1, percpu=True)
@@ -308,6 +343,108 @@ class Config:
     # Retention window for history in seconds (used to cap requests)
     METRICS_HISTORY_SECONDS = int(os.getenv("METRICS_HISTORY_SECONDS", "3600"))
 
+    # Resumable uploads: preferred chunk size (capped by MAX_CONTENT_LENGTH)
+    # and how long an idle upload session is kept before it is discarded
+    UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+    UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", "86400"))
+    # Store identical uploads once: new files with known content become
+    # hardlinks to the existing copy (see app/dedup.py)
+    DEDUP_UPLOADS = os.getenv("DEDUP_UPLOADS", "false").lower() == "true"
+
+    # Login passwords: hash method for new and upgraded hashes (older hashes
+    # are rehashed on the next successful login), and how many checks run
+    # at once / may wait before further logins are turned away with 503
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", DEFAULT_PASSWORD_METHOD)
+    PASSWORD_VERIFY_WORKERS = int(os.getenv("PASSWORD_VERIFY_WORKERS", "2"))
+    PASSWORD_VERIFY_QUEUE = int(os.getenv("PASSWORD_VERIFY_QUEUE", "8"))
+
+    # Folder for derived data (line indexes, thumbnails); not under the storage root
+    CACHE_FOLDER = os.getenv(
+        "CACHE_FOLDER", os.path.join(tempfile.gettempdir(), "pidash-cache")
+    )
+    # File viewer: files above EDITOR_MAX_BYTES are not sent whole by
+    # /api/file and must be paged through /api/view; files above
+    # VIEWER_INDEX_THRESHOLD get a cached line index
+    EDITOR_MAX_BYTES = int(os.getenv("EDITOR_MAX_BYTES", 2 * 1024 * 1024))
+    VIEWER_INDEX_THRESHOLD = int(os.getenv("VIEWER_INDEX_THRESHOLD", 1024 * 1024))
+    VIEWER_MAX_BYTES = int(os.getenv("VIEWER_MAX_BYTES", 64 * 1024))
+    VIEWER_MAX_LINES = int(os.getenv("VIEWER_MAX_LINES", "1000"))
+
+    # Thumbnails: on-disk cache budget (LRU-evicted) and generator threads
+    THUMBNAIL_CACHE_BYTES = int(os.getenv("THUMBNAIL_CACHE_BYTES", 64 * 1024 * 1024))
+    THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+
+    # Log following (/api/tail): poll interval, keepalive and tail size caps
+    TAIL_POLL_INTERVAL = float(os.getenv("TAIL_POLL_INTERVAL", "0.5"))
+    TAIL_HEARTBEAT = float(os.getenv("TAIL_HEARTBEAT", "15"))
+    TAIL_MAX_LINES = int(os.getenv("TAIL_MAX_LINES", "1000"))
+
+    # Background jobs (recursive deletes, cross-filesystem moves, copies):
+    # worker threads per process and how many may wait in the queue
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "64"))
+    # Batch endpoints (/api/batch/*): items per request and threads used
+    # for the quick per-item work (unlink, rename)
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+    BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+    # Response compression: bodies smaller than COMPRESS_MIN_SIZE are sent
+    # as-is; levels are kept low for dynamic responses to spare the CPU
+    # (static files are precompressed once at maximum effort)
+    COMPRESS_ENABLED = os.getenv("COMPRESS_ENABLED", "true").lower() == "true"
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "5"))
+    COMPRESS_BR_QUALITY = int(os.getenv("COMPRESS_BR_QUALITY", "4"))
+
+    # Per-client token buckets shared by all workers, and per-process caps
+    # on concurrent requests, keyed by endpoint or blueprint (see
+    # app/ratelimit.py for the syntax); exceeding either returns 429
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMITS = os.getenv(
+        "RATE_LIMITS",
+        "api_stats=5/s:20, api_stats_history=2/s:10, files.api_list_files=10/s:30, files.download_folder=30/m:5",
+    )
+    CONCURRENCY_LIMITS = os.getenv(
+        "CONCURRENCY_LIMITS",
+        "api_stats=4, files.api_list_files=4, files.download_folder=2, files.api_thumbnail=4",
+    )
+
+    # Fleet view (/fleet): other PiDash nodes to poll, e.g.
+    # "pi2=http://10.0.0.2:5001, http://10.0.0.3:5001", the API key they
+    # expect, per-request timeout and poll intervals (seconds). Pollers stop
+    # after FLEET_IDLE_SECONDS without a viewer
+    FLEET_PEERS = os.getenv("FLEET_PEERS", "")
+    FLEET_API_KEY = os.getenv("FLEET_API_KEY", "")
+    FLEET_TIMEOUT = float(os.getenv("FLEET_TIMEOUT", "3"))
+    FLEET_POLL_INTERVAL = float(os.getenv("FLEET_POLL_INTERVAL", "5"))
+    FLEET_HISTORY_INTERVAL = float(os.getenv("FLEET_HISTORY_INTERVAL", "30"))
+    FLEET_HISTORY_MINUTES = int(os.getenv("FLEET_HISTORY_MINUTES", "5"))
+    FLEET_IDLE_SECONDS = float(os.getenv("FLEET_IDLE_SECONDS", "120"))
+
+    # Threshold alerts evaluated on every sampler tick (see app/alerts.py),
+    # e.g. "cpu_usage > 90 for 5m; disk_usage > 90". Notifications are
+    # posted to ALERT_WEBHOOK_URL and/or appended to ALERT_FILE (JSON lines).
+    # ALERT_HYSTERESIS offsets the resolve threshold of rules without an
+    # explicit "clear"; ALERT_REPEAT_SECONDS > 0 re-notifies firing alerts
+    ALERT_RULES = os.getenv("ALERT_RULES", "")
+    ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL", "")
+    ALERT_FILE = os.getenv("ALERT_FILE", "")
+    ALERT_HYSTERESIS = float(os.getenv("ALERT_HYSTERESIS", "2"))
+    ALERT_REPEAT_SECONDS = float(os.getenv("ALERT_REPEAT_SECONDS", "0"))
+
+    # Disk fill-rate forecasts (see app/forecast.py): comma-separated mount
+    # points, the regression window and the minutes of data needed before a
+    # "time until full" is reported. Empty DISK_FORECAST_MOUNTS disables them
+    DISK_FORECAST_MOUNTS = os.getenv("DISK_FORECAST_MOUNTS", "/")
+    DISK_FORECAST_WINDOW_MINUTES = float(os.getenv("DISK_FORECAST_WINDOW_MINUTES", "360"))
+    DISK_FORECAST_MIN_MINUTES = float(os.getenv("DISK_FORECAST_MIN_MINUTES", "10"))
+
+    # Download offload: "" (serve from Flask, using sendfile when the server
+    # supports it), "x-accel-redirect" (nginx) or "x-sendfile" (Apache/lighttpd)
+    DOWNLOAD_OFFLOAD = os.getenv("DOWNLOAD_OFFLOAD", "")
+    # Internal nginx location that maps to the storage root (x-accel-redirect)
+    DOWNLOAD_OFFLOAD_PREFIX = os.getenv("DOWNLOAD_OFFLOAD_PREFIX", "/protected-files/")
+
 
 def create_app(config_object: object | str | None = None) -> Flask:
     # Ensure templates/static folders reference project's top-level folders
@@ -319,6 +456,10 @@ def create_app(config_object: object | str | None = None) -> Flask:
         else None
     )
     app = Flask(__name__, template_folder=template_dir, static_folder=static_dir)
+    # Stream upload bodies straight to the storage filesystem (see app.uploads)
+    from .uploads import IngestRequest
+
+    app.request_class = IngestRequest
 
     # Load default config then override with provided config object
     app.config.from_object(Config)
@@ -334,16 +475,12 @@ def create_app(config_object: object | str | None = None) -> Flask:
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     )
 
-    # Fail startup in production when FLASK_SECRET_KEY is not set
-    # Use the environment variable directly to avoid relying on cached values
-    if os.getenv("FLASK_ENV", "").lower() == "production" and not os.getenv(
-        "FLASK_SECRET_KEY"
-    ):
-        raise RuntimeError(
-            "FLASK_SECRET_KEY must be set to a secure value in production"
-        )
+    _check_secret_key()
 
     # Initialize CSRF protection
+    global csrf
+    if csrf is None:
+        csrf = _csrf_protect_class()()
     csrf.init_app(app)
 
     # Provide a fallback for Unsupported Media Type (415) specifically for the
@@ -477,6 +614,13 @@ def create_app(config_object: object | str | None = None) -> Flask:
 
     app.register_blueprint(settings_bp)
 
+    # Fleet view aggregating other PiDash nodes (FLEET_PEERS)
+    from .fleet_bp import fleet_bp
+
+    app.register_blueprint(fleet_bp)
+
+    from . import conditional
+
     @app.route("/")
     def index():
         # Determine whether setup/config is present and expose flag to template so the UI can prompt the user
@@ -486,6 +630,7 @@ def create_app(config_object: object | str | None = None) -> Flask:
             setup_cfg = load_setup()
             setup_missing = not bool(setup_cfg)
         except Exception:
+            setup_cfg = {}
             setup_missing = False
 
         # If AUTO_SETUP is enabled, redirect automatically to setup on first run
@@ -501,10 +646,7 @@ def create_app(config_object: object | str | None = None) -> Flask:
         defaults = app.config.get("DEFAULT_QUICK_LINKS", [])
         links_for_render = []
         try:
-            from .setup import load_setup
-
-            saved_cfg = load_setup() or {}
-            saved_links = {l.get("name"): l for l in saved_cfg.get("quick_links", [])}
+            saved_links = {l.get("name"): l for l in setup_cfg.get("quick_links", [])}
         except Exception:
             saved_links = {}
 
@@ -519,17 +661,60 @@ def create_app(config_object: object | str | None = None) -> Flask:
             "index.html", quick_links=links_for_render, setup_missing=setup_missing
         )
 
+    def _sampler_version():
+        """Validator for the sampler's newest sample, and the sample.
+
+        Both are None when the sampler is not running (no recent sample).
+        """
+        from .metrics_buffer import buffer
+
+        seq, sample = buffer.latest()
+        interval = float(app.config.get("METRICS_SAMPLE_INTERVAL", 1))
+        if sample is None or time.time() - sample.get("ts", 0) > 2 * interval + 1:
+            return None, None
+        return f"{buffer.epoch}-{seq}", sample
+
+    def _not_modified(etag):
+        # 304 before any stats are computed or serialised
+        tag = conditional.match(etag) if etag else None
+        if tag is None:
+            return None
+        response = conditional.not_modified(tag)
+        response.vary.add("Accept")
+        return response
+
     @app.route("/api/stats")
     def api_stats():
-        stats = get_system_stats()
-        return jsonify(stats)
+        from .encoding import msgpack_response, wants_msgpack
+
+        binary = wants_msgpack()
+        version, sample = _sampler_version()
+        # Served from the sampler when it runs, so polling costs no extra
+        # measurement and unchanged samples are answered with 304
+        etag = f"s{version}-{'m' if binary else 'j'}" if version else None
+        response = _not_modified(etag)
+        if response is not None:
+            return response
+        stats = sample if sample is not None else get_system_stats()
+        if binary:
+            response = msgpack_response(stats)
+        else:
+            response = jsonify(stats)
+            response.vary.add("Accept")
+        if etag:
+            conditional.validated(response, etag)
+        return response
 
     @app.route("/api/stats/stream")
     def api_stats_stream():
         """Server-Sent Events stream that pushes JSON payloads for system stats.
         - If the optional query param `count` is provided it will send exactly that many events then close (useful for tests).
         - The interval between messages is controlled by the REALTIME_INTERVAL env var (seconds, default 1).
+        - Clients preferring MessagePack (see app/encoding.py) get a stream of concatenated MessagePack maps instead.
         """
+        from .encoding import MSGPACK_MIMETYPE, packb, wants_msgpack
+
+        binary = wants_msgpack()
 
         def event_stream(count: Optional[int] = None):
             sent = 0
@@ -538,8 +723,11 @@ def create_app(config_object: object | str | None = None) -> Flask:
             try:
                 while count is None or sent < count:
                     stats = get_system_stats()
-                    payload = json.dumps(stats)
-                    yield f"data: {payload}\n\n"
+                    if binary:
+                        yield packb(stats)
+                    else:
+                        payload = json.dumps(stats)
+                        yield f"data: {payload}\n\n"
                     sent += 1
                     time.sleep(interval)
             except GeneratorExit:
@@ -553,17 +741,27 @@ def create_app(config_object: object | str | None = None) -> Flask:
         except ValueError:
             count = None
 
-        return Response(event_stream(count), mimetype="text/event-stream")
+        response = Response(
+            event_stream(count), mimetype=MSGPACK_MIMETYPE if binary else "text/event-stream"
+        )
+        response.vary.add("Accept")
+        return response
 
     @app.route("/api/stats/history")
     def api_stats_history():
-        """Return short-term historical metrics as JSON.
+        """Return short-term historical metrics as JSON (or MessagePack, see app/encoding.py).
         Query params:
           - minutes (int): number of minutes of history to return (default 5)
           - step (int): aggregation bucket size in seconds (default 1)
+          - layout (str): "columns" for one array per field instead of one object per sample
+            (always used for MessagePack)
         """
+        from .encoding import columns, msgpack_response, wants_msgpack
         from .metrics_buffer import buffer
 
+        binary = wants_msgpack()
+        layout = "columns" if binary or request.args.get("layout") == "columns" else "rows"
+
         try:
             minutes = int(request.args.get("minutes", "5"))
         except Exception:
@@ -580,8 +778,36 @@ def create_app(config_object: object | str | None = None) -> Flask:
         if minutes > max_minutes:
             minutes = max_minutes
 
+        # The history only changes when the sampler adds a sample
+        version, _sample = _sampler_version()
+        etag = f"h{version}-{minutes}-{step}-{layout}-{'m' if binary else 'j'}" if version else None
+        response = _not_modified(etag)
+        if response is not None:
+            return response
+
         samples = buffer.get_history(minutes=minutes, step=step)
-        return jsonify({"minutes": minutes, "step": step, "samples": samples})
+        if binary:
+            response = msgpack_response({"minutes": minutes, "step": step, "columns": columns(samples)})
+        else:
+            if layout == "columns":
+                response = jsonify({"minutes": minutes, "step": step, "columns": columns(samples)})
+            else:
+                response = jsonify({"minutes": minutes, "step": step, "samples": samples})
+            response.vary.add("Accept")
+        if etag:
+            conditional.validated(response, etag)
+        return response
+
+    @app.route("/api/alerts")
+    def api_alerts():
+        """State of the configured alert rules, as seen by this worker's sampler."""
+        from .alerts import get_engine
+
+        try:
+            engine = get_engine(app.config)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 500
+        return jsonify({"rules": engine.status() if engine is not None else []})
 
     # File routes are registered via the `files_bp` blueprint (see `app/files.py`)
 
@@ -591,6 +817,9 @@ def create_app(config_object: object | str | None = None) -> Flask:
 
     @app.route("/metrics")
     def metrics():
+        import psutil
+
+        CollectorRegistry, Gauge, generate_latest, CONTENT_TYPE_LATEST = _prometheus()
         registry = CollectorRegistry()
         hostname = socket.gethostname()
 
@@ -618,12 +847,33 @@ def create_app(config_object: object | str | None = None) -> Flask:
         cores_g = Gauge(
             "pidash_cpu_cores", "CPU cores", ["hostname"], registry=registry
         )
+        fill_rate_g = Gauge(
+            "pidash_disk_fill_rate_bytes_per_second",
+            "Disk growth rate fitted over recent minutes",
+            ["hostname", "mount"],
+            registry=registry,
+        )
+        until_full_g = Gauge(
+            "pidash_disk_seconds_until_full",
+            "Forecast time until the disk is full (absent when not growing)",
+            ["hostname", "mount"],
+            registry=registry,
+        )
 
         stats = get_system_stats()
         cpu_g.labels(hostname=hostname).set(stats.get("cpu_usage", 0))
         ram_g.labels(hostname=hostname).set(stats.get("ram_usage", 0))
         disk_g.labels(hostname=hostname).set(stats.get("disk_usage", 0))
 
+        from .forecast import get_forecast
+
+        forecast = get_forecast(app.config)
+        for mount, f in (forecast.snapshot() if forecast is not None else {}).items():
+            if f["bytes_per_hour"] is not None:
+                fill_rate_g.labels(hostname=hostname, mount=mount).set(f["bytes_per_hour"] / 3600)
+            if f["seconds_until_full"] is not None:
+                until_full_g.labels(hostname=hostname, mount=mount).set(f["seconds_until_full"])
+
         try:
             p = psutil.Process()
             mem_rss_g.labels(hostname=hostname).set(getattr(p.memory_info(), "rss", 0))
@@ -636,46 +886,126 @@ def create_app(config_object: object | str | None = None) -> Flask:
 
         return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
 
+    # Rate limits and concurrency caps for expensive endpoints
+    from .ratelimit import init_app as init_rate_limits
+
+    init_rate_limits(app)
+
+    # Fingerprinted front-end bundles (asset_url, immutable caching)
+    from .assets import content_security_policy, init_app as init_assets
+
+    init_assets(app)
+    csp = content_security_policy(app)
+
+    # Negotiated gzip/brotli for dynamic responses and precompressed static files
+    from .compression import init_app as init_compression
+
+    init_compression(app)
+
     # Security headers
     @app.after_request
     def set_security_headers(response):
         response.headers.setdefault("X-Content-Type-Options", "nosniff")
         response.headers.setdefault("X-Frame-Options", "DENY")
         response.headers.setdefault("Referrer-Policy", "no-referrer")
-        # A permissive but safe default CSP; adjust as needed for external resources
-        response.headers.setdefault(
-            "Content-Security-Policy",
-            "default-src 'self'; img-src 'self' data: https:; script-src 'self' 'unsafe-inline' https://unpkg.com https://cdn.tailwindcss.com; style-src 'self' 'unsafe-inline' https://fonts.googleapis.com https://cdn.tailwindcss.com;",
-        )
+        # A permissive but safe default CSP; CDN hosts are only allowed while
+        # the self-hosted bundles have not been built (see app/assets.py)
+        response.headers.setdefault("Content-Security-Policy", csp)
         return response
 
     # Start background metrics sampler when enabled and not testing
+    if app.config.get("METRICS_SAMPLER_ENABLED") and not app.config.get("TESTING"):
+        start_sampler(app)
+
+        @app.before_request
+        def _ensure_sampler():
+            # Under `gunicorn --preload` the app (and its sampler) is built in
+            # the master and workers are forked without the thread; each
+            # worker starts its own on its first request
+            if _sampler_pid != os.getpid():
+                start_sampler(app)
+
+    return app
+
+
+_sampler_pid: Optional[int] = None
+_sampler_lock = threading.Lock()
+
+
+def start_sampler(app: Flask) -> bool:
+    """Start the metrics sampler thread unless this process already runs one.
+
+    Keyed by PID: a forked process does not inherit the parent's thread, so
+    a worker that builds the app starts its own here, and a worker forked
+    from a preloaded app starts one on its first request (see create_app).
+    Returns True if a thread was started.
+    """
+    global _sampler_pid
+    with _sampler_lock:
+        if _sampler_pid == os.getpid():
+            return False
+        _sampler_pid = os.getpid()
+    from . import metrics_buffer
+    from .alerts import get_engine
+    from .forecast import get_forecast
+
+    interval = float(app.config.get("METRICS_SAMPLE_INTERVAL", 1))
+    forecast = get_forecast(app.config)
     try:
-        if app.config.get("METRICS_SAMPLER_ENABLED") and not app.config.get("TESTING"):
-            import threading
-            from . import metrics_buffer
-
-            def _sampler():
-                interval = float(app.config.get("METRICS_SAMPLE_INTERVAL", 1))
-                while True:
-                    try:
-                        metrics_buffer.buffer.append_sample(get_system_stats())
-                    except Exception:
-                        logging.getLogger(__name__).exception(
-                            "Error when sampling system stats"
-                        )
-                    time.sleep(interval)
+        alerts = get_engine(app.config)
+    except ValueError:
+        logging.getLogger(__name__).exception("Invalid ALERT_RULES; alerts disabled")
+        alerts = None
 
-            t = threading.Thread(
-                target=_sampler, daemon=True, name="pidash-metrics-sampler"
-            )
-            t.start()
+    def _sampler():
+        while True:
+            try:
+                stats = get_system_stats()
+                if forecast is not None:
+                    # Served with the sample by /api/stats
+                    stats["disk_forecast"] = forecast.observe()
+                metrics_buffer.buffer.append_sample(stats)
+                if alerts is not None:
+                    # Only queues notifications; delivery runs on its own thread
+                    alerts.observe(stats)
+            except Exception:
+                logging.getLogger(__name__).exception(
+                    "Error when sampling system stats"
+                )
+            time.sleep(interval)
+
+    try:
+        threading.Thread(
+            target=_sampler, daemon=True, name="pidash-metrics-sampler"
+        ).start()
     except Exception:
         logging.getLogger(__name__).exception("Failed to start metrics sampler")
+        with _sampler_lock:
+            _sampler_pid = None
+        return False
+    return True
 
-    return app
+
+_default_app: Optional[Flask] = None
+_default_app_lock = threading.Lock()
+
+
+def get_app() -> Flask:
+    """The process-wide app built from the environment (the WSGI entry point)."""
+    global _default_app
+    with _default_app_lock:
+        if _default_app is None:
+            _default_app = create_app()
+        return _default_app
+
+
+def __getattr__(name: str):
+    # `app` is built on first access (e.g. gunicorn's "app:app" or
+    # `from app import app`), not on import, so importing a submodule such as
+    # app.auth does not construct an application
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-# Provide a default app instance for backwards-compatibility (e.g. imports like `from app import app`)
-app = create_app()
-__all__ = ["create_app", "app", "get_system_stats"]
+__all__ = ["create_app", "get_app", "app", "get_system_stats"]
@@ -0,0 +1,411 @@
+"""Threshold alerts evaluated on every metrics sampler tick.
+
+Rules come from ``ALERT_RULES``, separated by ``;``::
+
+    cpu_usage > 90 for 5m; disk_usage > 90; hot: avg(cpu_temp) > 75 for 10m clear 65
+
+- ``metric > 90`` fires as soon as a sample crosses the threshold.
+- ``metric > 90 for 5m`` fires when every sample of the last five minutes
+  crossed it (the window minimum, or maximum for ``<``).
+- ``avg(metric)``, ``min(metric)`` and ``max(metric)`` compare that
+  statistic of the window instead.
+- ``clear <value>`` sets the hysteresis: a firing alert resolves only once
+  the value is back past it. Without it the threshold is offset by
+  ``ALERT_HYSTERESIS``.
+
+Each rule keeps a sliding window with a running sum and monotonic min/max
+deques, so a tick costs O(1) amortised per rule; `MetricsBuffer` is never
+rescanned.
+
+Only state changes are notified (plus a reminder every
+``ALERT_REPEAT_SECONDS`` while firing, if set). Every gunicorn worker runs
+its own sampler, so the engines agree through a small ledger under
+``CACHE_FOLDER/alerts``: a notification is only sent by the worker that
+changes the recorded state. Notifications go through a bounded queue to a
+background thread that posts them to ``ALERT_WEBHOOK_URL`` and/or appends
+them to ``ALERT_FILE`` (JSON lines), so a slow webhook never delays sampling.
+"""
+import json
+import logging
+import os
+import queue
+import re
+import socket
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; the ledger then only dedups within a process
+    fcntl = None
+
+OK = "ok"
+FIRING = "firing"
+RESOLVED = "resolved"
+
+_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600}
+_RULE = re.compile(
+    r"\s*(?:(?P<name>[\w.-]+)\s*:\s*)?"
+    r"(?:(?P<agg>avg|min|max)\(\s*(?P<agg_metric>\w+)\s*\)|(?P<metric>\w+))\s*"
+    r"(?P<op>>=|<=|>|<)\s*(?P<threshold>-?\d+(?:\.\d+)?)"
+    r"(?:\s+for\s+(?P<duration>\d+(?:\.\d+)?)(?P<unit>[smh]?))?"
+    r"(?:\s+clear\s+(?P<clear>-?\d+(?:\.\d+)?))?\s*"
+)
+_OPS: Dict[str, Callable[[float, float], bool]] = {
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
+QUEUE_SIZE = 100
+
+
+class SlidingWindow:
+    """Sum, count, min and max of the samples of the last `duration` seconds."""
+
+    def __init__(self, duration: float):
+        self.duration = float(duration)
+        self._items: Deque[Tuple[float, float]] = deque()
+        self._min: Deque[Tuple[float, float]] = deque()
+        self._max: Deque[Tuple[float, float]] = deque()
+        self.sum = 0.0
+        self.since: Optional[float] = None
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._min.clear()
+        self._max.clear()
+        self.sum = 0.0
+        self.since = None
+
+    def add(self, ts: float, value: float) -> None:
+        if self._items and ts - self._items[-1][0] > self.duration:
+            # A gap longer than the window: nothing left is relevant
+            self.clear()
+        if self.since is None:
+            self.since = ts
+        self._items.append((ts, value))
+        self.sum += value
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((ts, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((ts, value))
+        cutoff = ts - self.duration
+        while self._items and self._items[0][0] <= cutoff:
+            old_ts, old = self._items.popleft()
+            self.sum -= old
+            if self._min[0][0] <= old_ts:
+                self._min.popleft()
+            if self._max[0][0] <= old_ts:
+                self._max.popleft()
+
+    @property
+    def count(self) -> int:
+        return len(self._items)
+
+    def covers(self, ts: float) -> bool:
+        """Whether samples have been seen for (about) the whole window."""
+        return self.since is not None and ts - self.since >= self.duration * 0.95
+
+    def value(self, agg: str) -> Optional[float]:
+        if not self._items:
+            return None
+        if agg == "avg":
+            return self.sum / len(self._items)
+        if agg == "min":
+            return self._min[0][1]
+        return self._max[0][1]
+
+
+class Rule:
+    def __init__(self, expr: str, hysteresis: float = 2.0):
+        m = _RULE.fullmatch(expr)
+        if m is None:
+            raise ValueError(f"Invalid alert rule: {expr!r}")
+        self.expr = " ".join(expr.split())
+        self.metric = m.group("agg_metric") or m.group("metric")
+        self.op = m.group("op")
+        self.threshold = float(m.group("threshold"))
+        self.name = m.group("name") or self.expr
+        duration = float(m.group("duration") or 0) * _UNITS[m.group("unit") or ""]
+        above = self.op in (">", ">=")
+        # "for" without an explicit statistic: every sample in the window
+        self.agg = m.group("agg") or (("min" if above else "max") if duration else None)
+        if m.group("clear") is not None:
+            self.clear = float(m.group("clear"))
+        else:
+            self.clear = self.threshold - hysteresis if above else self.threshold + hysteresis
+        self._fires = _OPS[self.op]
+        self._clears = (lambda v: v < self.clear) if above else (lambda v: v > self.clear)
+        self.window = SlidingWindow(duration) if duration else None
+        self.state = OK
+        self.value: Optional[float] = None
+        self.since: Optional[float] = None
+
+    def observe(self, ts: float, sample_value: float) -> Optional[str]:
+        """Feed one sample; returns FIRING or RESOLVED on a state change."""
+        if self.window is not None:
+            self.window.add(ts, sample_value)
+            if not self.window.covers(ts):
+                self.value = None
+                return None
+            value = self.window.value(self.agg)
+        else:
+            value = sample_value
+        self.value = value
+        if self.state == OK and self._fires(value, self.threshold):
+            self.state, self.since = FIRING, ts
+            return FIRING
+        # Resolve on the current sample (or the average for avg rules), so
+        # a sustained-for rule clears as soon as the metric recovers
+        current = value if self.agg == "avg" else sample_value
+        if self.state == FIRING and self._clears(current):
+            self.state, self.since = OK, ts
+            return RESOLVED
+        return None
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "expr": self.expr,
+            "state": self.state,
+            "value": self.value,
+            "threshold": self.threshold,
+            "clear": self.clear,
+            "since": self.since,
+        }
+
+
+def parse_rules(spec: str, hysteresis: float = 2.0) -> List[Rule]:
+    return [Rule(part, hysteresis) for part in (spec or "").split(";") if part.strip()]
+
+
+def _metric(sample: Dict, name: str) -> Optional[float]:
+    try:
+        return float(sample[name])
+    except (KeyError, TypeError, ValueError):
+        # Missing, or "N/A" (e.g. cpu_temp without a sensor)
+        return None
+
+
+class Ledger:
+    """Alert states shared by the worker processes (one small file per rule).
+
+    Engines with a firing alert refresh its record every few ticks. A
+    "firing" record nobody refreshed for `stale` seconds was left by
+    processes that are gone (e.g. PiDash restarted mid-incident), so it no
+    longer suppresses a new FIRING notification.
+    """
+
+    def __init__(self, directory: str, stale: float = 30.0):
+        self.directory = directory
+        self.stale = float(stale)
+
+    @contextmanager
+    def _record(self, rule: str):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, re.sub(r"[^\w.-]", "_", rule)[:100] + ".json")
+        with open(path, "a+") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            fh.seek(0)
+            try:
+                record = json.loads(fh.read() or "{}")
+            except ValueError:
+                record = {}
+            before = dict(record)
+            yield record
+            if record != before:
+                fh.seek(0)
+                fh.truncate()
+                fh.write(json.dumps(record))
+
+    def claim(self, rule: str, state: str, now: float, repeat: float) -> bool:
+        """Record `state` for `rule`; True if this caller should notify."""
+        with self._record(rule) as record:
+            recorded = record.get("state")
+            if recorded == FIRING and now - record.get("seen", record.get("notified", 0)) > self.stale:
+                recorded = None
+            if recorded == state:
+                if not (state == FIRING and repeat and now - record.get("notified", 0) >= repeat):
+                    record["seen"] = now
+                    return False
+            if state == RESOLVED and recorded in (None, RESOLVED):
+                # Never notified as firing (e.g. fired before a restart)
+                return False
+            record.clear()
+            record.update(state=state, notified=now, seen=now)
+            return True
+
+    def refresh(self, rule: str, now: float) -> None:
+        """Mark a firing `rule` as still firing in a live process."""
+        with self._record(rule) as record:
+            if record.get("state") == FIRING:
+                record["seen"] = now
+
+
+class Notifier:
+    """Delivers alert events from a bounded queue on a background thread."""
+
+    def __init__(self, webhook_url: Optional[str] = None, file_path: Optional[str] = None, timeout: float = 5.0):
+        self.webhook_url = webhook_url
+        self.file_path = file_path
+        self.timeout = float(timeout)
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def send(self, event: Dict) -> bool:
+        """Queue `event` without blocking; False if the queue is full."""
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            logging.getLogger(__name__).warning("Alert queue full; dropped %s", event.get("rule"))
+            return False
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="pidash-alerts")
+                self._thread.start()
+        return True
+
+    def _run(self) -> None:
+        while True:
+            event = self._queue.get()
+            try:
+                self.deliver(event)
+            finally:
+                self._queue.task_done()
+
+    def deliver(self, event: Dict) -> None:
+        line = json.dumps(event)
+        if self.file_path:
+            try:
+                with open(self.file_path, "a") as fh:
+                    if fcntl is not None:
+                        fcntl.flock(fh, fcntl.LOCK_EX)
+                    fh.write(line + "\n")
+            except OSError:
+                logging.getLogger(__name__).exception("Could not write alert to %s", self.file_path)
+        if self.webhook_url:
+            req = urllib.request.Request(
+                self.webhook_url, data=line.encode(), headers={"Content-Type": "application/json"}, method="POST"
+            )
+            for attempt in range(3):
+                try:
+                    with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                        resp.read()
+                    break
+                except Exception:
+                    if attempt == 2:
+                        logging.getLogger(__name__).exception("Could not post alert to %s", self.webhook_url)
+                    else:
+                        time.sleep(2 ** attempt)
+
+    def wait(self) -> None:
+        """Block until queued events are delivered (tests)."""
+        self._queue.join()
+
+
+class AlertEngine:
+    def __init__(self, rules: List[Rule], notifier: Notifier, ledger: Optional[Ledger] = None, repeat: float = 0):
+        self.rules = rules
+        self.notifier = notifier
+        self.ledger = ledger
+        self.repeat = float(repeat)
+        self.host = socket.gethostname()
+        self._notified: Dict[str, float] = {}
+        self._refreshed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, sample: Dict, ts: Optional[float] = None) -> List[Dict]:
+        """Evaluate every rule on one sample; returns the events queued."""
+        ts = time.time() if ts is None else ts
+        events = []
+        with self._lock:
+            for rule in self.rules:
+                value = _metric(sample, rule.metric)
+                if value is None:
+                    continue
+                change = rule.observe(ts, value)
+                state = change
+                if change is None and rule.state == FIRING:
+                    self._refresh(rule.name, ts)
+                if change is None:
+                    # Reminder for a still-firing alert, at most every `repeat`
+                    if not (self.repeat and rule.state == FIRING):
+                        continue
+                    if ts - self._notified.get(rule.name, rule.since or ts) < self.repeat:
+                        continue
+                    state = FIRING
+                self._notified[rule.name] = ts
+                if self.ledger is not None:
+                    self._refreshed[rule.name] = ts
+                    try:
+                        if not self.ledger.claim(rule.name, state, ts, self.repeat):
+                            continue
+                    except OSError:
+                        logging.getLogger(__name__).exception("Alert ledger unavailable")
+                events.append(
+                    {
+                        "rule": rule.name,
+                        "expr": rule.expr,
+                        "state": state,
+                        "metric": rule.metric,
+                        "value": rule.value,
+                        "threshold": rule.threshold,
+                        "host": self.host,
+                        "ts": ts,
+                    }
+                )
+        for event in events:
+            self.notifier.send(event)
+        return events
+
+    def _refresh(self, name: str, ts: float) -> None:
+        # A few times per stale period is enough to keep the record live
+        if self.ledger is None or ts - self._refreshed.get(name, ts) < self.ledger.stale / 3:
+            return
+        self._refreshed[name] = ts
+        try:
+            self.ledger.refresh(name, ts)
+        except OSError:
+            logging.getLogger(__name__).exception("Alert ledger unavailable")
+
+    def status(self) -> List[Dict]:
+        with self._lock:
+            return [rule.to_dict() for rule in self.rules]
+
+
+_engines: Dict[tuple, AlertEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(config) -> Optional[AlertEngine]:
+    """Return the process-wide engine for the ALERT_* settings (None without rules)."""
+    key = (
+        config.get("ALERT_RULES") or "",
+        float(config.get("ALERT_HYSTERESIS", 2.0)),
+        config.get("ALERT_WEBHOOK_URL") or None,
+        config.get("ALERT_FILE") or None,
+        float(config.get("ALERT_REPEAT_SECONDS", 0)),
+        os.path.join(config["CACHE_FOLDER"], "alerts"),
+        float(config.get("METRICS_SAMPLE_INTERVAL", 1)),
+    )
+    if not key[0].strip():
+        return None
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            rules_spec, hysteresis, webhook, file_path, repeat, ledger_dir, interval = key
+            # Records outlive a few missed sampler ticks, not a restart
+            ledger = Ledger(ledger_dir, stale=max(10.0, 5 * interval))
+            engine = AlertEngine(parse_rules(rules_spec, hysteresis), Notifier(webhook, file_path), ledger, repeat)
+            _engines[key] = engine
+        return engine
@@ -0,0 +1,259 @@
+"""Self-hosted, fingerprinted front-end assets.
+
+`build` turns the front-end sources into bundles under ``static/dist`` whose
+file names contain a hash of their content, and records them in
+``static/dist/manifest.json``:
+
+- ``app.css``: ``@font-face`` rules for the Inter font, Tailwind compiled
+  ahead of time from the templates (``assets/build/tailwind.css``, produced
+  by the Tailwind CLI), then ``static/css/styles.css``;
+- ``fonts``: the Inter font files (``assets/build/fonts/inter-<weight>.woff2``),
+  referenced by ``app.css`` and fingerprinted as one folder;
+- ``lucide.js``: the Lucide icon library (``assets/build/lucide.min.js``);
+- ``monaco``: the Monaco editor's ``min/vs`` folder
+  (``assets/build/monaco/vs``); it is loaded as many AMD modules, so the
+  whole folder is fingerprinted by one hash.
+
+``assets/package.json`` pins the npm packages and its ``build`` script
+produces ``assets/build``; the Docker image runs both steps. Run the Python
+step with ``python -m app.assets``. It does not build the application, so it
+writes nothing else (e.g. no cache files owned by the image's build user).
+``flask --app app build-assets`` does the same from an app's CLI.
+
+Templates reference assets with ``asset_url(name)``. Files under
+``static/dist`` never change once written, so they are served with a
+far-future, immutable ``Cache-Control``. When no bundle has been built (e.g.
+a development checkout), ``asset_url`` falls back to the public CDNs, and
+the CSP allows them only in that case; pages then use a system font.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+from typing import Dict, List, Optional
+
+from flask import Flask, request, url_for
+
+from .compression import (
+    STATIC_EXTENSIONS,
+    STATIC_MIN_SIZE,
+    SUFFIXES,
+    available_codings,
+    precompress,
+)
+
+DIST_DIRNAME = "dist"
+MANIFEST_NAME = "manifest.json"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+BUNDLES = ("app.css", "lucide.js", "monaco")
+# Font files in assets/build/fonts, e.g. inter-400.woff2
+_FONT_FILE = re.compile(r"^inter-(\d{3})\.woff2$")
+
+# Used when the bundle has not been built
+CDN_URLS = {
+    "tailwind.js": "https://cdn.tailwindcss.com",
+    "lucide.js": "https://unpkg.com/lucide@0.344.0/dist/umd/lucide.min.js",
+    "monaco": "https://unpkg.com/monaco-editor@0.47.0/min/vs",
+}
+CDN_SOURCES = "https://unpkg.com https://cdn.tailwindcss.com"
+
+
+def _digest(*chunks: bytes) -> str:
+    h = hashlib.sha256()
+    for chunk in chunks:
+        h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def _write_bundle(dist: str, name: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    filename = f"{stem}.{_digest(data)}{ext}"
+    path = os.path.join(dist, filename)
+    if not os.path.exists(path):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    return filename
+
+
+def _copy_tree_hashed(dist: str, name: str, src: str) -> str:
+    files = []
+    for dirpath, _dirs, names in os.walk(src):
+        for n in names:
+            files.append(os.path.join(dirpath, n))
+    files.sort()
+    h = hashlib.sha256()
+    for path in files:
+        h.update(os.path.relpath(path, src).encode())
+        with open(path, "rb") as fh:
+            h.update(fh.read())
+    dirname = f"{name}.{h.hexdigest()[:12]}"
+    dest = os.path.join(dist, dirname, os.path.basename(src))
+    if not os.path.isdir(dest):
+        tmp = os.path.join(dist, dirname + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.copytree(src, os.path.join(tmp, os.path.basename(src)))
+        os.replace(tmp, os.path.join(dist, dirname))
+    return f"{dirname}/{os.path.basename(src)}"
+
+
+def _font_faces(fonts_url: str, names: List[str]) -> bytes:
+    """``@font-face`` rules for the Inter files in `names`, under `fonts_url`."""
+    rules = []
+    for name in sorted(names):
+        m = _FONT_FILE.match(name)
+        if m:
+            rules.append(
+                "@font-face{font-family:Inter;font-style:normal;font-weight:%s;font-display:swap;"
+                'src:url(%s/%s) format("woff2")}\n' % (m.group(1), fonts_url, name)
+            )
+    return "".join(rules).encode()
+
+
+def build(root: str, static_folder: str) -> Dict[str, str]:
+    """Write fingerprinted bundles into ``static/dist`` and return the manifest.
+
+    `root` is the project folder holding ``assets/build``. Missing sources
+    are skipped (those assets keep using the CDN fallback). Bundles from
+    earlier builds are removed.
+    """
+    sources = os.path.join(root, "assets", "build")
+    dist = os.path.join(static_folder, DIST_DIRNAME)
+    os.makedirs(dist, exist_ok=True)
+    manifest: Dict[str, str] = {}
+
+    fonts = os.path.join(sources, "fonts")
+    font_faces = b""
+    if os.path.isdir(fonts):
+        manifest["fonts"] = _copy_tree_hashed(dist, "fonts", fonts)
+        # Relative to app.css, which sits in the same folder
+        font_faces = _font_faces(manifest["fonts"], os.listdir(fonts))
+
+    tailwind = os.path.join(sources, "tailwind.css")
+    if os.path.exists(tailwind):
+        parts = [font_faces] if font_faces else []
+        for path in (tailwind, os.path.join(static_folder, "css", "styles.css")):
+            if os.path.exists(path):
+                with open(path, "rb") as fh:
+                    parts.append(fh.read().rstrip(b"\n") + b"\n")
+        manifest["app.css"] = _write_bundle(dist, "app.css", b"".join(parts))
+
+    lucide = os.path.join(sources, "lucide.min.js")
+    if os.path.exists(lucide):
+        with open(lucide, "rb") as fh:
+            manifest["lucide.js"] = _write_bundle(dist, "lucide.js", fh.read())
+
+    monaco = os.path.join(sources, "monaco", "vs")
+    if os.path.isdir(monaco):
+        manifest["monaco"] = _copy_tree_hashed(dist, "monaco", monaco)
+
+    # Ship compressed variants next to the bundles so no worker has to
+    # compress them at startup
+    for dirpath, _dirs, names in os.walk(dist):
+        for n in names:
+            if os.path.splitext(n)[1].lower() in STATIC_EXTENSIONS and not n.endswith(".tmp"):
+                src = os.path.join(dirpath, n)
+                if os.path.getsize(src) >= STATIC_MIN_SIZE:
+                    for coding in available_codings():
+                        dest = src + SUFFIXES[coding]
+                        if not os.path.exists(dest):
+                            precompress(src, dest, coding)
+
+    keep = {MANIFEST_NAME} | {value.split("/", 1)[0] for value in manifest.values()}
+    for name in os.listdir(dist):
+        if name not in keep and name.rsplit(".", 1)[0] not in keep:
+            path = os.path.join(dist, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+    tmp = os.path.join(dist, MANIFEST_NAME + ".tmp")
+    with open(tmp, "w") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(dist, MANIFEST_NAME))
+    return manifest
+
+
+def load_manifest(static_folder: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(static_folder, DIST_DIRNAME, MANIFEST_NAME)) as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def init_app(app: Flask) -> None:
+    """Expose `asset_url` to templates, the build command and caching headers."""
+    manifest = load_manifest(app.static_folder) if app.static_folder else {}
+    app.extensions["asset_manifest"] = manifest
+
+    def asset_url(name: str) -> Optional[str]:
+        """URL of a front-end asset (None if the page does not need it)."""
+        if name == "tailwind.js":
+            # Only needed to compile CSS in the browser when app.css is missing
+            return None if "app.css" in manifest else CDN_URLS[name]
+        filename = manifest.get(name)
+        if filename is None:
+            if name == "app.css":
+                return url_for("static", filename="css/styles.css")
+            return CDN_URLS.get(name)
+        return url_for("static", filename=f"{DIST_DIRNAME}/{filename}")
+
+    @app.context_processor
+    def _assets():
+        return {"asset_url": asset_url}
+
+    @app.after_request
+    def _immutable_assets(response):
+        filename = (request.view_args or {}).get("filename", "")
+        if (
+            request.endpoint == "static"
+            and filename.startswith(DIST_DIRNAME + "/")
+            and not filename.endswith(MANIFEST_NAME)
+            and response.status_code in (200, 304)
+        ):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    @app.cli.command("build-assets")
+    def build_assets():
+        """Fingerprint the front-end bundles into static/dist."""
+        _report(build(os.path.dirname(app.root_path), app.static_folder))
+
+
+def _report(manifest: Dict[str, str]) -> None:
+    for name, filename in sorted(manifest.items()):
+        print(f"{name} -> {DIST_DIRNAME}/{filename}")
+
+
+def content_security_policy(app: Flask) -> str:
+    """CSP for the pages; CDN hosts are only allowed while bundles are missing."""
+    manifest = app.extensions.get("asset_manifest") or {}
+    cdn = "" if all(k in manifest for k in BUNDLES) else " " + CDN_SOURCES
+    return (
+        "default-src 'self'; img-src 'self' data: https:; "
+        f"script-src 'self' 'unsafe-inline'{cdn}; "
+        f"style-src 'self' 'unsafe-inline'{cdn};"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """``python -m app.assets [--root DIR] [--static DIR]``, without an app."""
+    import argparse
+
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    parser = argparse.ArgumentParser(prog="python -m app.assets", description="Fingerprint the front-end bundles.")
+    parser.add_argument("--root", default=root, help="project folder holding assets/build")
+    parser.add_argument("--static", help="static folder (default: ROOT/static)")
+    args = parser.parse_args(argv)
+    _report(build(args.root, args.static or os.path.join(args.root, "static")))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
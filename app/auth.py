@@ -1,8 +1,10 @@
-import json
 import os
 from typing import Dict, Optional
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask import Blueprint, request, session, current_app, render_template, redirect, url_for, flash
+from werkzeug.security import generate_password_hash
+from flask import Blueprint, request, session, current_app, render_template, redirect, url_for, flash, g, has_app_context, has_request_context
+
+from .fsutil import CachedJsonFile, get_json_file
+from .passwords import DEFAULT_METHOD, VerifierBusy, get_verifier
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -14,46 +16,82 @@ def _users_file_path(app_path: Optional[str] = None) -> str:
     return os.getenv(USERS_FILE_ENV, DEFAULT_USERS_FILE)
 
 
+def _users_store() -> CachedJsonFile:
+    # Kept in memory and re-read only when users.json changes on disk, so
+    # a save from any worker is picked up by all of them
+    return get_json_file(_users_file_path())
+
+
+def _users() -> Dict[str, Dict]:
+    """The cached users document; read-only, use load_users() to modify."""
+    users = _users_store().get()
+    return users if isinstance(users, dict) else {}
+
+
 def load_users() -> Dict[str, Dict]:
-    path = _users_file_path()
-    if not os.path.exists(path):
-        return {}
-    try:
-        with open(path, 'r') as fh:
-            return json.load(fh)
-    except Exception:
-        return {}
+    users = _users_store().load()
+    return users if isinstance(users, dict) else {}
 
 
 def save_users(users: Dict[str, Dict]):
-    path = _users_file_path()
-    with open(path, 'w') as fh:
-        json.dump(users, fh)
+    # Atomic replace: concurrent readers never see a half-written file
+    _users_store().save(users)
+    if has_request_context():
+        g.pop('user_roles', None)
+
+
+def _setting(name: str, default):
+    if has_app_context():
+        return current_app.config.get(name, default)
+    return default
+
+
+def _hash_method() -> str:
+    return _setting('PASSWORD_HASH_METHOD', os.getenv('PASSWORD_HASH_METHOD', DEFAULT_METHOD))
 
 
 def create_user(username: str, password: str, role: str = 'admin') -> None:
     users = load_users()
     users[username] = {
-        'password_hash': generate_password_hash(password),
+        'password_hash': generate_password_hash(password, _hash_method()),
         'role': role
     }
     save_users(users)
 
 
 def verify_user(username: str, password: str) -> bool:
-    users = load_users()
-    user = users.get(username)
+    """Check a login; raises VerifierBusy if too many checks are in flight."""
+    user = _users().get(username)
     if not user:
         return False
-    return check_password_hash(user.get('password_hash', ''), password)
+    stored = user.get('password_hash', '')
+    cache = _setting('CACHE_FOLDER', None)
+    verifier = get_verifier(
+        _setting('PASSWORD_VERIFY_WORKERS', 2),
+        _setting('PASSWORD_VERIFY_QUEUE', 8),
+        os.path.join(cache, 'password-slots') if cache else None,
+    )
+    ok, new_hash = verifier.verify(stored, password, _hash_method())
+    if new_hash:
+        # Hashed with an older method: store the new hash, unless the
+        # password was changed meanwhile
+        users = load_users()
+        if users.get(username, {}).get('password_hash') == stored:
+            users[username]['password_hash'] = new_hash
+            save_users(users)
+    return ok
 
 
 def get_user_role(username: str) -> Optional[str]:
-    users = load_users()
-    user = users.get(username)
-    if not user:
-        return None
-    return user.get('role')
+    # Memoised for the rest of the request; file operations check the role
+    # several times per request
+    roles = g.setdefault('user_roles', {}) if has_request_context() else {}
+    if username in roles:
+        return roles[username]
+    user = _users().get(username)
+    role = user.get('role') if user else None
+    roles[username] = role
+    return role
 
 
 # Role enforcement decorator
@@ -80,7 +118,12 @@ def login():
     if request.method == 'POST':
         username = request.form.get('username', '')
         password = request.form.get('password', '')
-        if verify_user(username, password):
+        try:
+            ok = verify_user(username, password)
+        except VerifierBusy:
+            flash('Too many login attempts right now. Please try again shortly.', 'error')
+            return render_template('login.html'), 503, {'Retry-After': '1'}
+        if ok:
             session.clear()
             session['user'] = username
             flash('Logged in successfully.', 'success')
@@ -0,0 +1,257 @@
+"""Negotiated response compression (gzip, and brotli when installed).
+
+Dynamic responses (JSON listings, history, file contents, pages) are
+compressed in an ``after_request`` hook when the client accepts it and the
+body is larger than ``COMPRESS_MIN_SIZE``. They use a low compression effort
+(gzip level 5, brotli quality 4 by default), which keeps most of the size
+reduction at a fraction of the CPU cost on a Pi. Streamed responses (SSE,
+downloads, ZIP archives) are left alone.
+
+Static assets are compressed once at startup, at maximum effort, by
+`StaticVariants.build` into ``<CACHE_FOLDER>/static``, and the ``static``
+endpoint serves the matching variant directly. Every compressible response
+carries ``Vary: Accept-Encoding``.
+
+Brotli needs the optional ``brotli`` package; without it only gzip is used.
+"""
+import gzip
+import mimetypes
+import os
+import threading
+import logging
+from typing import Dict, Optional
+
+from flask import Flask, request, send_file
+
+try:
+    import brotli
+except Exception:
+    # Optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/javascript",
+    "text/javascript",
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/csv",
+    "image/svg+xml",
+    "application/xml",
+    "text/xml",
+}
+STATIC_EXTENSIONS = {".css", ".js", ".mjs", ".json", ".svg", ".html", ".txt", ".map"}
+# Below this a static file is not worth a second (compressed) copy
+STATIC_MIN_SIZE = 256
+
+
+def _accepted(header: str) -> Dict[str, float]:
+    """Parse Accept-Encoding into {coding: q}."""
+    codings = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def negotiate(header: str) -> Optional[str]:
+    """Pick "br" or "gzip" for an Accept-Encoding header (None for identity)."""
+    codings = _accepted(header)
+    wildcard = codings.get("*", 0.0)
+    choices = []
+    if brotli is not None:
+        choices.append("br")
+    choices.append("gzip")
+    best, best_q = None, 0.0
+    for coding in choices:
+        q = codings.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(data: bytes, coding: str, level: int) -> bytes:
+    if coding == "br":
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _is_compressible(mimetype: Optional[str]) -> bool:
+    return (mimetype or "") in COMPRESSIBLE_TYPES
+
+
+def compress_response(response, min_size: int, gzip_level: int, br_quality: int):
+    """Compress `response` in place if the request accepts it and it is worth it."""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or not _is_compressible(response.mimetype)
+        or "Content-Encoding" in response.headers
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    coding = negotiate(request.headers.get("Accept-Encoding", ""))
+    if coding is None:
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    body = compress(data, coding, br_quality if coding == "br" else gzip_level)
+    if len(body) >= len(data):
+        return response
+    response.set_data(body)
+    response.headers["Content-Encoding"] = coding
+    etag, weak = response.get_etag()
+    if etag:
+        # A different representation needs a different validator
+        response.set_etag(f"{etag}-{coding}", weak=weak)
+    return response
+
+
+SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+
+def _fresh(variant: str, st: os.stat_result) -> bool:
+    try:
+        return os.stat(variant).st_mtime_ns == st.st_mtime_ns
+    except OSError:
+        return False
+
+
+def precompress(src: str, dest: str, coding: str) -> bool:
+    """Write a maximum-effort compressed copy of `src` to `dest`.
+
+    The copy gets the source's mtime, which is how it is later recognised
+    as current. Returns False if compression does not make it smaller.
+    """
+    st = os.stat(src)
+    with open(src, "rb") as fh:
+        body = compress(fh.read(), coding, 11 if coding == "br" else 9)
+    if len(body) >= st.st_size:
+        return False
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as out:
+        out.write(body)
+    os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.replace(tmp, dest)
+    return True
+
+
+def available_codings():
+    return ["gzip"] + (["br"] if brotli is not None else [])
+
+
+class StaticVariants:
+    """Precompressed copies of the static folder.
+
+    Variants shipped next to a file (``app.css.gz``, as written by the asset
+    build) are used as they are; others are made once and kept under the
+    cache folder.
+    """
+
+    def __init__(self, static_folder: str, cache_dir: str):
+        self.static_folder = os.path.abspath(static_folder)
+        self.root = os.path.join(cache_dir, "static")
+        self._variants: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def build(self) -> int:
+        """(Re)compress changed static files; return how many were written."""
+        written = 0
+        variants: Dict[str, Dict[str, str]] = {}
+        for dirpath, _dirs, files in os.walk(self.static_folder):
+            for name in files:
+                if os.path.splitext(name)[1].lower() not in STATIC_EXTENSIONS:
+                    continue
+                src = os.path.join(dirpath, name)
+                rel = os.path.relpath(src, self.static_folder).replace(os.sep, "/")
+                try:
+                    st = os.stat(src)
+                except OSError:
+                    continue
+                if st.st_size < STATIC_MIN_SIZE:
+                    continue
+                for coding in available_codings():
+                    sibling = src + SUFFIXES[coding]
+                    dest = os.path.join(self.root, rel + SUFFIXES[coding])
+                    if _fresh(sibling, st):
+                        dest = sibling
+                    elif not _fresh(dest, st):
+                        if not precompress(src, dest, coding):
+                            continue
+                        written += 1
+                    variants.setdefault(rel, {})[coding] = dest
+        with self._lock:
+            self._variants = variants
+        return written
+
+    def lookup(self, filename: str, coding: str) -> Optional[str]:
+        with self._lock:
+            path = self._variants.get(filename, {}).get(coding)
+        if path is None:
+            return None
+        # Only serve a variant made from the current source file
+        try:
+            src = os.stat(os.path.join(self.static_folder, filename))
+            if os.stat(path).st_mtime_ns != src.st_mtime_ns:
+                return None
+        except OSError:
+            return None
+        return path
+
+
+def init_app(app: Flask) -> None:
+    """Install dynamic compression and precompressed static serving."""
+    if not app.config.get("COMPRESS_ENABLED", True):
+        return
+    min_size = int(app.config.get("COMPRESS_MIN_SIZE", 1024))
+    gzip_level = int(app.config.get("COMPRESS_LEVEL", 5))
+    br_quality = int(app.config.get("COMPRESS_BR_QUALITY", 4))
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, min_size, gzip_level, br_quality)
+
+    if not app.static_folder or "static" not in app.view_functions:
+        return
+    variants = StaticVariants(app.static_folder, app.config["CACHE_FOLDER"])
+    try:
+        variants.build()
+    except OSError:
+        logging.getLogger(__name__).exception("Could not precompress static files")
+    app.extensions["static_variants"] = variants
+    serve_static = app.view_functions["static"]
+
+    def static(filename):
+        coding = negotiate(request.headers.get("Accept-Encoding", ""))
+        path = variants.lookup(filename, coding) if coding else None
+        if path is None:
+            response = serve_static(filename=filename)
+        else:
+            mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            response = send_file(
+                path,
+                mimetype=mimetype,
+                conditional=True,
+                max_age=app.get_send_file_max_age(filename),
+            )
+            response.headers["Content-Encoding"] = coding
+        if _is_compressible(response.mimetype):
+            response.vary.add("Accept-Encoding")
+        return response
+
+    app.view_functions["static"] = static
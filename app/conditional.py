@@ -0,0 +1,38 @@
+"""Conditional GET (ETag / If-None-Match) for the polling APIs.
+
+Views compute a cheap validator before doing the expensive work (the stats
+sample sequence number, a directory's mtime) and return `not_modified` when
+the client already has that version. Compressed responses carry the ETag
+with a ``-gzip``/``-br`` suffix (see `app.compression`), so those variants
+match too.
+"""
+from typing import Optional
+
+from flask import Response, request
+
+from .compression import SUFFIXES
+
+
+def match(etag: str) -> Optional[str]:
+    """The tag in If-None-Match that matches `etag` or a compressed variant of it."""
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return None
+    for candidate in (etag, *(f"{etag}-{coding}" for coding in SUFFIXES)):
+        if if_none_match.contains_weak(candidate):
+            return candidate
+    return None
+
+
+def not_modified(tag: str, weak: bool = False) -> Response:
+    response = Response(status=304)
+    response.set_etag(tag, weak=weak)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def validated(response: Response, etag: str, weak: bool = False) -> Response:
+    """Attach `etag` and ask clients to revalidate before reusing the response."""
+    response.set_etag(etag, weak=weak)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
@@ -0,0 +1,220 @@
+"""Content-addressed dedup of uploaded files (optional, DEDUP_UPLOADS).
+
+Every upload's SHA-256 is computed while it is ingested. The first file with
+a given hash is hardlinked into ``<storage root>/.pidash-uploads/blobs`` and
+recorded in a hash index. When later uploads have the same content, they
+become another hardlink to that blob, so they are not stored again.
+
+The index is an append-only log (``blobs/index.log``, one JSON record per
+line) that every worker process replays into a dict, reading only the lines
+added since its last look. A lookup is a dict access plus one `stat` of the
+blob. The stat checks the blob's inode, size and mtime, so a blob that was
+modified in place is never reused.
+
+Blobs whose only remaining link is the one in the store (all user copies
+were deleted) are removed by `gc`, which also compacts the log.
+
+Hardlinked copies share one inode. Replacing a file (as the editor's atomic
+save does) detaches it from the others, but tools that modify files in
+place change every copy.
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from .uploads import SESSIONS_DIRNAME
+
+BLOBS_DIRNAME = "blobs"
+GC_INTERVAL = 3600
+
+
+class DedupStore:
+    def __init__(self, storage_root: str):
+        self.storage_root = os.path.abspath(storage_root)
+        self.root = os.path.join(self.storage_root, SESSIONS_DIRNAME, BLOBS_DIRNAME)
+        self.log_path = os.path.join(self.root, "index.log")
+        self._index: Dict[str, Dict] = {}
+        self._log_ino: Optional[int] = None
+        self._log_offset = 0
+        self._lock = threading.Lock()
+        self._last_gc = time.monotonic()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _refresh(self) -> None:
+        """Replay log lines added since the last call (reload if compacted)."""
+        try:
+            st = os.stat(self.log_path)
+        except OSError:
+            self._index, self._log_ino, self._log_offset = {}, None, 0
+            return
+        if st.st_ino != self._log_ino or st.st_size < self._log_offset:
+            self._index, self._log_ino, self._log_offset = {}, st.st_ino, 0
+        if st.st_size == self._log_offset:
+            return
+        with open(self.log_path, "rb") as fh:
+            fh.seek(self._log_offset)
+            data = fh.read(st.st_size - self._log_offset)
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            self._index[record["sha256"]] = record
+        self._log_offset += end
+
+    def _append(self, record: Dict) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        while True:
+            with open(self.log_path, "ab") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+                try:
+                    current = os.stat(self.log_path).st_ino
+                except OSError:
+                    current = None
+                if current == os.fstat(fh.fileno()).st_ino:
+                    fh.write(line)
+                    return
+            # `gc` replaced the log while we waited for the lock; use the new one
+
+    def lookup(self, digest: str, size: int) -> Optional[str]:
+        """Path of a verified blob with this content, or None."""
+        with self._lock:
+            self._refresh()
+            entry = self._index.get(digest)
+        if entry is None or entry["size"] != size:
+            return None
+        path = self._blob_path(digest)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if (st.st_ino, st.st_size, st.st_mtime_ns) != (entry["ino"], entry["size"], entry["mtime_ns"]):
+            return None
+        return path
+
+    def link_existing(self, digest: str, size: int, dest: str) -> bool:
+        """Make `dest` a hardlink to the blob for `digest`; False if there is none."""
+        blob = self.lookup(digest, size)
+        if blob is None:
+            return False
+        tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.link"
+        try:
+            os.link(blob, tmp)
+            os.replace(tmp, dest)
+        except OSError:
+            # Different filesystem or no hardlink support: store normally
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+        return True
+
+    def add(self, digest: str, path: str) -> None:
+        """Record the newly stored file `path` as the blob for `digest`."""
+        blob = self._blob_path(digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        tmp = f"{blob}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(path, tmp)
+            os.replace(tmp, blob)
+            st = os.stat(blob)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._append(
+            {"sha256": digest, "size": st.st_size, "ino": st.st_ino, "mtime_ns": st.st_mtime_ns}
+        )
+        if time.monotonic() - self._last_gc > GC_INTERVAL:
+            self.gc()
+
+    def store(self, digest: str, size: int, dest: str, commit) -> bool:
+        """Place an upload at `dest`, as a hardlink if its content is known.
+
+        `commit()` writes the upload to `dest` the normal way; it is only
+        called when there is no usable blob. Returns True if deduplicated.
+        """
+        if self.link_existing(digest, size, dest):
+            return True
+        commit()
+        self.add(digest, dest)
+        return False
+
+    def gc(self) -> Dict:
+        """Drop blobs no user file links to any more and compact the log."""
+        self._last_gc = time.monotonic()
+        os.makedirs(self.root, exist_ok=True)
+        removed = 0
+        with open(self.log_path, "ab") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            with self._lock:
+                self._refresh()
+                live = {}
+                for digest, entry in self._index.items():
+                    path = self._blob_path(digest)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    if st.st_ino != entry["ino"]:
+                        continue
+                    if st.st_nlink <= 1:
+                        os.remove(path)
+                        removed += 1
+                        continue
+                    live[digest] = entry
+                tmp = self.log_path + f".{os.getpid()}.tmp"
+                with open(tmp, "wb") as out:
+                    for entry in live.values():
+                        out.write(json.dumps(entry, separators=(",", ":")).encode() + b"\n")
+                os.replace(tmp, self.log_path)
+                self._refresh()
+        return {"removed_blobs": removed}
+
+    def stats(self) -> Dict:
+        """Savings report: each extra link to a blob is one stored copy avoided."""
+        with self._lock:
+            self._refresh()
+            entries = list(self._index.items())
+        blobs = files = unique = saved = 0
+        for digest, entry in entries:
+            try:
+                st = os.stat(self._blob_path(digest))
+            except OSError:
+                continue
+            if st.st_ino != entry["ino"]:
+                continue
+            # One link is the store's own; the rest are user files
+            copies = st.st_nlink - 1
+            if copies < 1:
+                continue
+            blobs += 1
+            files += copies
+            unique += st.st_size
+            saved += (copies - 1) * st.st_size
+        return {"blobs": blobs, "files": files, "unique_bytes": unique, "saved_bytes": saved}
+
+
+_stores: Dict[str, DedupStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(storage_root: str) -> DedupStore:
+    """Return the process-wide store for `storage_root`."""
+    key = os.path.abspath(storage_root)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = DedupStore(key)
+            _stores[key] = store
+        return store
@@ -0,0 +1,169 @@
+"""Background recursive folder-size computation.
+
+Directory listings only know ``stat.st_size`` for folders, which says nothing
+about how much disk a subtree uses. This module computes recursive sizes on a
+background thread using ``os.scandir`` and caches the result per directory,
+keyed by the directory's mtime. A directory whose mtime has not changed is not
+re-scanned: only its subdirectories are checked, so repeated refreshes only
+pay for subtrees that actually changed.
+
+Requests never block on the walk: ``lookup`` returns the last known size (or
+``None`` while the first computation is still running) and schedules a
+refresh in the background.
+"""
+import os
+import queue
+import threading
+import logging
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+
+class _DirEntry:
+    __slots__ = ("mtime_ns", "ino", "own_bytes", "subdirs", "total")
+
+    def __init__(self, mtime_ns: int, ino: int, own_bytes: int, subdirs: List[str]):
+        self.mtime_ns = mtime_ns
+        self.ino = ino
+        self.own_bytes = own_bytes
+        self.subdirs = subdirs
+        self.total: Optional[int] = None
+
+
+class DirSizeCache:
+    def __init__(self):
+        self._entries: Dict[str, _DirEntry] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._pending = set()
+        self._worker: Optional[threading.Thread] = None
+        # Bumped whenever a computed size changes (used in listing ETags);
+        # `epoch` tells caches in different worker processes apart
+        self._nonce = uuid.uuid4().hex[:8]
+        self.version = 0
+
+    @property
+    def epoch(self) -> str:
+        # Includes the pid: workers forked from a preloaded app inherit the
+        # cache (nonce and version included) but then update their own copy
+        return f"{os.getpid():x}-{self._nonce}"
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+
+    def _scan(self, path: str, st: os.stat_result) -> _DirEntry:
+        own = 0
+        subdirs: List[str] = []
+        with os.scandir(path) as it:
+            for e in it:
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        subdirs.append(e.path)
+                    else:
+                        own += e.stat(follow_symlinks=False).st_size
+                except OSError:
+                    # Entry vanished or is unreadable; skip it
+                    continue
+        return _DirEntry(st.st_mtime_ns, st.st_ino, own, subdirs)
+
+    def compute(self, path: str) -> int:
+        """Synchronously compute the recursive size of `path`, reusing cached
+        results for directories whose mtime/inode is unchanged."""
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._forget(path)
+            return 0
+
+        with self._lock:
+            entry = self._entries.get(path)
+        previous = entry.total if entry is not None else None
+        if entry is None or entry.mtime_ns != st.st_mtime_ns or entry.ino != st.st_ino:
+            try:
+                fresh = self._scan(path, st)
+            except OSError:
+                return 0
+            if entry is not None:
+                # Drop cached data for subdirectories that no longer exist
+                for gone in set(entry.subdirs) - set(fresh.subdirs):
+                    self._forget(gone)
+            entry = fresh
+
+        total = entry.own_bytes
+        for sub in entry.subdirs:
+            total += self.compute(sub)
+        entry.total = total
+        with self._lock:
+            self._entries[path] = entry
+            if total != previous:
+                self.version += 1
+        return total
+
+    def _forget(self, path: str) -> None:
+        prefix = path + os.sep
+        with self._lock:
+            for key in [k for k in self._entries if k == path or k.startswith(prefix)]:
+                del self._entries[key]
+
+    def cached(self, path: str) -> Optional[int]:
+        """Return the last computed size for `path` or None if never computed."""
+        with self._lock:
+            entry = self._entries.get(os.path.abspath(path))
+        return entry.total if entry is not None else None
+
+    def lookup(self, path: str) -> Tuple[Optional[int], bool]:
+        """Return ``(size, ready)`` without blocking.
+
+        ``size`` is the last known recursive size (None if not yet computed).
+        ``ready`` is False while the first computation for `path` is pending.
+        A background refresh is scheduled on every call so changed subtrees are
+        picked up on the next listing.
+        """
+        path = os.path.abspath(path)
+        size = self.cached(path)
+        self.request(path)
+        return size, size is not None
+
+    def request(self, path: str) -> None:
+        """Schedule a background (re)computation of `path` (deduplicated)."""
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._pending:
+                return
+            self._pending.add(path)
+        self._ensure_worker()
+        self._queue.put(path)
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(
+                target=self._run, daemon=True, name="pidash-dirsize"
+            )
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            path = self._queue.get()
+            try:
+                self.compute(path)
+            except Exception:
+                logging.getLogger(__name__).exception(
+                    "Error computing folder size for %s", path
+                )
+            finally:
+                with self._lock:
+                    self._pending.discard(path)
+                self._queue.task_done()
+
+    def wait(self) -> None:
+        """Block until all scheduled computations have finished (tests/CLI)."""
+        self._queue.join()
+
+
+# Default singleton cache used by the app
+dir_sizes = DirSizeCache()
@@ -0,0 +1,142 @@
+"""Download engine used by `/download` and `/open`.
+
+Serves files with HTTP Range / 206 support and ETag validation while keeping
+Python out of the data path where possible:
+
+- When the WSGI server provides ``wsgi.file_wrapper`` (gunicorn does), the
+  response body is handed to it unchanged so the server can transfer bytes
+  with ``os.sendfile``. Gunicorn honours ``Content-Length`` and the file's
+  current offset, so ranged responses are zero-copy as well.
+- With ``DOWNLOAD_OFFLOAD`` set to ``x-accel-redirect`` (nginx) or
+  ``x-sendfile`` (Apache/lighttpd) Flask only authorises the request and a
+  fronting proxy serves the bytes.
+- Otherwise the file is streamed in bounded chunks.
+"""
+import mimetypes
+import os
+import unicodedata
+from typing import Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from flask import Response, current_app, request
+
+CHUNK_SIZE = 256 * 1024
+
+
+def file_etag(st: os.stat_result) -> str:
+    """Cheap strong validator derived from inode, mtime and size."""
+    return f"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+def content_disposition(name: str, as_attachment: bool) -> Tuple[str, dict]:
+    value = "attachment" if as_attachment else "inline"
+    try:
+        name.encode("ascii")
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize("NFKD", name)
+        simple = simple.encode("ascii", "ignore").decode("ascii")
+        return value, {"filename": simple, "filename*": f"UTF-8''{quote(name, safe='')}"}
+    return value, {"filename": name}
+
+
+def _if_range_matches(etag: str, mtime: float) -> bool:
+    """Return True when a Range request may be honoured (RFC 7233 If-Range)."""
+    if_range = request.if_range
+    if if_range.etag is not None:
+        return if_range.etag == etag
+    if if_range.date is not None:
+        return int(mtime) <= int(if_range.date.timestamp())
+    return True
+
+
+def _iter_range(fh, start: int, length: int) -> Iterator[bytes]:
+    fh.seek(start)
+    remaining = length
+    while remaining > 0:
+        chunk = fh.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
+
+
+def _offload_response(path: str, storage_root: str, headers: dict) -> Optional[Response]:
+    mode = (current_app.config.get("DOWNLOAD_OFFLOAD") or "").lower()
+    if mode == "x-accel-redirect":
+        prefix = current_app.config.get("DOWNLOAD_OFFLOAD_PREFIX", "/protected-files/")
+        rel = os.path.relpath(path, os.path.abspath(storage_root)).replace(os.sep, "/")
+        headers["X-Accel-Redirect"] = prefix.rstrip("/") + "/" + quote(rel)
+    elif mode == "x-sendfile":
+        headers["X-Sendfile"] = path
+    else:
+        return None
+    rv = Response(b"", headers=headers)
+    # Let the proxy compute the real body length
+    rv.headers.pop("Content-Length", None)
+    return rv
+
+
+def send_file_response(path: str, storage_root: str, as_attachment: bool) -> Response:
+    """Build a (possibly partial or offloaded) response for an existing file."""
+    st = os.stat(path)
+    size = st.st_size
+    etag = file_etag(st)
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    headers = {"Content-Type": mimetype}
+    value, names = content_disposition(os.path.basename(path), as_attachment)
+
+    offloaded = _offload_response(path, storage_root, headers)
+    if offloaded is not None:
+        offloaded.headers.set("Content-Disposition", value, **names)
+        return offloaded
+
+    rv = Response(status=200, headers=headers)
+    rv.headers.set("Content-Disposition", value, **names)
+    rv.headers["Accept-Ranges"] = "bytes"
+    rv.set_etag(etag)
+    rv.last_modified = st.st_mtime
+    rv.cache_control.no_cache = True
+
+    if request.if_none_match.contains(etag) or (
+        not request.if_none_match
+        and request.if_modified_since is not None
+        and int(st.st_mtime) <= int(request.if_modified_since.timestamp())
+    ):
+        rv.status_code = 304
+        return rv
+
+    start, length = 0, size
+    rng = request.range
+    if rng is not None and _if_range_matches(etag, st.st_mtime):
+        bounds = rng.range_for_length(size)
+        if bounds is not None:
+            start, stop = bounds
+            length = stop - start
+            rv.status_code = 206
+            rv.headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+        elif rng.units == "bytes" and len(rng.ranges) == 1:
+            rv.status_code = 416
+            rv.headers["Content-Range"] = f"bytes */{size}"
+            return rv
+        # Multiple ranges or other units are not supported; like any server
+        # may (RFC 9110), ignore the Range header and send the whole file
+
+    rv.content_length = length
+    if request.method == "HEAD":
+        return rv
+
+    fh = open(path, "rb")
+    wrapper = request.environ.get("wsgi.file_wrapper")
+    # gunicorn sends `Content-Length` bytes from the current offset with
+    # os.sendfile; other servers may read to EOF, so only hand them full files.
+    server = request.environ.get("SERVER_SOFTWARE", "")
+    if wrapper is not None and (length == size or server.startswith("gunicorn")):
+        fh.seek(start)
+        # Passed through untouched so the server recognises its own wrapper
+        rv.response = wrapper(fh, CHUNK_SIZE)
+        rv.direct_passthrough = True
+    else:
+        rv.response = _iter_range(fh, start, length)
+        rv.call_on_close(fh.close)
+    return rv
@@ -0,0 +1,146 @@
+"""MessagePack responses for the stats APIs.
+
+``/api/stats``, ``/api/stats/stream`` and ``/api/stats/history`` answer in
+MessagePack when the client prefers it: ``Accept: application/msgpack``
+(or ``application/x-msgpack``), or ``?format=msgpack`` where headers cannot
+be set. JSON stays the default, including for ``Accept: */*``.
+
+History in MessagePack is columnar: one array per field instead of one map
+per sample, so key names are sent once. JSON clients can ask for the same
+layout with ``?layout=columns``. The binary stream is a plain concatenation
+of MessagePack maps (MessagePack values are self-delimiting, so a streaming
+unpacker reads them as they arrive).
+
+The C-accelerated ``msgpack`` package is used when installed. Otherwise a
+small built-in encoder covers the types these APIs produce (maps, arrays,
+strings, ints, floats, bools and None).
+"""
+import struct
+from typing import Any, Dict, List
+
+from flask import Response, request
+
+try:
+    import msgpack
+except Exception:
+    # Optional; the built-in encoder below is used instead
+    msgpack = None
+
+MSGPACK_MIMETYPE = "application/msgpack"
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+_FLOAT = struct.Struct(">Bd")
+
+
+def _pack_int(n: int, out: bytearray) -> None:
+    if 0 <= n <= 0x7F:
+        out.append(n)
+    elif -32 <= n < 0:
+        out.append(n & 0xFF)
+    elif n > 0:
+        if n <= 0xFF:
+            out += struct.pack(">BB", 0xCC, n)
+        elif n <= 0xFFFF:
+            out += struct.pack(">BH", 0xCD, n)
+        elif n <= 0xFFFFFFFF:
+            out += struct.pack(">BI", 0xCE, n)
+        else:
+            out += struct.pack(">BQ", 0xCF, n)
+    elif n >= -0x80:
+        out += struct.pack(">Bb", 0xD0, n)
+    elif n >= -0x8000:
+        out += struct.pack(">Bh", 0xD1, n)
+    elif n >= -0x80000000:
+        out += struct.pack(">Bi", 0xD2, n)
+    else:
+        out += struct.pack(">Bq", 0xD3, n)
+
+
+def _pack_header(n: int, fix: int, fix_max: int, b16: int, b32: int, out: bytearray) -> None:
+    if n <= fix_max:
+        out.append(fix | n)
+    elif n <= 0xFFFF:
+        out += struct.pack(">BH", b16, n)
+    else:
+        out += struct.pack(">BI", b32, n)
+
+
+def _pack(obj: Any, out: bytearray) -> None:
+    if obj is None:
+        out.append(0xC0)
+    elif obj is True:
+        out.append(0xC3)
+    elif obj is False:
+        out.append(0xC2)
+    elif isinstance(obj, int):
+        _pack_int(obj, out)
+    elif isinstance(obj, float):
+        out += _FLOAT.pack(0xCB, obj)
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8")
+        n = len(data)
+        if n <= 31:
+            out.append(0xA0 | n)
+        elif n <= 0xFF:
+            out += struct.pack(">BB", 0xD9, n)
+        else:
+            _pack_header(n, 0, -1, 0xDA, 0xDB, out)
+        out += data
+    elif isinstance(obj, (list, tuple)):
+        _pack_header(len(obj), 0x90, 15, 0xDC, 0xDD, out)
+        if obj and all(type(v) is float for v in obj):
+            # Columns of samples: pack all floats with one struct call
+            out += struct.pack(">" + "Bd" * len(obj), *[x for v in obj for x in (0xCB, v)])
+        else:
+            for v in obj:
+                _pack(v, out)
+    elif isinstance(obj, dict):
+        _pack_header(len(obj), 0x80, 15, 0xDE, 0xDF, out)
+        for k, v in obj.items():
+            _pack(k, out)
+            _pack(v, out)
+    elif isinstance(obj, (bytes, bytearray)):
+        n = len(obj)
+        if n <= 0xFF:
+            out += struct.pack(">BB", 0xC4, n)
+        elif n <= 0xFFFF:
+            out += struct.pack(">BH", 0xC5, n)
+        else:
+            out += struct.pack(">BI", 0xC6, n)
+        out += obj
+    else:
+        raise TypeError(f"Cannot encode {type(obj).__name__} as MessagePack")
+
+
+def packb(obj: Any) -> bytes:
+    """Encode `obj` as MessagePack."""
+    if msgpack is not None:
+        return msgpack.packb(obj)
+    out = bytearray()
+    _pack(obj, out)
+    return bytes(out)
+
+
+def wants_msgpack() -> bool:
+    """Whether the current request prefers MessagePack over JSON."""
+    fmt = request.args.get("format")
+    if fmt:
+        return fmt.lower() == "msgpack"
+    accept = request.accept_mimetypes
+    return max(accept[m] for m in MSGPACK_MIMETYPES) > accept["application/json"]
+
+
+def columns(samples: List[Dict[str, Any]]) -> Dict[str, List]:
+    """Turn a list of samples into one list per field."""
+    keys: List[str] = []
+    for sample in samples:
+        for key in sample:
+            if key not in keys:
+                keys.append(key)
+    return {key: [sample.get(key) for sample in samples] for key in keys}
+
+
+def msgpack_response(payload: Any) -> Response:
+    response = Response(packb(payload), mimetype=MSGPACK_MIMETYPE)
+    response.vary.add("Accept")
+    return response
@@ -0,0 +1,255 @@
+"""File operations that run as background jobs (see `app.jobs`).
+
+Each operation takes the running `Job` first and calls `job.advance` as it
+goes, which both reports progress and lets a cancel request stop it between
+files (or between blocks of a large file).
+"""
+import errno
+import os
+import shutil
+from typing import Callable, Dict, List, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; reflink clones are skipped
+    fcntl = None
+
+from .jobs import Job, JobCancelled
+
+# Plain-copy buffer, and how much copy_file_range moves per call (progress
+# and cancellation are checked between calls)
+COPY_BUFFER_SIZE = 4 * 1024 * 1024
+COPY_RANGE_CHUNK = 64 * 1024 * 1024
+# ioctl number of FICLONE (_IOW(0x94, 9, int)) on Linux
+FICLONE = 0x40049409
+# copy_file_range errors that mean "not supported here", not a real failure
+_NO_COPY_RANGE = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM, errno.EBADF}
+
+
+def delete_tree(job: Job, path: str) -> Dict:
+    """Remove the directory `path` and everything below it, bottom-up.
+
+    A symlink is unlinked rather than followed.
+    """
+    if os.path.islink(path):
+        os.remove(path)
+        job.advance(1)
+        return {"deleted_files": job.files, "deleted_bytes": job.bytes}
+    for dirpath, dirnames, filenames in os.walk(path, topdown=False):
+        for name in filenames:
+            p = os.path.join(dirpath, name)
+            try:
+                size = os.lstat(p).st_size
+                os.remove(p)
+            except FileNotFoundError:
+                continue
+            job.advance(1, size)
+        for name in dirnames:
+            p = os.path.join(dirpath, name)
+            # os.walk lists symlinks to directories here without following them
+            if os.path.islink(p):
+                os.remove(p)
+                job.advance(1)
+            else:
+                os.rmdir(p)
+    os.rmdir(path)
+    return {"deleted_files": job.files, "deleted_bytes": job.bytes}
+
+
+def _clone(fsrc, fdst) -> bool:
+    """Try a reflink (copy-on-write clone); only some filesystems support it."""
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except OSError:
+        return False
+
+
+def _copy_range(progress: Callable[[int], None], fsrc, fdst) -> bool:
+    """Copy with copy_file_range (in-kernel, no user-space buffers).
+
+    Returns False if the kernel or filesystem does not support it for this
+    pair of files; the caller then continues from the current file offsets.
+    Some filesystems (procfs-style files, some FUSE and overlay setups)
+    report 0 bytes instead of an error, so an immediate 0 for a non-empty
+    source is treated as unsupported too.
+    """
+    if not hasattr(os, "copy_file_range"):
+        return False
+    in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+    copied = 0
+    while True:
+        try:
+            n = os.copy_file_range(in_fd, out_fd, COPY_RANGE_CHUNK)
+        except OSError as e:
+            if e.errno in _NO_COPY_RANGE:
+                return False
+            raise
+        if n == 0:
+            return copied > 0 or os.fstat(in_fd).st_size == 0
+        copied += n
+        progress(n)
+
+
+def _copy_buffered(progress: Callable[[int], None], fsrc, fdst) -> None:
+    buf = bytearray(COPY_BUFFER_SIZE)
+    view = memoryview(buf)
+    while True:
+        n = fsrc.readinto(buf)
+        if not n:
+            break
+        done = 0
+        while done < n:
+            done += fdst.write(view[done:n])
+        progress(n)
+
+
+def copy_file(src: str, dst: str, progress: Callable[[int], None] = lambda n: None) -> str:
+    """Copy file contents and metadata from `src` to `dst`.
+
+    Tries a reflink clone first, then copy_file_range, then a plain copy
+    with a large buffer. Returns the method that was used.
+    """
+    with open(src, "rb", buffering=0) as fsrc, open(dst, "wb", buffering=0) as fdst:
+        if _clone(fsrc, fdst):
+            progress(os.fstat(fsrc.fileno()).st_size)
+            method = "reflink"
+        elif _copy_range(progress, fsrc, fdst):
+            method = "copy_file_range"
+        else:
+            # Unbuffered file objects, so the offsets copy_file_range may
+            # have advanced are where the plain copy continues
+            _copy_buffered(progress, fsrc, fdst)
+            method = "buffered"
+    shutil.copystat(src, dst)
+    return method
+
+
+def _copy_file(job: Job, src: str, dst: str) -> None:
+    copy_file(src, dst, lambda n: job.advance(0, n))
+    job.advance(1)
+
+
+def _copy_tree(job: Job, src: str, dst: str) -> None:
+    if os.path.islink(src):
+        os.symlink(os.readlink(src), dst)
+        job.advance(1)
+        return
+    if not os.path.isdir(src):
+        _copy_file(job, src, dst)
+        return
+    os.makedirs(dst, exist_ok=True)
+    for dirpath, dirnames, filenames in os.walk(src):
+        rel = os.path.relpath(dirpath, src)
+        target_dir = os.path.normpath(os.path.join(dst, rel))
+        for name in dirnames:
+            s = os.path.join(dirpath, name)
+            if os.path.islink(s):
+                os.symlink(os.readlink(s), os.path.join(target_dir, name))
+            else:
+                os.makedirs(os.path.join(target_dir, name), exist_ok=True)
+        for name in filenames:
+            s = os.path.join(dirpath, name)
+            d = os.path.join(target_dir, name)
+            if os.path.islink(s):
+                os.symlink(os.readlink(s), d)
+                job.advance(1)
+            else:
+                _copy_file(job, s, d)
+        shutil.copystat(dirpath, target_dir)
+
+
+def _discard(path: str) -> None:
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def copy_path(job: Job, src: str, dst: str) -> Dict:
+    """Copy the file or tree `src` to `dst`; a partial copy is removed on failure."""
+    if os.path.lexists(dst):
+        raise FileExistsError(errno.EEXIST, "Destination already exists", dst)
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        _copy_tree(job, src, dst)
+    except BaseException:
+        _discard(dst)
+        raise
+    return {"files": job.files, "bytes": job.bytes}
+
+
+def _tree_size(path: str) -> Tuple[int, int]:
+    """Number of files (and symlinks) below `path` and their total size."""
+    if os.path.islink(path) or not os.path.isdir(path):
+        return 1, os.lstat(path).st_size
+    files = size = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for name in filenames + [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]:
+            files += 1
+            size += os.lstat(os.path.join(dirpath, name)).st_size
+    return files, size
+
+
+def move_path(job: Job, src: str, dst: str) -> Dict:
+    """Move `src` to `dst`; across filesystems this copies and then deletes."""
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.rename(src, dst)
+        return {"copied": False}
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    # Leaves the source untouched if the copy fails or is cancelled
+    copy_path(job, src, dst)
+    # The source is only deleted once the copy is known to be complete
+    if _tree_size(dst) != _tree_size(src):
+        _discard(dst)
+        raise OSError(errno.EIO, "Copy is incomplete; source kept", src)
+    if os.path.isdir(src) and not os.path.islink(src):
+        shutil.rmtree(src)
+    else:
+        os.remove(src)
+    return {"copied": True, "files": job.files, "bytes": job.bytes}
+
+
+def _item_error(e: Exception) -> str:
+    if isinstance(e, OSError) and e.strerror:
+        return e.strerror
+    return str(e) or e.__class__.__name__
+
+
+def _each(job: Job, op: Callable, items: List[Tuple]) -> List[Dict]:
+    """Apply `op(job, *args)` to every `(name, *args)`; one result per item."""
+    results = []
+    for name, *args in items:
+        try:
+            op(job, *args)
+            results.append({"path": name, "ok": True})
+        except JobCancelled:
+            raise
+        except Exception as e:
+            results.append({"path": name, "ok": False, "error": _item_error(e)})
+    return results
+
+
+def delete_paths(job: Job, items: List[Tuple[str, str]]) -> Dict:
+    """Recursively delete each `(name, path)`."""
+    results = _each(job, delete_tree, items)
+    return {"results": results, "deleted_files": job.files, "deleted_bytes": job.bytes}
+
+
+def move_paths(job: Job, items: List[Tuple[str, str, str]]) -> Dict:
+    """Move each `(name, src, dst)`."""
+    return {"results": _each(job, move_path, items), "files": job.files, "bytes": job.bytes}
+
+
+def copy_paths(job: Job, items: List[Tuple[str, str, str]]) -> Dict:
+    """Copy each `(name, src, dst)`."""
+    return {"results": _each(job, copy_path, items), "files": job.files, "bytes": job.bytes}
@@ -5,22 +5,76 @@ from flask import (
     redirect,
     url_for,
     flash,
-    send_from_directory,
     current_app,
     session,
     abort,
     jsonify,
+    Response,
+    send_file,
 )
 from werkzeug.utils import secure_filename
 from typing import Optional
 import json
-from . import allowed_file, require_api_key
+from . import allowed_file, conditional, require_api_key
 from .auth import get_user_role
+from .dedup import get_store as get_dedup_store
+from .dirsize import dir_sizes
+from .downloads import content_disposition, send_file_response
+from .fileops import copy_paths, delete_paths, delete_tree, move_path, move_paths
+from .fsutil import atomic_write
+from .jobs import JobQueueFull, get_manager as get_job_manager
+from .zipstream import iter_zip
+from .viewer import read_bytes, read_lines
+from .tail import followers, tail_lines
+from .thumbnails import (
+    IMAGE_EXTENSIONS,
+    ThumbnailBusy,
+    ThumbnailUnavailable,
+    get_cache as get_thumbnail_cache,
+)
+from .uploads import SESSIONS_DIRNAME, HashingTempFile, UploadError, UploadSessions
+import errno
+import fcntl
+import hashlib
 import os
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 files_bp = Blueprint("files", __name__)
 
 
+def _list_directory(target: str, base: str) -> list:
+    """Return sorted listing entries for directory `target`.
+
+    Folder sizes come from the background size cache: until the recursive size
+    of a folder has been computed its `size` is None and `size_status` is
+    "computing"; afterwards `size_status` is "ready".
+    """
+    entries = []
+    with os.scandir(target) as it:
+        dir_entries = sorted(it, key=lambda e: e.name)
+    for e in dir_entries:
+        if e.name == SESSIONS_DIRNAME:
+            # Internal state for resumable uploads
+            continue
+        stat = e.stat()
+        is_dir = e.is_dir()
+        entry = {
+            "name": e.name,
+            "is_dir": is_dir,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "path": os.path.relpath(e.path, base),
+        }
+        if is_dir:
+            size, ready = dir_sizes.lookup(e.path)
+            entry["size"] = size
+            entry["size_status"] = "ready" if ready else "computing"
+        entries.append(entry)
+    return entries
+
+
 @files_bp.route("/download/<path:filename>")
 @require_api_key
 def download_file(filename):
@@ -37,10 +91,45 @@ def download_file(filename):
         if get_user_role(session["user"]) != "admin":
             abort(403)
 
-    directory = os.path.dirname(safe_path) or storage_root
-    fname = os.path.basename(safe_path)
+    if os.path.isdir(safe_path):
+        rel = os.path.relpath(safe_path, os.path.abspath(storage_root))
+        return redirect(url_for("files.download_folder", subpath="" if rel == "." else rel))
+    if not os.path.isfile(safe_path):
+        abort(404)
     # Force download by sending as attachment
-    return send_from_directory(directory, fname, as_attachment=True)
+    return send_file_response(safe_path, storage_root, as_attachment=True)
+
+
+@files_bp.route("/download-zip/", defaults={"subpath": ""})
+@files_bp.route("/download-zip/<path:subpath>")
+@require_api_key
+def download_folder(subpath):
+    """Stream a folder as a ZIP archive while walking it (no temp files)."""
+    storage_root = current_app.config.get(
+        "STORAGE_ROOT", current_app.config["UPLOAD_FOLDER"]
+    )
+    base = os.path.abspath(storage_root)
+    target = os.path.abspath(os.path.join(base, subpath))
+    if not target.startswith(base):
+        abort(400)
+
+    # Same rule as single-file downloads
+    if session.get("user"):
+        if get_user_role(session["user"]) != "admin":
+            abort(403)
+
+    if not os.path.isdir(target):
+        abort(404)
+
+    name = os.path.basename(target) if target != base else "files"
+    value, names = content_disposition(f"{name}.zip", as_attachment=True)
+    resp = Response(
+        iter_zip(target, skip={SESSIONS_DIRNAME}),
+        mimetype="application/zip",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-store"},
+    )
+    resp.headers.set("Content-Disposition", value, **names)
+    return resp
 
 
 @files_bp.route("/open/<path:filename>")
@@ -59,9 +148,9 @@ def open_file(filename):
         if get_user_role(session["user"]) != "admin":
             abort(403)
 
-    directory = os.path.dirname(safe_path) or storage_root
-    fname = os.path.basename(safe_path)
-    return send_from_directory(directory, fname, as_attachment=False)
+    if not os.path.isfile(safe_path):
+        abort(404)
+    return send_file_response(safe_path, storage_root, as_attachment=False)
 
 
 @files_bp.route("/file-manager", methods=["GET", "POST"])
@@ -82,19 +171,7 @@ def file_manager():
         abort(400)
 
     if os.path.isdir(target):
-        entries = []
-        for name in sorted(os.listdir(target)):
-            path = os.path.join(target, name)
-            stat = os.stat(path)
-            entries.append(
-                {
-                    "name": name,
-                    "is_dir": os.path.isdir(path),
-                    "size": stat.st_size,
-                    "mtime": stat.st_mtime,
-                    "path": os.path.relpath(path, base),
-                }
-            )
+        entries = _list_directory(target, base)
 
         # Build breadcrumb
         relpath = os.path.relpath(target, base)
@@ -131,23 +208,43 @@ def api_list_files():
     if not os.path.isdir(target):
         return jsonify({"error": "Not a directory"}), 400
 
-    entries = []
-    for name in sorted(os.listdir(target)):
-        path = os.path.join(target, name)
-        stat = os.stat(path)
-        entries.append(
-            {
-                "name": name,
-                "is_dir": os.path.isdir(path),
-                "size": stat.st_size,
-                "mtime": stat.st_mtime,
-                "path": os.path.relpath(path, base),
-            }
-        )
+    etag = _listing_etag(target)
+    tag = conditional.match(etag) if etag else None
+    if tag is not None:
+        # Keep folder sizes refreshing; a change shows up in the next ETag
+        dir_sizes.request(target)
+        return conditional.not_modified(tag, weak=True)
 
-    return jsonify(
+    entries = _list_directory(target, base)
+
+    response = jsonify(
         {"entries": entries, "current_path": current_path, "base_path": base}
     )
+    if etag:
+        conditional.validated(response, etag, weak=True)
+    return response
+
+
+# A directory changed this recently may change again within the same mtime
+# tick (2 seconds on FAT-formatted SD cards), so it gets no validator yet
+LISTING_RACY_SECONDS = 2
+
+
+def _listing_etag(target: str) -> Optional[str]:
+    """Weak validator for a listing: the directory's inode and mtime plus the
+    folder-size cache version.
+
+    Adding, removing or renaming entries changes the mtime; files modified
+    in place (same name) do not, so their size and mtime may show stale
+    until the next change in the directory.
+    """
+    try:
+        st = os.stat(target)
+    except OSError:
+        return None
+    if time.time() - st.st_mtime < LISTING_RACY_SECONDS:
+        return None
+    return f"d{st.st_ino:x}-{st.st_mtime_ns:x}-{dir_sizes.epoch}-{dir_sizes.version}"
 
 
 @files_bp.route("/api/file/<path:filename>", methods=["GET"])
@@ -210,12 +307,21 @@ def api_get_file(filename):
             content_type = "binary"
             language = "plaintext"
 
-        # Read file content if it's text-based
+        # Read file content if it's text-based; large files are not sent
+        # whole and must be paged through /api/view instead
         content = ""
-        if content_type in ["text", "code"]:
+        st = os.stat(target)
+        size = st.st_size
+        too_large = size > current_app.config.get("EDITOR_MAX_BYTES", 2 * 1024 * 1024)
+        version = None
+        if content_type in ["text", "code"] and not too_large:
             try:
-                with open(target, "r", encoding="utf-8", errors="ignore") as f:
-                    content = f.read()
+                # Decoded without newline translation so edit offsets sent
+                # back to /api/save match the file on disk
+                with open(target, "rb") as f:
+                    raw = f.read()
+                content = raw.decode("utf-8", errors="ignore")
+                version = _content_version(raw)
             except Exception:
                 content = "Unable to read file content"
 
@@ -223,11 +329,13 @@ def api_get_file(filename):
             {
                 "name": os.path.basename(filename),
                 "path": filename,
-                "size": os.path.getsize(target),
+                "size": size,
                 "mtime": os.path.getmtime(target),
                 "type": content_type,
                 "language": language if content_type == "code" else "plaintext",
                 "content": content,
+                "too_large": too_large,
+                "version": version,
             }
         )
 
@@ -235,6 +343,206 @@ def api_get_file(filename):
         return jsonify({"error": str(e)}), 500
 
 
+@files_bp.route("/api/view/<path:filename>", methods=["GET"])
+@require_api_key
+def api_view_file(filename):
+    """Return a window of a file without loading it whole.
+
+    Query params (line mode is the default):
+      - line (int): 0-based first line; lines (int): number of lines
+      - offset (int) and length (int): byte window instead of lines
+    Windows are capped by VIEWER_MAX_LINES / VIEWER_MAX_BYTES.
+    """
+    storage_root = current_app.config.get(
+        "STORAGE_ROOT", current_app.config["UPLOAD_FOLDER"]
+    )
+    base = os.path.abspath(storage_root)
+
+    target = os.path.abspath(os.path.join(base, filename))
+    if not target.startswith(base):
+        return jsonify({"error": "Invalid path"}), 400
+
+    if not os.path.isfile(target):
+        return jsonify({"error": "File not found"}), 404
+
+    if session.get("user"):
+        if get_user_role(session["user"]) != "admin":
+            abort(403)
+
+    max_bytes = current_app.config.get("VIEWER_MAX_BYTES", 64 * 1024)
+    max_lines = current_app.config.get("VIEWER_MAX_LINES", 1000)
+    try:
+        if "offset" in request.args:
+            offset = int(request.args.get("offset", "0"))
+            length = int(request.args.get("length", str(max_bytes)))
+            window = read_bytes(target, offset, min(length, max_bytes))
+        else:
+            line = int(request.args.get("line", "0"))
+            lines = int(request.args.get("lines", "200"))
+            window = read_lines(
+                target,
+                line,
+                max(1, min(lines, max_lines)),
+                max_bytes,
+                current_app.config.get("CACHE_FOLDER"),
+                current_app.config.get("VIEWER_INDEX_THRESHOLD", 1024 * 1024),
+            )
+    except ValueError:
+        return jsonify({"error": "Invalid window"}), 400
+    except OSError as e:
+        current_app.logger.error(f"Error viewing file: {e}")
+        return jsonify({"error": "Unable to read file"}), 500
+
+    window["path"] = filename
+    window["mtime"] = os.path.getmtime(target)
+    return jsonify(window)
+
+
+@files_bp.route("/api/tail/<path:filename>", methods=["GET"])
+@require_api_key
+def api_tail_file(filename):
+    """Server-Sent Events stream of a file's last lines followed by appends.
+
+    Query params:
+      - lines (int): number of trailing lines sent first (default 50)
+      - offset (int): resume following from this byte offset instead of
+        sending a tail; the `Last-Event-ID` header is used the same way
+      - count (int): close after this many events (useful for tests)
+    Each `lines` event has `id:` set to the byte offset to resume from.
+    """
+    storage_root = current_app.config.get(
+        "STORAGE_ROOT", current_app.config["UPLOAD_FOLDER"]
+    )
+    base = os.path.abspath(storage_root)
+
+    target = os.path.abspath(os.path.join(base, filename))
+    if not target.startswith(base):
+        return jsonify({"error": "Invalid path"}), 400
+
+    if not os.path.isfile(target):
+        return jsonify({"error": "File not found"}), 404
+
+    if session.get("user"):
+        if get_user_role(session["user"]) != "admin":
+            abort(403)
+
+    try:
+        n_lines = int(request.args.get("lines", "50"))
+        resume = request.args.get("offset") or request.headers.get("Last-Event-ID")
+        resume = int(resume) if resume else None
+        count = request.args.get("count")
+        count = int(count) if count is not None else None
+    except ValueError:
+        return jsonify({"error": "Invalid parameters"}), 400
+    n_lines = max(0, min(n_lines, current_app.config.get("TAIL_MAX_LINES", 1000)))
+    interval = float(current_app.config.get("TAIL_POLL_INTERVAL", 0.5))
+    heartbeat = float(current_app.config.get("TAIL_HEARTBEAT", 15))
+
+    if resume is None or resume > os.path.getsize(target):
+        initial, offset = tail_lines(target, n_lines)
+    else:
+        initial, offset = [], resume
+
+    def event(payload: dict) -> str:
+        data = json.dumps(payload)
+        if payload.get("event") == "lines":
+            return f"id: {payload['offset']}\nevent: lines\ndata: {data}\n\n"
+        return f"event: {payload['event']}\ndata: {data}\n\n"
+
+    def event_stream():
+        sub = followers.subscribe(target, offset, interval=interval)
+        position = offset
+        sent = 0
+        try:
+            yield event({"event": "lines", "lines": initial, "offset": position})
+            sent += 1
+            while count is None or sent < count:
+                ev = sub.get(timeout=heartbeat)
+                if ev is None:
+                    if sub.lagged:
+                        yield event({"event": "lagged", "offset": position})
+                        return
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                if ev["event"] == "lines" and ev["offset"] <= position:
+                    # Already covered by this client's catch-up
+                    continue
+                position = ev["offset"]
+                yield event(ev)
+                sent += 1
+        except GeneratorExit:
+            return
+        finally:
+            sub.close()
+
+    return Response(
+        event_stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@files_bp.route("/api/thumb/<path:filename>", methods=["GET"])
+@require_api_key
+def api_thumbnail(filename):
+    """Return a cached thumbnail of an image.
+
+    Query params:
+      - size (int): longest edge in pixels, rounded up to a size bucket
+      - v: cache-busting version (e.g. the listing mtime); when present the
+        response is cacheable for a year since a changed image gets a new URL
+    """
+    storage_root = current_app.config.get(
+        "STORAGE_ROOT", current_app.config["UPLOAD_FOLDER"]
+    )
+    base = os.path.abspath(storage_root)
+
+    target = os.path.abspath(os.path.join(base, filename))
+    if not target.startswith(base):
+        return jsonify({"error": "Invalid path"}), 400
+
+    if not os.path.isfile(target):
+        return jsonify({"error": "File not found"}), 404
+
+    if os.path.splitext(target)[1].lower() not in IMAGE_EXTENSIONS:
+        return jsonify({"error": "Not an image"}), 400
+
+    if session.get("user"):
+        if get_user_role(session["user"]) != "admin":
+            abort(403)
+
+    try:
+        size = int(request.args.get("size", "256"))
+    except ValueError:
+        return jsonify({"error": "Invalid size"}), 400
+
+    cache = get_thumbnail_cache(
+        current_app.config.get("CACHE_FOLDER"),
+        current_app.config.get("THUMBNAIL_CACHE_BYTES", 64 * 1024 * 1024),
+        current_app.config.get("THUMBNAIL_WORKERS", 2),
+    )
+    try:
+        thumb_path, key = cache.get(target, size)
+    except ThumbnailUnavailable:
+        # No image library available: fall back to the original image
+        return send_file_response(target, storage_root, as_attachment=False)
+    except ThumbnailBusy:
+        resp = jsonify({"error": "Thumbnail queue full"})
+        resp.headers["Retry-After"] = "1"
+        return resp, 503
+    except Exception as e:
+        current_app.logger.error(f"Error creating thumbnail for {filename}: {e}")
+        return jsonify({"error": "Thumbnail failed"}), 500
+
+    resp = send_file(thumb_path, etag=key, conditional=True)
+    if request.args.get("v"):
+        resp.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+    else:
+        resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
 @files_bp.route("/api/upload", methods=["POST"])
 @require_api_key
 def api_upload_file():
@@ -271,26 +579,256 @@ def api_upload_file():
     file_path = os.path.join(target_path, filename)
 
     try:
-        file.save(file_path)
+        result = {"message": f'File "{filename}" uploaded successfully'}
+        if isinstance(file.stream, HashingTempFile):
+            # Body was streamed to disk once while parsing; just rename it
+            stream = file.stream
+            result["sha256"] = stream.hexdigest()
+            result["size"] = stream.size
+            if current_app.config.get("DEDUP_UPLOADS"):
+                # An uncommitted temp file is removed when the request closes it
+                result["deduplicated"] = get_dedup_store(base).store(
+                    result["sha256"], stream.size, file_path, lambda: stream.commit(file_path)
+                )
+            else:
+                stream.commit(file_path)
+        else:
+            file.save(file_path)
         current_app.logger.info(
             f'File "{filename}" uploaded successfully to {target_dir}'
         )
-        return jsonify({"message": f'File "{filename}" uploaded successfully'})
+        return jsonify(result)
     except Exception as e:
         current_app.logger.error(f"Error uploading file: {e}")
         return jsonify({"error": "Upload failed"}), 500
 
 
+def _upload_sessions() -> UploadSessions:
+    storage_root = current_app.config.get(
+        "STORAGE_ROOT", current_app.config["UPLOAD_FOLDER"]
+    )
+    return UploadSessions(
+        storage_root,
+        ttl=current_app.config.get("UPLOAD_SESSION_TTL", 86400),
+        hash_chunks=bool(current_app.config.get("DEDUP_UPLOADS")),
+        user=session.get("user"),
+    )
+
+
+def _upload_error_response(err: UploadError):
+    payload = {"error": err.message}
+    payload.update(err.extra)
+    return jsonify(payload), err.status
+
+
+def _session_payload(meta: dict) -> dict:
+    chunk_size = min(
+        int(current_app.config.get("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024)),
+        int(current_app.config.get("MAX_CONTENT_LENGTH") or 2**63),
+    )
+    return {
+        "id": meta["id"],
+        "filename": meta["filename"],
+        "size": meta.get("size"),
+        "offset": meta["offset"],
+        "chunk_size": chunk_size,
+    }
+
+
+@files_bp.route("/api/upload/session", methods=["POST"])
+@require_api_key
+def api_upload_session_create():
+    """Start a resumable upload.
+
+    JSON body: `{"path": <target dir>, "filename": <name>, "size": <bytes>}`.
+    Returns the session id, the current offset and the chunk size to use.
+    """
+    data = request.get_json(silent=True) or {}
+    filename = data.get("filename", "")
+    if not filename:
+        return jsonify({"error": "No file selected"}), 400
+    # Checked after sanitising, which may strip the name to nothing or drop
+    # its extension (e.g. "../.txt" becomes "txt")
+    filename = secure_filename(filename)
+    if not allowed_file(filename):
+        return jsonify({"error": "File type not allowed"}), 400
+
+    size = data.get("size")
+    if size is not None:
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid size"}), 400
+        if size < 0:
+            return jsonify({"error": "Invalid size"}), 400
+
+    target_dir = data.get("path", "") or ""
+    storage_root = current_app.config.get(
+        "STORAGE_ROOT", current_app.config["UPLOAD_FOLDER"]
+    )
+    base = os.path.abspath(storage_root)
+    if target_dir.startswith("/"):
+        target_dir = target_dir[1:]
+    target_path = os.path.abspath(os.path.join(base, target_dir))
+    if not target_path.startswith(base):
+        return jsonify({"error": "Invalid target directory"}), 400
+
+    meta = _upload_sessions().create(target_path, filename, size)
+    return jsonify(_session_payload(meta)), 201
+
+
+@files_bp.route("/api/upload/session/<session_id>", methods=["GET"])
+@require_api_key
+def api_upload_session_status(session_id):
+    """Return the number of bytes stored so far so a client can resume."""
+    try:
+        meta = _upload_sessions().get(session_id)
+    except UploadError as err:
+        return _upload_error_response(err)
+    return jsonify(_session_payload(meta))
+
+
+@files_bp.route("/api/upload/session/<session_id>", methods=["PUT"])
+@require_api_key
+def api_upload_session_chunk(session_id):
+    """Append one chunk (raw request body) at the `offset` query parameter."""
+    try:
+        offset = int(request.args.get("offset", ""))
+    except ValueError:
+        return jsonify({"error": "Missing offset"}), 400
+
+    try:
+        new_offset = _upload_sessions().append(session_id, offset, request.stream)
+    except UploadError as err:
+        return _upload_error_response(err)
+    return jsonify({"id": session_id, "offset": new_offset})
+
+
+@files_bp.route("/api/upload/session/<session_id>/complete", methods=["POST"])
+@require_api_key
+def api_upload_session_complete(session_id):
+    """Atomically move the finished upload into its target folder."""
+    dedup = None
+    if current_app.config.get("DEDUP_UPLOADS"):
+        dedup = get_dedup_store(
+            current_app.config.get("STORAGE_ROOT", current_app.config["UPLOAD_FOLDER"])
+        )
+    try:
+        result = _upload_sessions().complete(session_id, dedup=dedup)
+    except UploadError as err:
+        return _upload_error_response(err)
+    filename = os.path.basename(result.pop("path"))
+    current_app.logger.info(f'File "{filename}" uploaded successfully (resumable)')
+    result["message"] = f'File "{filename}" uploaded successfully'
+    return jsonify(result)
+
+
+@files_bp.route("/api/dedup", methods=["GET"])
+@require_api_key
+def api_dedup_stats():
+    """Report how much space upload dedup (DEDUP_UPLOADS) is saving."""
+    storage_root = current_app.config.get(
+        "STORAGE_ROOT", current_app.config["UPLOAD_FOLDER"]
+    )
+    stats = get_dedup_store(storage_root).stats()
+    stats["enabled"] = bool(current_app.config.get("DEDUP_UPLOADS"))
+    return jsonify(stats)
+
+
+@files_bp.route("/api/upload/session/<session_id>", methods=["DELETE"])
+@require_api_key
+def api_upload_session_abort(session_id):
+    """Discard an unfinished upload."""
+    try:
+        _upload_sessions().abort(session_id)
+    except UploadError as err:
+        return _upload_error_response(err)
+    return jsonify({"message": "Upload cancelled"})
+
+
+class _EditError(ValueError):
+    pass
+
+
+def _content_version(data: bytes) -> str:
+    """Version of a file's contents for /api/save conflict checks.
+
+    A hash rather than the mtime/size ETag, which misses same-size edits
+    made within one mtime tick.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+@contextmanager
+def _save_lock(path: str):
+    """Hold an exclusive lock for saving `path`, shared by all workers.
+
+    Lock files live under ``<CACHE_FOLDER>/locks``, named by a hash of the
+    path, so the file itself is never opened for locking.
+    """
+    directory = os.path.join(current_app.config["CACHE_FOLDER"], "locks")
+    os.makedirs(directory, exist_ok=True)
+    name = hashlib.sha1(path.encode("utf-8", "surrogateescape")).hexdigest() + ".lock"
+    with open(os.path.join(directory, name), "ab") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        yield
+
+
+def _apply_edits(text: str, edits: list) -> str:
+    """Apply ranged edits to `text` and return the result.
+
+    Each edit is `{"start": int, "end": int, "text": str}` with offsets in
+    UTF-16 code units (JavaScript string indices, as used by the editor),
+    relative to the original text. Edits must not overlap.
+    """
+    data = text.encode("utf-16-le")
+    length = len(data) // 2
+    parsed = []
+    for edit in edits:
+        try:
+            start, end = int(edit["start"]), int(edit["end"])
+            replacement = str(edit.get("text", ""))
+        except (KeyError, TypeError, ValueError):
+            raise _EditError("Invalid edit")
+        if not 0 <= start <= end <= length:
+            raise _EditError("Edit out of range")
+        parsed.append((start, end, replacement))
+    parsed.sort(key=lambda e: (e[0], e[1]))
+    for (_, prev_end, _), (start, _, _) in zip(parsed, parsed[1:]):
+        if start < prev_end:
+            raise _EditError("Overlapping edits")
+
+    out = []
+    pos = 0
+    for start, end, replacement in parsed:
+        out.append(data[pos * 2 : start * 2])
+        out.append(replacement.encode("utf-16-le"))
+        pos = end
+    out.append(data[pos * 2 :])
+    try:
+        return b"".join(out).decode("utf-16-le")
+    except UnicodeDecodeError:
+        raise _EditError("Edit splits a character")
+
+
 @files_bp.route("/api/save", methods=["POST"])
 @require_api_key
 def api_save_file():
-    """API endpoint to save file content"""
+    """API endpoint to save file content.
+
+    JSON body: `{"path": ..., "content": ...}` replaces the whole file, or
+    `{"path": ..., "version": ..., "edits": [...]}` applies ranged edits (see
+    `_apply_edits`) to the current file; `version` is required with `edits`.
+    When `version` (as returned by /api/file) is given and the file has
+    changed since, the save is rejected with 409 and the current version.
+    Saves of one file are serialised across workers, and files are written
+    atomically through any symlink, keeping the link, mode and owner.
+    """
     data = request.get_json()
-    if not data or "path" not in data or "content" not in data:
+    if not data or "path" not in data or ("content" not in data and "edits" not in data):
         return jsonify({"error": "Invalid request"}), 400
 
     file_path = data["path"]
-    content = data["content"]
 
     storage_root = current_app.config.get(
         "STORAGE_ROOT", current_app.config["UPLOAD_FOLDER"]
@@ -300,6 +838,16 @@ def api_save_file():
     target = os.path.abspath(os.path.join(base, file_path))
     if not target.startswith(base):
         return jsonify({"error": "Invalid path"}), 400
+    # Write through symlinks (replacing the link itself would turn it into a
+    # regular file), but only to files that still resolve inside storage
+    real_base = os.path.realpath(base)
+    target = os.path.realpath(target)
+    if os.path.commonpath([real_base, target]) != real_base:
+        return jsonify({"error": "Invalid path"}), 400
+
+    version = data.get("version")
+    if "edits" in data and (version is None or not isinstance(data["edits"], list)):
+        return jsonify({"error": "Invalid request"}), 400
 
     # Check if user is logged in and has admin role
     if session.get("user"):
@@ -307,10 +855,37 @@ def api_save_file():
             abort(403)
 
     try:
-        with open(target, "w", encoding="utf-8") as f:
-            f.write(content)
+        with _save_lock(target):
+            raw = None
+            if version is not None:
+                try:
+                    with open(target, "rb") as f:
+                        raw = f.read()
+                except FileNotFoundError:
+                    pass
+                current_version = None if raw is None else _content_version(raw)
+                if version != current_version:
+                    return jsonify({"error": "File changed on server", "version": current_version}), 409
+
+            if "edits" in data:
+                if raw is None:
+                    return jsonify({"error": "File not found"}), 404
+                try:
+                    original = raw.decode("utf-8")
+                except UnicodeDecodeError:
+                    # Offsets can't be mapped reliably; client should send content
+                    return jsonify({"error": "File is not valid UTF-8; send full content"}), 422
+                try:
+                    content = _apply_edits(original, data["edits"])
+                except _EditError as e:
+                    return jsonify({"error": str(e)}), 400
+            else:
+                content = data["content"]
+
+            encoded = content.encode("utf-8")
+            atomic_write(target, encoded)
         current_app.logger.info(f'File "{file_path}" saved successfully')
-        return jsonify({"message": "File saved successfully"})
+        return jsonify({"message": "File saved successfully", "version": _content_version(encoded)})
     except Exception as e:
         current_app.logger.error(f"Error saving file: {e}")
         return jsonify({"error": "Save failed"}), 500
@@ -346,18 +921,25 @@ def api_delete_file():
             abort(403)
 
     try:
-        if os.path.isfile(target):
+        # A symlink (even to a directory) is removed itself, never followed
+        if os.path.isfile(target) or os.path.islink(target):
             os.remove(target)
             current_app.logger.info(f'File "{file_path}" deleted successfully')
             return jsonify({"message": "File deleted successfully"})
         elif os.path.isdir(target):
-            # If recursive requested, remove directory tree
+            # If recursive requested, remove the tree in a background job
             if recursive:
-                import shutil
-
-                shutil.rmtree(target)
-                current_app.logger.info(f'Directory "{file_path}" recursively deleted')
-                return jsonify({"message": "Directory deleted recursively"})
+                try:
+                    job = _jobs().submit(
+                        "delete",
+                        lambda job: delete_tree(job, target),
+                        {"path": file_path},
+                        total_bytes=dir_sizes.cached(target),
+                    )
+                except JobQueueFull as e:
+                    return jsonify({"error": str(e)}), 503
+                current_app.logger.info(f'Directory "{file_path}" queued for deletion (job {job.id})')
+                return _job_accepted(job, "Directory deletion started")
             else:
                 try:
                     os.rmdir(target)
@@ -372,6 +954,297 @@ def api_delete_file():
         return jsonify({"error": "Delete failed"}), 500
 
 
+def _jobs():
+    cfg = current_app.config
+    return get_job_manager(cfg["CACHE_FOLDER"], cfg["JOB_WORKERS"], cfg["JOB_MAX_QUEUED"])
+
+
+def _job_accepted(job, message):
+    return (
+        jsonify(
+            {
+                "message": message,
+                "job_id": job.id,
+                "status_url": url_for("files.api_job_status", job_id=job.id),
+            }
+        ),
+        202,
+    )
+
+
+@files_bp.route("/api/jobs", methods=["GET"])
+@require_api_key
+def api_list_jobs():
+    """Recent background jobs (deletes, moves, copies) from all workers."""
+    # Jobs expose the paths of admin file operations
+    if session.get("user"):
+        if get_user_role(session["user"]) != "admin":
+            abort(403)
+
+    return jsonify({"jobs": _jobs().list()})
+
+
+@files_bp.route("/api/jobs/<job_id>", methods=["GET"])
+@require_api_key
+def api_job_status(job_id):
+    """Status, progress and result of one background job."""
+    # Check if user is logged in and has admin role
+    if session.get("user"):
+        if get_user_role(session["user"]) != "admin":
+            abort(403)
+
+    state = _jobs().get(job_id)
+    if state is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(state)
+
+
+@files_bp.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+@require_api_key
+def api_cancel_job(job_id):
+    """Ask a queued or running job to stop at its next progress update."""
+    # Check if user is logged in and has admin role
+    if session.get("user"):
+        if get_user_role(session["user"]) != "admin":
+            abort(403)
+
+    state = _jobs().cancel(job_id)
+    if state is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(state)
+
+
+def _batch_request():
+    """Parse a batch request, authorising and resolving the storage root once.
+
+    Returns `(data, base, error_response)`.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None, None, (jsonify({"error": "Invalid request"}), 400)
+
+    # Check if user is logged in and has admin role (once for the whole batch)
+    if session.get("user"):
+        if get_user_role(session["user"]) != "admin":
+            abort(403)
+
+    storage_root = current_app.config.get(
+        "STORAGE_ROOT", current_app.config["UPLOAD_FOLDER"]
+    )
+    return data, os.path.abspath(storage_root), None
+
+
+def _batch_target(base, rel):
+    """Absolute path for `rel` inside `base`, or None (never the root itself)."""
+    if not isinstance(rel, str) or not rel.strip("/"):
+        return None
+    target = os.path.abspath(os.path.join(base, rel))
+    if not target.startswith(base + os.sep):
+        return None
+    return target
+
+
+def _batch_pairs(data, base):
+    """Resolve the `(name, src, dst)` triples of a batch move/copy request.
+
+    Accepts `{"items": [{"from": ..., "to": ...}]}` or `{"paths": [...],
+    "destination": "folder"}`. Invalid entries come back as error results.
+    """
+    if isinstance(data.get("items"), list):
+        raw = [
+            (i.get("from"), i.get("to")) if isinstance(i, dict) else (None, None)
+            for i in data["items"]
+        ]
+    elif isinstance(data.get("paths"), list) and isinstance(data.get("destination", ""), str):
+        dest = data.get("destination", "").strip("/")
+        raw = [
+            (p, f"{dest}/{os.path.basename(p.rstrip('/'))}" if dest else os.path.basename(p.rstrip("/")))
+            if isinstance(p, str) else (p, None)
+            for p in data["paths"]
+        ]
+    else:
+        return None, None
+
+    pairs, errors = [], []
+    for src_rel, dst_rel in raw:
+        src, dst = _batch_target(base, src_rel), _batch_target(base, dst_rel)
+        if src is None or dst is None:
+            errors.append({"path": src_rel, "ok": False, "error": "Invalid path"})
+        elif dst == src or dst.startswith(src + os.sep):
+            errors.append({"path": src_rel, "ok": False, "error": "Cannot move or copy a folder into itself"})
+        elif not os.path.lexists(src):
+            errors.append({"path": src_rel, "ok": False, "error": "Not found"})
+        elif os.path.lexists(dst):
+            errors.append({"path": src_rel, "ok": False, "error": "Destination already exists"})
+        else:
+            pairs.append((src_rel, src, dst))
+    return pairs, errors
+
+
+def _batch_map(fn, items):
+    """Run `fn` over `items` on a few threads (filesystem calls release the GIL)."""
+    if not items:
+        return []
+    workers = max(1, min(len(items), current_app.config["BATCH_WORKERS"]))
+    if workers == 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pidash-batch") as pool:
+        return list(pool.map(fn, items))
+
+
+def _batch_response(results, job=None):
+    body = {
+        "results": results,
+        "succeeded": sum(1 for r in results if r.get("ok") is True),
+        "failed": sum(1 for r in results if r.get("ok") is False),
+    }
+    if job is None:
+        return jsonify(body)
+    body["job_id"] = job.id
+    body["status_url"] = url_for("files.api_job_status", job_id=job.id)
+    return jsonify(body), 202
+
+
+def _too_many(items):
+    limit = current_app.config["BATCH_MAX_ITEMS"]
+    if len(items) > limit:
+        return jsonify({"error": f"At most {limit} items per request"}), 413
+    return None
+
+
+@files_bp.route("/api/batch/delete", methods=["POST"])
+@require_api_key
+def api_batch_delete():
+    """Delete many paths in one request.
+
+    Body: `{"paths": [...], "recursive": true}`. Files and empty folders are
+    removed right away; non-empty folders (with `recursive`) are removed by
+    one background job whose id is returned, and their results show
+    `"ok": null` until it finishes.
+    """
+    data, base, error = _batch_request()
+    if error:
+        return error
+    paths = data.get("paths")
+    if not isinstance(paths, list):
+        return jsonify({"error": "Invalid request"}), 400
+    too_many = _too_many(paths)
+    if too_many:
+        return too_many
+    recursive = bool(data.get("recursive", False))
+
+    def delete_one(rel):
+        target = _batch_target(base, rel)
+        if target is None:
+            return {"path": rel, "ok": False, "error": "Invalid path"}
+        try:
+            if os.path.isdir(target) and not os.path.islink(target):
+                try:
+                    os.rmdir(target)
+                except OSError as e:
+                    if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                        raise
+                    if not recursive:
+                        return {"path": rel, "ok": False, "error": "Directory not empty"}
+                    return {"path": rel, "ok": None, "_target": target}
+            else:
+                os.remove(target)
+            return {"path": rel, "ok": True}
+        except FileNotFoundError:
+            return {"path": rel, "ok": False, "error": "Not found"}
+        except OSError as e:
+            return {"path": rel, "ok": False, "error": e.strerror or "Delete failed"}
+
+    results = _batch_map(delete_one, paths)
+    trees = [(r["path"], r.pop("_target")) for r in results if "_target" in r]
+    job = None
+    if trees:
+        try:
+            job = _jobs().submit(
+                "delete",
+                lambda job: delete_paths(job, trees),
+                {"paths": [name for name, _t in trees]},
+                total_bytes=sum(dir_sizes.cached(t) or 0 for _n, t in trees) or None,
+            )
+        except JobQueueFull as e:
+            for r in results:
+                if r["ok"] is None:
+                    r.update(ok=False, error=str(e))
+    current_app.logger.info(f"Batch delete of {len(paths)} item(s)")
+    return _batch_response(results, job)
+
+
+@files_bp.route("/api/batch/move", methods=["POST"])
+@require_api_key
+def api_batch_move():
+    """Move many paths in one request (see `_batch_pairs` for the body).
+
+    Renames within a filesystem happen right away; moves across filesystems
+    are copied and deleted by one background job.
+    """
+    data, base, error = _batch_request()
+    if error:
+        return error
+    pairs, results = _batch_pairs(data, base)
+    if pairs is None:
+        return jsonify({"error": "Invalid request"}), 400
+    too_many = _too_many(pairs + results)
+    if too_many:
+        return too_many
+
+    def move_one(item):
+        rel, src, dst = item
+        try:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            os.rename(src, dst)
+            return {"path": rel, "ok": True}
+        except OSError as e:
+            if e.errno == errno.EXDEV:
+                return {"path": rel, "ok": None, "_item": item}
+            return {"path": rel, "ok": False, "error": e.strerror or "Move failed"}
+
+    results += _batch_map(move_one, pairs)
+    slow = [r.pop("_item") for r in results if "_item" in r]
+    job = None
+    if slow:
+        try:
+            job = _jobs().submit(
+                "move", lambda job: move_paths(job, slow), {"paths": [i[0] for i in slow]}
+            )
+        except JobQueueFull as e:
+            for r in results:
+                if r["ok"] is None:
+                    r.update(ok=False, error=str(e))
+    current_app.logger.info(f"Batch move of {len(results)} item(s)")
+    return _batch_response(results, job)
+
+
+@files_bp.route("/api/batch/copy", methods=["POST"])
+@require_api_key
+def api_batch_copy():
+    """Copy many paths server-side in one background job (see `_batch_pairs`)."""
+    data, base, error = _batch_request()
+    if error:
+        return error
+    pairs, results = _batch_pairs(data, base)
+    if pairs is None:
+        return jsonify({"error": "Invalid request"}), 400
+    too_many = _too_many(pairs + results)
+    if too_many:
+        return too_many
+
+    job = None
+    if pairs:
+        try:
+            job = _jobs().submit(
+                "copy", lambda job: copy_paths(job, pairs), {"paths": [p[0] for p in pairs]}
+            )
+        except JobQueueFull as e:
+            return jsonify({"error": str(e)}), 503
+        results += [{"path": rel, "ok": None} for rel, _s, _d in pairs]
+    return _batch_response(results, job)
+
+
 @files_bp.route("/api/rename", methods=["POST"])
 @require_api_key
 def api_rename_file():
@@ -403,7 +1276,26 @@ def api_rename_file():
         if os.path.exists(old_target):
             # Ensure destination parent exists
             os.makedirs(os.path.dirname(new_target), exist_ok=True)
-            os.rename(old_target, new_target)
+            try:
+                os.rename(old_target, new_target)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                # Different filesystem: copy and delete in a background job
+                if os.path.isdir(old_target):
+                    total = dir_sizes.cached(old_target)
+                else:
+                    total = os.path.getsize(old_target)
+                try:
+                    job = _jobs().submit(
+                        "move",
+                        lambda job: move_path(job, old_target, new_target),
+                        {"old_path": old_path, "new_path": new_path},
+                        total_bytes=total,
+                    )
+                except JobQueueFull as exc:
+                    return jsonify({"error": str(exc)}), 503
+                return _job_accepted(job, "Move started")
             current_app.logger.info(
                 f'File "{old_path}" renamed to "{new_path}" successfully'
             )
@@ -550,18 +1442,7 @@ def browse(subpath):
         abort(400)
 
     if os.path.isdir(target):
-        entries = []
-        for name in sorted(os.listdir(target)):
-            path = os.path.join(target, name)
-            stat = os.stat(path)
-            entries.append(
-                {
-                    "name": name,
-                    "is_dir": os.path.isdir(path),
-                    "size": stat.st_size,
-                    "mtime": stat.st_mtime,
-                }
-            )
+        entries = _list_directory(target, base)
         # Build breadcrumb
         relpath = os.path.relpath(target, base)
         if relpath == ".":
@@ -0,0 +1,247 @@
+"""Fleet view: one PiDash instance polls the stats of other PiDash nodes.
+
+Peers are listed in ``FLEET_PEERS`` (``"name=http://host:port, ..."``; the
+name defaults to the host). Each peer has its own poller thread holding one
+keep-alive HTTP connection, so a slow or unreachable node only ever delays
+its own updates. Every ``FLEET_POLL_INTERVAL`` seconds the poller fetches
+``/api/stats``, and every ``FLEET_HISTORY_INTERVAL`` seconds also
+``/api/stats/history``. Each request is bounded by ``FLEET_TIMEOUT``.
+
+`Fleet.snapshot` never waits for the network: it returns the last-known
+state of every peer (with its age and the last error, if any). Pollers are
+started by the first snapshot request and stop again after
+``FLEET_IDLE_SECONDS`` without one, so an unwatched fleet page costs
+nothing.
+"""
+import gzip
+import http.client
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+# Errors that mean the peer closed an idle keep-alive connection; the
+# request is retried once on a fresh connection
+_STALE_CONNECTION = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+
+class PeerError(Exception):
+    pass
+
+
+def parse_peers(spec: Union[str, List, None]) -> List[Tuple[str, str]]:
+    """Parse ``"name=url, url"`` (or a list of urls / (name, url) pairs)."""
+    if not spec:
+        return []
+    items = spec.replace(";", ",").split(",") if isinstance(spec, str) else spec
+    peers = []
+    for item in items:
+        if isinstance(item, (list, tuple)):
+            name, url = item
+        else:
+            item = item.strip()
+            if not item:
+                continue
+            name, sep, url = item.partition("=")
+            if not sep or "://" in name:
+                name, url = "", item
+        url = url.strip().rstrip("/")
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Invalid fleet peer URL: {url!r}")
+        peers.append((name.strip() or parts.hostname, url))
+    return peers
+
+
+class PeerPoller:
+    """Polls one peer over a persistent connection and keeps its last state."""
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        api_key: Optional[str] = None,
+        timeout: float = 3.0,
+        history_minutes: int = 5,
+        history_step: int = 10,
+    ):
+        self.name = name
+        self.url = url
+        parts = urlsplit(url)
+        self._https = parts.scheme == "https"
+        self._host = parts.hostname
+        self._port = parts.port
+        self._base = parts.path.rstrip("/")
+        self.api_key = api_key
+        self.timeout = float(timeout)
+        self.history_path = f"/api/stats/history?minutes={int(history_minutes)}&step={int(history_step)}"
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self._lock = threading.Lock()
+        self._state: Dict = {
+            "name": name,
+            "url": url,
+            "status": "pending",
+            "stats": None,
+            "history": None,
+            "error": None,
+            "latency_ms": None,
+            "updated": None,
+            "checked": None,
+        }
+
+    def _connection(self) -> Tuple[http.client.HTTPConnection, bool]:
+        if self._conn is not None:
+            return self._conn, True
+        cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+        self._conn = cls(self._host, self._port, timeout=self.timeout)
+        return self._conn, False
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _get_json(self, path: str):
+        headers = {"Accept": "application/json", "Accept-Encoding": "gzip"}
+        if self.api_key:
+            headers["X-API-KEY"] = self.api_key
+        while True:
+            conn, reused = self._connection()
+            try:
+                conn.request("GET", self._base + path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except _STALE_CONNECTION:
+                self.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                self.close()
+                raise
+            if response.will_close:
+                self.close()
+            if response.status != 200:
+                raise PeerError(f"HTTP {response.status} from {path}")
+            if response.getheader("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            return json.loads(body)
+
+    def poll(self, history: bool = False) -> bool:
+        """Fetch stats (and history) once; returns True on success."""
+        started = time.monotonic()
+        try:
+            stats = self._get_json("/api/stats")
+            samples = self._get_json(self.history_path).get("samples") if history else None
+        except Exception as e:
+            with self._lock:
+                self._state.update(
+                    status="unreachable", error=str(e) or e.__class__.__name__, checked=time.time()
+                )
+            return False
+        latency = (time.monotonic() - started) * 1000
+        now = time.time()
+        with self._lock:
+            self._state.update(
+                status="ok", stats=stats, error=None, latency_ms=round(latency, 1), updated=now, checked=now
+            )
+            if samples is not None:
+                self._state["history"] = samples
+        return True
+
+    def state(self) -> Dict:
+        with self._lock:
+            state = dict(self._state)
+        state["age"] = None if state["updated"] is None else round(time.time() - state["updated"], 1)
+        return state
+
+
+class Fleet:
+    def __init__(
+        self,
+        peers: List[Tuple[str, str]],
+        api_key: Optional[str] = None,
+        timeout: float = 3.0,
+        interval: float = 5.0,
+        history_interval: float = 30.0,
+        history_minutes: int = 5,
+        idle: float = 120.0,
+    ):
+        self.interval = float(interval)
+        self.history_interval = float(history_interval)
+        self.idle = float(idle)
+        self.pollers = [
+            PeerPoller(name, url, api_key, timeout, history_minutes, max(1, int(self.interval)))
+            for name, url in peers
+        ]
+        self._threads: Dict[str, threading.Thread] = {}
+        self._last_access = 0.0
+        self._lock = threading.Lock()
+
+    def _run(self, poller: PeerPoller) -> None:
+        next_history = 0.0
+        try:
+            while time.monotonic() - self._last_access < self.idle:
+                started = time.monotonic()
+                history = started >= next_history
+                if poller.poll(history=history) and history:
+                    next_history = started + self.history_interval
+                time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+        except Exception:
+            logging.getLogger(__name__).exception("Fleet poller for %s failed", poller.name)
+        finally:
+            poller.close()
+
+    def ensure_polling(self) -> None:
+        """(Re)start the poller threads that are not running."""
+        with self._lock:
+            self._last_access = time.monotonic()
+            for poller in self.pollers:
+                thread = self._threads.get(poller.url)
+                if thread is None or not thread.is_alive():
+                    thread = threading.Thread(
+                        target=self._run, args=(poller,), daemon=True, name=f"pidash-fleet-{poller.name}"
+                    )
+                    self._threads[poller.url] = thread
+                    thread.start()
+
+    def snapshot(self) -> Dict:
+        """Last-known state of every peer; never waits for a peer."""
+        self.ensure_polling()
+        nodes = [poller.state() for poller in self.pollers]
+        return {
+            "generated": time.time(),
+            "interval": self.interval,
+            "nodes": nodes,
+            "summary": {
+                "total": len(nodes),
+                "ok": sum(1 for n in nodes if n["status"] == "ok"),
+                "unreachable": sum(1 for n in nodes if n["status"] == "unreachable"),
+            },
+        }
+
+
+_fleets: Dict[tuple, Fleet] = {}
+_fleets_lock = threading.Lock()
+
+
+def get_fleet(config) -> Fleet:
+    """Return the process-wide fleet for the FLEET_* settings in `config`."""
+    peers = tuple(parse_peers(config.get("FLEET_PEERS")))
+    key = (
+        peers,
+        config.get("FLEET_API_KEY") or None,
+        float(config.get("FLEET_TIMEOUT", 3)),
+        float(config.get("FLEET_POLL_INTERVAL", 5)),
+        float(config.get("FLEET_HISTORY_INTERVAL", 30)),
+        int(config.get("FLEET_HISTORY_MINUTES", 5)),
+        float(config.get("FLEET_IDLE_SECONDS", 120)),
+    )
+    with _fleets_lock:
+        fleet = _fleets.get(key)
+        if fleet is None:
+            fleet = Fleet(list(peers), *key[1:])
+            _fleets[key] = fleet
+        return fleet
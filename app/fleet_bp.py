@@ -0,0 +1,20 @@
+from flask import Blueprint, render_template, jsonify, current_app
+from . import require_api_key
+from .fleet import get_fleet
+
+fleet_bp = Blueprint('fleet', __name__)
+
+
+@fleet_bp.route('/api/fleet')
+@require_api_key
+def api_fleet():
+    # Served from the pollers' last-known state; never waits on a peer
+    return jsonify(get_fleet(current_app.config).snapshot())
+
+
+@fleet_bp.route('/fleet')
+@require_api_key
+def fleet():
+    fleet = get_fleet(current_app.config)
+    fleet.ensure_polling()
+    return render_template('fleet.html', interval=fleet.interval, peers=len(fleet.pollers))
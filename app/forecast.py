@@ -0,0 +1,185 @@
+"""Disk fill-rate forecasts ("time until full") per mount.
+
+The sampler feeds each tick's used bytes into a per-minute rollup per mount.
+Every closed minute becomes one point of a sliding-window least-squares fit
+(used bytes against time) kept as running sums, so both the rollup and the
+regression update in O(1) per sample and a forecast never rescans raw
+samples. The slope is the fill rate; extrapolating the fitted line to the
+space PiDash can actually use (used plus free to unprivileged users, which
+leaves out the blocks ext4 reserves for root, ~5% by default) gives the
+time until it is full.
+"""
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+ROLLUP_SECONDS = 60
+
+
+class LinearTrend:
+    """Least-squares line through the points of the last `window` seconds.
+
+    Sums are kept relative to an origin point so the fit stays precise with
+    epoch timestamps and byte counts, and are rebuilt (with a new origin)
+    once per window's worth of evictions so rounding does not accumulate.
+    """
+
+    def __init__(self, window: float):
+        self.window = float(window)
+        self._points: Deque[Tuple[float, float]] = deque()
+        self._reset(None)
+
+    def _reset(self, origin: Optional[Tuple[float, float]]) -> None:
+        self._origin = origin
+        self._n = 0
+        self._sx = self._sy = self._sxx = self._sxy = 0.0
+        self._evicted = 0
+
+    def _accumulate(self, x: float, y: float, sign: int) -> None:
+        x -= self._origin[0]
+        y -= self._origin[1]
+        self._n += sign
+        self._sx += sign * x
+        self._sy += sign * y
+        self._sxx += sign * x * x
+        self._sxy += sign * x * y
+
+    def add(self, x: float, y: float) -> None:
+        if self._origin is None:
+            self._reset((x, y))
+        self._points.append((x, y))
+        self._accumulate(x, y, 1)
+        while self._points and self._points[0][0] <= x - self.window:
+            self._accumulate(*self._points.popleft(), -1)
+            self._evicted += 1
+        if self._evicted >= len(self._points):
+            self._reset(self._points[0])
+            for point in self._points:
+                self._accumulate(*point, 1)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def fit(self) -> Optional[Tuple[float, float]]:
+        """``(slope, value at the newest point)`` of the fitted line, or None."""
+        n = self._n
+        denom = n * self._sxx - self._sx * self._sx
+        if n < 2 or denom <= 0:
+            return None
+        slope = (n * self._sxy - self._sx * self._sy) / denom
+        intercept = (self._sy - slope * self._sx) / n
+        x = self._points[-1][0] - self._origin[0]
+        return slope, self._origin[1] + intercept + slope * x
+
+
+class MinuteRollup:
+    """Average of the samples of the current ROLLUP_SECONDS bucket."""
+
+    def __init__(self):
+        self.bucket: Optional[int] = None
+        self._ts = 0.0
+        self._sum = 0.0
+        self._count = 0
+
+    def add(self, ts: float, value: float) -> Optional[Tuple[float, float]]:
+        """Add a sample; returns ``(mean ts, mean value)`` when a bucket closes."""
+        bucket = int(ts // ROLLUP_SECONDS)
+        closed = None
+        if bucket != self.bucket:
+            if self._count:
+                closed = (self._ts / self._count, self._sum / self._count)
+            self.bucket, self._ts, self._sum, self._count = bucket, 0.0, 0.0, 0
+        self._ts += ts
+        self._sum += value
+        self._count += 1
+        return closed
+
+
+class DiskForecast:
+    def __init__(self, mounts: List[str], window_minutes: float = 360, min_minutes: float = 10):
+        self.mounts = list(mounts)
+        self.min_points = max(2, int(min_minutes))
+        self._rollups = {m: MinuteRollup() for m in self.mounts}
+        self._trends = {m: LinearTrend(window_minutes * 60) for m in self.mounts}
+        self._capacity: Dict[str, int] = {}
+        self._snapshot: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def measure(mounts: List[str]) -> Dict[str, Tuple[int, int]]:
+        import psutil
+
+        usage = {}
+        for mount in mounts:
+            try:
+                du = psutil.disk_usage(mount)
+            except OSError:
+                continue
+            # free, not total - used: it excludes the root-reserved blocks
+            usage[mount] = (du.used, du.free)
+        return usage
+
+    def observe(self, ts: Optional[float] = None, usage: Optional[Dict[str, Tuple[int, int]]] = None) -> Dict:
+        """Feed one sample of ``{mount: (used, free)}`` (measured if omitted).
+
+        Returns the current forecast; it only changes when a minute closes,
+        so the same dict is returned (and shared by samples) until then.
+        """
+        ts = time.time() if ts is None else ts
+        if usage is None:
+            usage = self.measure(self.mounts)
+        with self._lock:
+            changed = False
+            for mount, (used, free) in usage.items():
+                if mount not in self._rollups:
+                    continue
+                self._capacity[mount] = used + free
+                closed = self._rollups[mount].add(ts, used)
+                if closed is not None:
+                    self._trends[mount].add(*closed)
+                    changed = True
+            if changed or not self._snapshot:
+                self._snapshot = {m: self._estimate(m) for m in self.mounts if m in self._capacity}
+            return self._snapshot
+
+    def _estimate(self, mount: str) -> Dict:
+        trend = self._trends[mount]
+        capacity = self._capacity[mount]
+        fit = trend.fit() if len(trend) >= self.min_points else None
+        if fit is None:
+            return {"bytes_per_hour": None, "seconds_until_full": None, "minutes": len(trend)}
+        slope, used = fit
+        # A shrinking or flat disk never fills up
+        until_full = max(0.0, (capacity - used) / slope) if slope > 0 else None
+        return {
+            "bytes_per_hour": slope * 3600,
+            "seconds_until_full": until_full,
+            "minutes": len(trend),
+        }
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return self._snapshot
+
+
+_forecasts: Dict[tuple, DiskForecast] = {}
+_forecasts_lock = threading.Lock()
+
+
+def get_forecast(config) -> Optional[DiskForecast]:
+    """Return the process-wide forecast for the DISK_FORECAST_* settings (None when disabled)."""
+    mounts = tuple(m.strip() for m in (config.get("DISK_FORECAST_MOUNTS") or "").split(",") if m.strip())
+    if not mounts:
+        return None
+    key = (
+        mounts,
+        float(config.get("DISK_FORECAST_WINDOW_MINUTES", 360)),
+        float(config.get("DISK_FORECAST_MIN_MINUTES", 10)),
+    )
+    with _forecasts_lock:
+        forecast = _forecasts.get(key)
+        if forecast is None:
+            forecast = DiskForecast(list(mounts), key[1], key[2])
+            _forecasts[key] = forecast
+        return forecast
@@ -0,0 +1,186 @@
+"""Small filesystem helpers shared by the app modules."""
+import copy
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; SlotFiles then only count within a process
+    fcntl = None
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Replace `path` with `data` so readers see either the old or new file.
+
+    The data is written to a temp file in the same directory, fsynced and
+    renamed over `path`. The previous file's permission bits are kept, and
+    so are its owner and group where this process may set them.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        st = os.stat(path)
+    except OSError:
+        st = None
+    fd, tmp = tempfile.mkstemp(prefix="." + os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        if st is not None:
+            try:
+                os.chown(tmp, st.st_uid, st.st_gid)
+            except OSError:
+                pass
+            # After chown, which may clear setuid/setgid bits
+            os.chmod(tmp, st.st_mode & 0o7777)
+        else:
+            # mkstemp creates 0600; use the usual umask-based default instead
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp, 0o666 & ~umask)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    # Persist the rename itself
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+class CachedJsonFile:
+    """A JSON file parsed once and re-read only when it changes on disk.
+
+    Each read costs one `stat`; the document is parsed again only when the
+    file's inode, mtime or size differ from the cached copy. Since writers
+    replace the file with `atomic_write`, a new inode shows up in every
+    worker process without any signalling. A missing or unreadable file
+    reads as `default()`; if a file that was read before becomes
+    unparsable (e.g. edited by hand), the last good document is kept.
+    """
+
+    def __init__(self, path: str, default: Callable[[], Any] = dict, indent: Optional[int] = None):
+        self.path = path
+        self.default = default
+        self.indent = indent
+        self._key: Optional[Tuple[int, int, int]] = None
+        self._doc: Any = None
+        self._lock = threading.Lock()
+
+    def _stat_key(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def get(self) -> Any:
+        """The cached document; shared, so callers must not modify it."""
+        key = self._stat_key()
+        with self._lock:
+            if key is None:
+                self._key, self._doc = None, None
+                return self.default()
+            if key == self._key:
+                return self._doc
+            try:
+                with open(self.path, "rb") as fh:
+                    doc = json.load(fh)
+            except (OSError, ValueError):
+                return self.default() if self._doc is None else self._doc
+            self._key, self._doc = key, doc
+            return doc
+
+    def load(self) -> Any:
+        """A private copy of the document that the caller may modify."""
+        return copy.deepcopy(self.get())
+
+    def save(self, doc: Any) -> None:
+        """Atomically replace the file with `doc` and cache it."""
+        data = json.dumps(doc, indent=self.indent).encode()
+        with self._lock:
+            atomic_write(self.path, data)
+            self._key = self._stat_key()
+            self._doc = copy.deepcopy(doc)
+
+
+_json_files: Dict[Tuple[str, Optional[int]], CachedJsonFile] = {}
+_json_files_lock = threading.Lock()
+
+
+def get_json_file(path: str, indent: Optional[int] = None) -> CachedJsonFile:
+    """Return the process-wide cached view of the JSON file at `path`."""
+    key = (os.path.abspath(path), indent)
+    with _json_files_lock:
+        cached = _json_files.get(key)
+        if cached is None:
+            cached = CachedJsonFile(key[0], indent=indent)
+            _json_files[key] = cached
+        return cached
+
+
+class SlotFiles:
+    """At most `count` concurrent holders across every process on the host.
+
+    Slot ``i`` is the file ``<directory>/slot-<i>.lock``, and holding it
+    means holding an exclusive `flock` on it. `try_acquire` never waits: it
+    tries each slot with ``LOCK_NB``. Locks belong to open file
+    descriptions, so threads of one process compete for slots as well, and
+    the kernel drops them when a process dies, so a crashed worker cannot
+    leak a slot. Without a directory (or without fcntl) the slots are a
+    semaphore shared by this process only.
+    """
+
+    def __init__(self, directory: Optional[str], count: int):
+        self.count = max(1, int(count))
+        self.directory = directory if fcntl is not None else None
+        self._local = threading.BoundedSemaphore(self.count)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def try_acquire(self) -> Optional[Callable[[], None]]:
+        """Take a free slot; returns the function that releases it, or None."""
+        if not self.directory:
+            if not self._local.acquire(blocking=False):
+                return None
+            return _once(self._local.release)
+        for i in range(self.count):
+            fd = os.open(os.path.join(self.directory, f"slot-{i}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            # Closing the descriptor releases the lock
+            return _once(lambda: os.close(fd))
+        return None
+
+
+def _once(func: Callable[[], None]) -> Callable[[], None]:
+    """Wrap `func` so that only its first call has an effect."""
+    lock = threading.Lock()
+    done = []
+
+    def wrapper():
+        with lock:
+            if done:
+                return
+            done.append(True)
+        func()
+
+    return wrapper
@@ -0,0 +1,261 @@
+"""Background jobs for long-running file operations.
+
+Recursive deletes, moves across filesystems and similar work run on a small
+bounded thread pool instead of inside the request. `JobManager.submit`
+returns a `Job` straight away; the operation reports progress (files and
+bytes processed) through `Job.advance`, which is also where cancellation is
+checked.
+
+Job state is mirrored to a small JSON file per job under
+``<CACHE_FOLDER>/jobs`` so that any gunicorn worker can answer a status
+request, and cancelling a job that runs in another worker drops a
+``<id>.cancel`` marker that the owning worker picks up on its next progress
+update. Finished jobs are kept for `retention` seconds.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = {DONE, FAILED, CANCELLED}
+
+# How often a running job writes its progress and looks for a cancel marker
+SAVE_INTERVAL = 0.5
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting for a worker."""
+
+
+class Job:
+    def __init__(self, manager: "JobManager", kind: str, params: Dict):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = QUEUED
+        self.files = 0
+        self.bytes = 0
+        self.total_files: Optional[int] = None
+        self.total_bytes: Optional[int] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._manager = manager
+        self._cancel = threading.Event()
+        self._last_save = 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "progress": {
+                "files": self.files,
+                "bytes": self.bytes,
+                "total_files": self.total_files,
+                "total_bytes": self.total_bytes,
+            },
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+    def advance(self, files: int = 0, nbytes: int = 0) -> None:
+        """Record progress; raises JobCancelled if the job was cancelled."""
+        self.files += files
+        self.bytes += nbytes
+        if self._cancel.is_set():
+            raise JobCancelled()
+        now = time.monotonic()
+        if now - self._last_save >= SAVE_INTERVAL:
+            self._last_save = now
+            if self._manager._cancel_marked(self.id):
+                self._cancel.set()
+                raise JobCancelled()
+            self._manager._save(self)
+
+
+class JobManager:
+    def __init__(self, state_dir: str, workers: int = 2, max_queued: int = 64, retention: int = 3600):
+        self.state_dir = state_dir
+        self.max_queued = int(max_queued)
+        self.retention = int(retention)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="pidash-job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def _state_path(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, job_id + ".json")
+
+    def _save(self, job: Job) -> None:
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = self._state_path(job.id)
+        tmp = path + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w") as fh:
+                json.dump(job.to_dict(), fh)
+            os.replace(tmp, path)
+        except OSError:
+            logging.getLogger(__name__).exception("Could not save state of job %s", job.id)
+
+    def _cancel_marked(self, job_id: str) -> bool:
+        return os.path.exists(os.path.join(self.state_dir, job_id + ".cancel"))
+
+    def submit(
+        self,
+        kind: str,
+        fn: Callable[[Job], Optional[Dict]],
+        params: Optional[Dict] = None,
+        total_files: Optional[int] = None,
+        total_bytes: Optional[int] = None,
+    ) -> Job:
+        """Queue `fn(job)` and return the job; its return value becomes the result.
+
+        `total_files`/`total_bytes` are optional estimates shown with progress.
+        """
+        job = Job(self, kind, params or {})
+        job.total_files = total_files
+        job.total_bytes = total_bytes
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if j.status == QUEUED)
+            if pending >= self.max_queued:
+                raise JobQueueFull("Too many jobs queued")
+            self._jobs[job.id] = job
+        self._save(job)
+        self._pool.submit(self._run, job, fn)
+        self.cleanup()
+        return job
+
+    def _run(self, job: Job, fn: Callable[[Job], Optional[Dict]]) -> None:
+        if job._cancel.is_set() or self._cancel_marked(job.id):
+            job.status = CANCELLED
+        else:
+            job.status = RUNNING
+            job.started = time.time()
+            self._save(job)
+            try:
+                job.result = fn(job)
+                job.status = DONE
+            except JobCancelled:
+                job.status = CANCELLED
+            except Exception as e:
+                logging.getLogger(__name__).exception("Job %s (%s) failed", job.id, job.kind)
+                job.status = FAILED
+                job.error = str(e) or e.__class__.__name__
+        job.finished = time.time()
+        self._save(job)
+        try:
+            os.remove(os.path.join(self.state_dir, job.id + ".cancel"))
+        except OSError:
+            pass
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return the state of `job_id`, whichever worker process runs it."""
+        if not _JOB_ID.fullmatch(job_id or ""):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        try:
+            with open(self._state_path(job_id)) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """Request cancellation; returns the job state or None if unknown."""
+        state = self.get(job_id)
+        if state is None or state["status"] in FINISHED:
+            return state
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            job._cancel.set()
+        else:
+            # Owned by another worker process; it checks for this marker
+            try:
+                with open(os.path.join(self.state_dir, job_id + ".cancel"), "w"):
+                    pass
+            except OSError:
+                return state
+        state["cancel_requested"] = True
+        return state
+
+    def list(self, limit: int = 50) -> List[Dict]:
+        """Most recent jobs first, from all worker processes."""
+        states = []
+        try:
+            names = os.listdir(self.state_dir)
+        except OSError:
+            names = []
+        for name in names:
+            if name.endswith(".json"):
+                state = self.get(name[:-5])
+                if state is not None:
+                    states.append(state)
+        states.sort(key=lambda s: s.get("created") or 0, reverse=True)
+        return states[:limit]
+
+    def wait(self, job_id: str, timeout: float = 10.0) -> Optional[Dict]:
+        """Block until `job_id` finishes (mainly for tests and scripts)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            state = self.get(job_id)
+            if state is None or state["status"] in FINISHED or time.monotonic() >= deadline:
+                return state
+            time.sleep(0.02)
+
+    def cleanup(self) -> None:
+        """Forget finished jobs older than the retention period."""
+        cutoff = time.time() - self.retention
+        with self._lock:
+            for job_id, job in list(self._jobs.items()):
+                if job.finished is not None and job.finished < cutoff:
+                    del self._jobs[job_id]
+        try:
+            names = os.listdir(self.state_dir)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.state_dir, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+
+
+_managers: Dict[tuple, JobManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(cache_dir: str, workers: int, max_queued: int = 64) -> JobManager:
+    """Return the process-wide job manager for this configuration."""
+    key = (os.path.abspath(cache_dir), int(workers), int(max_queued))
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = JobManager(os.path.join(cache_dir, "jobs"), workers, max_queued)
+            _managers[key] = manager
+        return manager
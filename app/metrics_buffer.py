@@ -4,9 +4,11 @@ This is intentionally lightweight and dependency-free. It stores timestamped
 metric samples in a deque and provides a simple aggregation endpoint to
 produce time-bucketed averages suitable for Chart.js.
 """
+import os
 import time
+import uuid
 from collections import deque
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
 
 class MetricsBuffer:
@@ -16,14 +18,35 @@ class MetricsBuffer:
         # Add a small safety margin (+2) to avoid off-by-one evictions
         self.maxlen = int(self.max_seconds / max(1e-6, self.sample_interval)) + 2
         self._dq = deque(maxlen=self.maxlen)
+        # Sequence number of the latest sample; `epoch` tells buffers in
+        # different worker processes apart so validators built from `seq`
+        # never collide
+        self._nonce = uuid.uuid4().hex[:8]
+        self.seq = 0
+
+    @property
+    def epoch(self) -> str:
+        # Includes the pid: workers forked from a preloaded app inherit the
+        # buffer (nonce and seq included) but then record their own samples
+        return f"{os.getpid():x}-{self._nonce}"
 
     def append_sample(self, sample: Dict[str, Any], ts: Optional[float] = None) -> None:
         item = dict(sample) if isinstance(sample, dict) else {"value": sample}
         item["ts"] = ts if ts is not None else time.time()
         self._dq.append(item)
+        self.seq += 1
 
     def clear(self) -> None:
         self._dq.clear()
+        self.seq += 1
+
+    def latest(self) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """Return ``(seq, sample)`` for the newest sample (sample is None if empty)."""
+        seq = self.seq
+        try:
+            return seq, self._dq[-1]
+        except IndexError:
+            return seq, None
 
     def get_history(self, minutes: int = 5, step: int = 1) -> List[Dict[str, Any]]:
         """Return aggregated history for the last `minutes` minutes, bucketed by `step` seconds.
@@ -0,0 +1,114 @@
+"""Password verification off the request threads.
+
+Checking a password hash is deliberately slow (PBKDF2 with 600k iterations
+takes a few hundred milliseconds of CPU on a Pi). `PasswordVerifier` runs
+the checks on a small thread pool (hashlib releases the GIL while hashing)
+and admits at most ``workers + max_pending`` of them at once across all
+processes on the host; beyond that `verify` raises `VerifierBusy` straight
+away instead of queueing. Admission uses flock'd slot files (see
+`SlotFiles`), so a crashed worker cannot leak a slot.
+
+How this plays out depends on the gunicorn worker class:
+
+- sync workers (the docker-compose setup) run one request per process, so
+  the per-process pool never queues and the request's worker is busy for
+  the whole check. The host-wide admission is what keeps a burst of logins
+  or a brute-force attempt from tying up every worker: keep
+  ``workers + max_pending`` below the gunicorn ``--workers`` count.
+- threaded workers (gthread, the dev server) queue checks from all of a
+  process's threads on its pool, so at most ``workers`` hash at once per
+  process, and admission still bounds the total on the host.
+
+Hashes record the method they were made with (``pbkdf2:sha256:600000$...``).
+When a password checks out against a hash made with a method other than
+the configured ``PASSWORD_HASH_METHOD``, the verifier also returns a new
+hash so the caller can store it (rehash on login).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+from .fsutil import SlotFiles
+
+DEFAULT_METHOD = f"pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}"
+
+
+class VerifierBusy(Exception):
+    """Raised when too many password checks are already running or waiting."""
+
+
+def normalize_method(method: str) -> str:
+    """Spell out Werkzeug's defaults, as the method appears in a stored hash."""
+    name, *args = method.split(":")
+    if name == "pbkdf2":
+        digest = args[0] if args else "sha256"
+        iterations = args[1] if len(args) > 1 else str(DEFAULT_PBKDF2_ITERATIONS)
+        return f"pbkdf2:{digest}:{iterations}"
+    if name == "scrypt":
+        defaults = ["32768", "8", "1"]
+        return "scrypt:" + ":".join(args + defaults[len(args):])
+    return method
+
+
+def needs_rehash(stored: str, method: str) -> bool:
+    return stored.split("$", 1)[0] != normalize_method(method)
+
+
+def _check(stored: str, password: str, method: Optional[str]) -> Tuple[bool, Optional[str]]:
+    if not check_password_hash(stored, password):
+        return False, None
+    if method and needs_rehash(stored, method):
+        return True, generate_password_hash(password, method)
+    return True, None
+
+
+class PasswordVerifier:
+    """Runs password checks; `slots_dir` holds the host-wide admission slots.
+
+    Without `slots_dir`, admission only counts this process's checks.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 8, slots_dir: Optional[str] = None):
+        workers = max(1, int(workers))
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pidash-pw")
+        self._slots = SlotFiles(slots_dir, workers + max(0, int(max_pending)))
+
+    def verify(self, stored: str, password: str, method: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+        """Check `password` against `stored`; returns (ok, new hash or None).
+
+        Raises VerifierBusy without waiting if every admission slot is taken.
+        """
+        release = self._slots.try_acquire()
+        if release is None:
+            raise VerifierBusy("Too many password checks in progress")
+        def run():
+            # Released before the result is published, so a caller that
+            # saw the result can immediately get the slot again
+            try:
+                return _check(stored, password, method)
+            finally:
+                release()
+
+        try:
+            future = self._pool.submit(run)
+        except BaseException:
+            release()
+            raise
+        return future.result()
+
+
+_verifiers: Dict[tuple, PasswordVerifier] = {}
+_verifiers_lock = threading.Lock()
+
+
+def get_verifier(workers: int, max_pending: int, slots_dir: Optional[str] = None) -> PasswordVerifier:
+    """Return the process-wide verifier for this configuration."""
+    key = (int(workers), int(max_pending), slots_dir)
+    with _verifiers_lock:
+        verifier = _verifiers.get(key)
+        if verifier is None:
+            verifier = PasswordVerifier(workers, max_pending, slots_dir)
+            _verifiers[key] = verifier
+        return verifier
@@ -0,0 +1,232 @@
+"""Per-client rate limits and per-route concurrency caps.
+
+Rate limits are token buckets, one per (rule, client), where the client is
+the API key when a valid one is sent, else the session user, else the
+remote address. The buckets live in a small memory-mapped file under
+``CACHE_FOLDER`` so all gunicorn workers on the host share them. It is a
+fixed-size open-addressing table: a client hashes to a short run of slots
+that is locked with a byte-range `lockf` while its bucket is updated. When
+every slot in the run is taken, the least recently used bucket is recycled,
+which can only make the limit more lenient for that client, never stricter.
+
+Concurrency caps bound how many requests of a route run at once across
+all workers on the host. Each cap is a set of flock'd slot files under
+``CACHE_FOLDER`` (see `SlotFiles`) tried without waiting; the kernel drops
+the locks of a worker that dies, so a crash cannot leak a slot. A slot is
+held until the response body is closed, so streamed downloads count.
+
+Both return 429 with ``Retry-After`` when exceeded. Limits are configured
+per endpoint (``"api_stats"``, ``"files.api_list_files"``) or for a whole
+blueprint (``"files"``), an endpoint entry taking precedence::
+
+    RATE_LIMITS="api_stats=5/s:20, files.api_list_files=60/m:10"
+    CONCURRENCY_LIMITS="files.api_list_files=4, files.download_folder=2"
+
+A rate is ``<count>/<s|m|h>`` with an optional ``:<burst>`` (default: the
+count). The check costs a few microseconds per request.
+"""
+import hashlib
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from typing import Dict, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; buckets are then only shared between threads
+    fcntl = None
+
+from flask import Flask, g, jsonify, request, session
+
+from .fsutil import SlotFiles
+
+# key hash, tokens, last refill (unix time)
+SLOT = struct.Struct("<Qdd")
+DEFAULT_SLOTS = 4096
+# Slots a client may occupy; also the size of the locked run
+PROBES = 8
+STATE_FILENAME = "ratelimit.bin"
+# Directory of concurrency slot files, one subdirectory per rule
+SLOTS_DIRNAME = "concurrency"
+
+_PERIODS = {"s": 1, "sec": 1, "second": 1, "m": 60, "min": 60, "minute": 60, "h": 3600, "hour": 3600}
+_RATE = re.compile(r"\s*(\d+(?:\.\d+)?)\s*/\s*([a-z]+)\s*(?::\s*(\d+))?\s*")
+
+
+def parse_rate(spec: str) -> Tuple[float, float]:
+    """Parse ``"10/s"`` or ``"60/m:10"`` into (tokens per second, burst)."""
+    m = _RATE.fullmatch(spec.lower())
+    if m is None or m.group(2) not in _PERIODS:
+        raise ValueError(f"Invalid rate limit: {spec!r}")
+    count = float(m.group(1))
+    if count <= 0:
+        raise ValueError(f"Invalid rate limit: {spec!r}")
+    burst = float(m.group(3)) if m.group(3) else count
+    return count / _PERIODS[m.group(2)], max(1.0, burst)
+
+
+def parse_rules(rules: Union[str, Dict, None]) -> Dict[str, str]:
+    """Parse ``"name=value, name=value"`` (or pass a dict through)."""
+    if not rules:
+        return {}
+    if isinstance(rules, dict):
+        return {str(k): str(v) for k, v in rules.items()}
+    parsed = {}
+    for item in re.split(r"[,;]", rules):
+        name, sep, value = item.partition("=")
+        if not sep or not name.strip():
+            if item.strip():
+                raise ValueError(f"Invalid limit entry: {item!r}")
+            continue
+        parsed[name.strip()] = value.strip()
+    return parsed
+
+
+def _key_hash(key: str) -> int:
+    # Stable across processes, unlike hash(); 0 marks an empty slot
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+
+class TokenBuckets:
+    """Token buckets in a memory-mapped table shared by every process."""
+
+    def __init__(self, path: str, slots: int = DEFAULT_SLOTS):
+        self.slots = max(PROBES, int(slots))
+        size = self.slots * SLOT.size
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        # lockf locks belong to the process, so threads also need this
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, now: Optional[float] = None) -> float:
+        """Take one token for `key`; 0.0 if allowed, else seconds until one is free."""
+        now = time.time() if now is None else now
+        h = _key_hash(key)
+        first = h % (self.slots - PROBES + 1)
+        offset = first * SLOT.size
+        with self._lock:
+            if fcntl is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, PROBES * SLOT.size, offset)
+            try:
+                slot, oldest, oldest_ts = None, offset, math.inf
+                for i in range(PROBES):
+                    pos = offset + i * SLOT.size
+                    kh, tokens, last = SLOT.unpack_from(self._map, pos)
+                    if kh == h:
+                        slot = pos
+                        break
+                    if kh == 0:
+                        last = -math.inf
+                    if last < oldest_ts:
+                        oldest, oldest_ts = pos, last
+                if slot is None:
+                    # New client (or recycled slot): starts with a full bucket
+                    slot, tokens, last = oldest, burst, now
+                # Clamp: the clock may have stepped backwards
+                tokens = min(burst, tokens + max(0.0, now - last) * rate)
+                if tokens >= 1.0:
+                    SLOT.pack_into(self._map, slot, h, tokens - 1.0, now)
+                    return 0.0
+                SLOT.pack_into(self._map, slot, h, tokens, now)
+                return (1.0 - tokens) / rate
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, PROBES * SLOT.size, offset)
+
+
+def client_key() -> str:
+    """Who a request is counted against: API key, session user or address."""
+    api_key = os.getenv("API_KEY")
+    if api_key and (request.headers.get("X-API-KEY") or request.args.get("api_key")) == api_key:
+        return "key"
+    user = session.get("user")
+    if user:
+        return "user:" + user
+    return "ip:" + (request.remote_addr or "")
+
+
+def _too_many(retry_after: float, message: str):
+    response = jsonify({"error": message})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def init_app(app: Flask) -> None:
+    """Enforce RATE_LIMITS and CONCURRENCY_LIMITS before matching views run."""
+    if not app.config.get("RATE_LIMIT_ENABLED", True) or app.config.get("TESTING"):
+        return
+    rates = {name: parse_rate(spec) for name, spec in parse_rules(app.config.get("RATE_LIMITS")).items()}
+    slots_root = os.path.join(app.config["CACHE_FOLDER"], SLOTS_DIRNAME)
+
+    def _slots(name: str, count: int) -> SlotFiles:
+        try:
+            return SlotFiles(os.path.join(slots_root, re.sub(r"[^\w.-]", "_", name)), count)
+        except OSError:
+            logging.getLogger(__name__).exception("Concurrency cap %s only applies per worker", name)
+            return SlotFiles(None, count)
+
+    caps = {
+        name: _slots(name, int(value))
+        for name, value in parse_rules(app.config.get("CONCURRENCY_LIMITS")).items()
+        if int(value) > 0
+    }
+    if not rates and not caps:
+        return
+    buckets = None
+    if rates:
+        try:
+            buckets = TokenBuckets(os.path.join(app.config["CACHE_FOLDER"], STATE_FILENAME))
+        except OSError:
+            logging.getLogger(__name__).exception("Rate limiting disabled: no shared state file")
+    app.extensions["rate_limit_buckets"] = buckets
+
+    def _rule(table):
+        endpoint = request.endpoint
+        if endpoint in table:
+            return endpoint, table[endpoint]
+        if request.blueprint in table:
+            return request.blueprint, table[request.blueprint]
+        return None, None
+
+    @app.before_request
+    def _limit():
+        if request.endpoint is None:
+            return None
+        name, rate = _rule(rates)
+        if rate is not None and buckets is not None:
+            wait = buckets.take(f"{name}|{client_key()}", *rate)
+            if wait:
+                return _too_many(wait, "Too many requests")
+        name, cap = _rule(caps)
+        if cap is not None:
+            release = cap.try_acquire()
+            if release is None:
+                return _too_many(1, "Too many concurrent requests")
+            g.concurrency_release = release
+        return None
+
+    @app.after_request
+    def _release_on_close(response):
+        # A streamed body (e.g. a ZIP download) is still being sent after the
+        # request context is torn down; hold the slot until it is closed
+        release = g.pop("concurrency_release", None)
+        if release is not None:
+            response.call_on_close(release)
+        return response
+
+    @app.teardown_request
+    def _release(exc):
+        # Only still set when no response was produced (unhandled error)
+        release = g.pop("concurrency_release", None)
+        if release is not None:
+            release()
@@ -1,7 +1,8 @@
-import json
 import os
 from typing import Dict, Optional
 
+from .fsutil import get_json_file
+
 SETUP_FILE_ENV = 'SETUP_CONFIG_FILE'
 DEFAULT_SETUP_FILE = 'setup_config.json'
 
@@ -11,20 +12,16 @@ def _setup_file_path() -> str:
 
 
 def load_setup() -> Dict:
-    path = _setup_file_path()
-    if not os.path.exists(path):
-        return {}
-    try:
-        with open(path, 'r') as fh:
-            return json.load(fh)
-    except Exception:
-        return {}
+    # Parsed once per process and re-read only when the file changes, so
+    # a save from any worker is picked up by all of them
+    cfg = get_json_file(_setup_file_path(), indent=2).load()
+    return cfg if isinstance(cfg, dict) else {}
 
 
 def save_setup(cfg: Dict) -> None:
-    path = _setup_file_path()
-    with open(path, 'w') as fh:
-        json.dump(cfg, fh, indent=2)
+    # Written to a temp file and renamed over the old one, so a concurrent
+    # reader never sees half-written JSON
+    get_json_file(_setup_file_path(), indent=2).save(cfg)
 
 
 def ensure_upload_folder(folder: str):
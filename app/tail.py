@@ -0,0 +1,208 @@
+"""Shared tail/follow readers for streaming log files over SSE.
+
+`tail_lines` returns the last N complete lines of a file by reading
+backwards from the end. `followers.subscribe` attaches a subscriber to the
+process-wide `FileFollower` for a path. There is one reader thread per file,
+whatever the number of clients. It polls the file, reads only appended bytes
+from its saved offset and fans complete lines out to subscriber queues.
+
+Truncation (size drops below the offset) and rotation (path now refers to a
+different inode) restart reading from the beginning of the file and are
+reported to subscribers as events. A subscriber that joins with an older
+offset (e.g. an EventSource reconnecting with Last-Event-ID) first catches
+up privately from that offset before receiving shared events.
+"""
+import os
+import queue
+import threading
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+READ_BLOCK_SIZE = 64 * 1024
+# Largest amount of new data read per poll; the rest is picked up next tick
+MAX_READ_PER_POLL = 256 * 1024
+
+
+def tail_lines(path: str, count: int) -> Tuple[List[str], int]:
+    """Return the last `count` complete lines of `path` and the byte offset
+    just past the last complete line (where following should resume)."""
+    with open(path, "rb") as fh:
+        fh.seek(0, os.SEEK_END)
+        size = fh.tell()
+        data = b""
+        pos = size
+        while pos > 0 and data.count(b"\n") <= count:
+            step = min(READ_BLOCK_SIZE, pos)
+            pos -= step
+            fh.seek(pos)
+            data = fh.read(step) + data
+    # Only complete lines: anything after the last newline is still being written
+    end = data.rfind(b"\n")
+    if end == -1:
+        return [], pos
+    complete = data[: end + 1]
+    lines = complete.split(b"\n")[:-1]
+    if pos > 0:
+        # First element may be a partial line cut by the backwards read
+        lines = lines[1:]
+    lines = lines[-count:] if count > 0 else []
+    return [_decode(line) for line in lines], pos + end + 1
+
+
+def _decode(line: bytes) -> str:
+    return line.rstrip(b"\r").decode("utf-8", errors="replace")
+
+
+def _split_complete(data: bytes) -> Tuple[List[str], int]:
+    """Split `data` into complete lines; return (lines, bytes consumed)."""
+    end = data.rfind(b"\n")
+    if end == -1:
+        return [], 0
+    return [_decode(line) for line in data[:end].split(b"\n")], end + 1
+
+
+class Subscription:
+    def __init__(self, follower: "FileFollower", max_events: int):
+        self.follower = follower
+        self.queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max_events)
+        self.lagged = False
+
+    def get(self, timeout: float) -> Optional[Dict]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        self.follower.unsubscribe(self)
+
+
+class FileFollower:
+    """Single reader for one file, shared by all of its subscribers."""
+
+    def __init__(self, registry: "FollowerRegistry", path: str, offset: int, interval: float):
+        self.registry = registry
+        self.path = path
+        self.offset = offset
+        self.interval = interval
+        self._ino = self._stat_ino()
+        self._subs: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stat_ino(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_ino
+        except OSError:
+            return None
+
+    def subscribe(self, from_offset: int, max_events: int) -> Subscription:
+        sub = Subscription(self, max_events)
+        with self._lock:
+            if from_offset < self.offset:
+                # Catch up privately on what the shared reader already passed
+                try:
+                    with open(self.path, "rb") as fh:
+                        fh.seek(from_offset)
+                        lines, used = _split_complete(fh.read(self.offset - from_offset))
+                    if lines:
+                        sub.queue.put_nowait(
+                            {"event": "lines", "lines": lines, "offset": from_offset + used}
+                        )
+                except (OSError, queue.Full):
+                    pass
+            self._subs.append(sub)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, daemon=True, name="pidash-tail"
+                )
+                self._thread.start()
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            if sub in self._subs:
+                self._subs.remove(sub)
+
+    def _publish(self, event: Dict) -> None:
+        for sub in list(self._subs):
+            try:
+                sub.queue.put_nowait(event)
+            except queue.Full:
+                # Slow client: drop it; it can reconnect from its last offset
+                sub.lagged = True
+                self._subs.remove(sub)
+
+    def poll_once(self) -> None:
+        """Check the file once and publish whatever changed."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return
+        with self._lock:
+            if self._ino is not None and st.st_ino != self._ino:
+                self._ino = st.st_ino
+                self.offset = 0
+                self._publish({"event": "rotated", "offset": 0})
+            elif st.st_size < self.offset:
+                self.offset = 0
+                self._publish({"event": "truncated", "offset": 0})
+            self._ino = st.st_ino
+            if st.st_size <= self.offset:
+                return
+            with open(self.path, "rb") as fh:
+                fh.seek(self.offset)
+                data = fh.read(min(st.st_size - self.offset, MAX_READ_PER_POLL))
+            lines, used = _split_complete(data)
+            if not used and len(data) >= MAX_READ_PER_POLL:
+                # A single line longer than the read cap: emit it in pieces
+                lines, used = [_decode(data)], len(data)
+            if used:
+                self.offset += used
+                self._publish({"event": "lines", "lines": lines, "offset": self.offset})
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                idle = not self._subs
+            if idle and self.registry.release(self):
+                return
+            try:
+                self.poll_once()
+            except Exception:
+                logging.getLogger(__name__).exception("Error following %s", self.path)
+            time.sleep(self.interval)
+
+
+class FollowerRegistry:
+    def __init__(self):
+        self._followers: Dict[str, FileFollower] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, path: str, from_offset: int, interval: float = 0.5, max_events: int = 256) -> Subscription:
+        path = os.path.abspath(path)
+        with self._lock:
+            follower = self._followers.get(path)
+            if follower is None:
+                follower = FileFollower(self, path, from_offset, interval)
+                self._followers[path] = follower
+            return follower.subscribe(from_offset, max_events)
+
+    def release(self, follower: FileFollower) -> bool:
+        """Drop `follower` if it still has no subscribers; return True if dropped."""
+        with self._lock:
+            with follower._lock:
+                if follower._subs:
+                    return False
+            if self._followers.get(follower.path) is follower:
+                del self._followers[follower.path]
+            return True
+
+    def get(self, path: str) -> Optional[FileFollower]:
+        with self._lock:
+            return self._followers.get(os.path.abspath(path))
+
+
+# Default registry shared by all requests in this process
+followers = FollowerRegistry()
@@ -0,0 +1,168 @@
+"""Cached image thumbnails for the file manager.
+
+Thumbnails are generated on demand in a small bounded thread pool and stored
+under ``<CACHE_FOLDER>/thumbs``. The cache key covers the image path, its
+mtime and size, and the requested size bucket, so an edited image gets a new
+thumbnail and stale ones simply age out. Cache hits touch the file's mtime.
+When the cache grows past its byte budget, the least recently used
+thumbnails are evicted.
+
+Pillow is optional: without it `generate` raises `ThumbnailUnavailable` and
+the route serves the original image instead.
+"""
+import hashlib
+import os
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except Exception:
+    # Pillow not installed (minimal builds); thumbnails are disabled
+    Image = None
+    ImageOps = None
+
+SIZE_BUCKETS = (64, 128, 256, 512, 1024)
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
+
+
+class ThumbnailUnavailable(Exception):
+    pass
+
+
+class ThumbnailBusy(Exception):
+    """Raised when too many thumbnails are already queued."""
+
+
+def size_bucket(size: int) -> int:
+    for bucket in SIZE_BUCKETS:
+        if size <= bucket:
+            return bucket
+    return SIZE_BUCKETS[-1]
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir: str, max_bytes: int, workers: int = 2, max_pending: int = 32):
+        self.root = os.path.join(cache_dir, "thumbs")
+        self.max_bytes = int(max_bytes)
+        self.max_pending = int(max_pending)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="pidash-thumb")
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._total: Optional[int] = None
+
+    def _key(self, path: str, st: os.stat_result, bucket: int) -> str:
+        raw = f"{os.path.abspath(path)}\0{st.st_mtime_ns}\0{st.st_size}\0{bucket}"
+        return hashlib.sha1(raw.encode("utf-8", "surrogateescape")).hexdigest()
+
+    def _cached_path(self, key: str) -> Optional[str]:
+        for ext in (".jpg", ".png"):
+            candidate = os.path.join(self.root, key[:2], key + ext)
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    def get(self, path: str, size: int, timeout: float = 30.0) -> Tuple[str, str]:
+        """Return `(thumbnail_path, key)` for image `path`, generating it if needed."""
+        if Image is None:
+            raise ThumbnailUnavailable("Pillow is not installed")
+        st = os.stat(path)
+        bucket = size_bucket(size)
+        key = self._key(path, st, bucket)
+        cached = self._cached_path(key)
+        if cached is not None:
+            try:
+                # Mark as recently used for LRU eviction
+                os.utime(cached)
+            except OSError:
+                pass
+            return cached, key
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                if len(self._inflight) >= self.max_pending:
+                    raise ThumbnailBusy("Too many thumbnails pending")
+                future = self._pool.submit(self._generate, path, bucket, key)
+                self._inflight[key] = future
+                future.add_done_callback(lambda _f, k=key: self._done(k))
+        return future.result(timeout=timeout), key
+
+    def _done(self, key: str) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _generate(self, path: str, bucket: int, key: str) -> str:
+        with Image.open(path) as img:
+            # Let the JPEG decoder downscale while decoding (much cheaper)
+            img.draft("RGB", (bucket, bucket))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((bucket, bucket))
+            has_alpha = img.mode in ("RGBA", "LA", "P")
+            ext = ".png" if has_alpha else ".jpg"
+            dest = os.path.join(self.root, key[:2], key + ext)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            tmp = dest + f".{os.getpid()}.{threading.get_ident()}.tmp"
+            if has_alpha:
+                img.save(tmp, "PNG", optimize=True)
+            else:
+                img.convert("RGB").save(tmp, "JPEG", quality=80, optimize=True)
+        os.replace(tmp, dest)
+        self._account(os.path.getsize(dest))
+        return dest
+
+    def _scan(self):
+        entries = []
+        for dirpath, _dirs, files in os.walk(self.root):
+            for name in files:
+                p = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+        return entries
+
+    def _account(self, added: int) -> None:
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _m, size, _p in self._scan())
+            else:
+                self._total += added
+            if self._total <= self.max_bytes:
+                return
+        self.evict()
+
+    def evict(self) -> None:
+        """Delete least recently used thumbnails until under 90% of the budget."""
+        entries = sorted(self._scan())
+        total = sum(size for _m, size, _p in entries)
+        target = int(self.max_bytes * 0.9)
+        for _mtime, size, p in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(p)
+                total -= size
+            except OSError:
+                continue
+        with self._lock:
+            self._total = total
+        logging.getLogger(__name__).debug("Thumbnail cache evicted to %d bytes", total)
+
+
+_caches: Dict[Tuple[str, int, int], ThumbnailCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(cache_dir: str, max_bytes: int, workers: int) -> ThumbnailCache:
+    """Return the process-wide cache for this configuration."""
+    key = (os.path.abspath(cache_dir), int(max_bytes), int(workers))
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = ThumbnailCache(cache_dir, max_bytes, workers)
+            _caches[key] = cache
+        return cache
@@ -0,0 +1,353 @@
+"""Upload ingestion: resumable chunked sessions and streaming multipart.
+
+A client opens a session for a target folder and filename, then sends the
+file as a sequence of chunks. Each chunk is appended to a temp file after
+checking that its offset matches the bytes already stored, so a client that
+lost its connection asks for the current offset and continues from there.
+Completing the session atomically renames the temp file into the target
+folder.
+
+Session state lives on disk in a hidden folder under the storage root so it
+is shared by all gunicorn workers and survives restarts, and so the final
+rename never crosses filesystems. Chunks are streamed to disk in small
+blocks; server memory does not grow with file or chunk size.
+
+Single-request multipart uploads (`/api/upload`) are parsed incrementally by
+`IngestRequest`, which writes each file part once into the same folder while
+computing its SHA-256, instead of spooling it and copying it again. With
+upload dedup enabled, session chunks are hashed as they arrive too.
+"""
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import re
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from flask import Request, current_app
+
+SESSIONS_DIRNAME = ".pidash-uploads"
+_SESSION_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+COPY_BLOCK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """Raised for invalid upload operations; carries an HTTP status code."""
+
+    def __init__(self, message: str, status: int = 400, **extra):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.extra = extra
+
+
+# Running SHA-256 of in-progress sessions handled by this process, as
+# session id -> (bytes hashed, hasher); chunks that land on another worker
+# make `complete` hash the finished file instead
+_hashers: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+_hashers_lock = threading.Lock()
+
+
+class UploadSessions:
+    """Resumable upload sessions, as seen by the user `user`.
+
+    Sessions are created for `user`; every other operation on a session
+    created by someone else raises UploadError(403).
+    """
+
+    def __init__(self, storage_root: str, ttl: int = 86400, hash_chunks: bool = False, user: Optional[str] = None):
+        self.root = os.path.join(os.path.abspath(storage_root), SESSIONS_DIRNAME)
+        self.ttl = int(ttl)
+        self.hash_chunks = hash_chunks
+        self.user = user
+
+    def _meta_path(self, session_id: str) -> str:
+        return os.path.join(self.root, f"{session_id}.json")
+
+    def _part_path(self, session_id: str) -> str:
+        return os.path.join(self.root, f"{session_id}.part")
+
+    def create(self, target_dir: str, filename: str, size: Optional[int] = None, **extra) -> Dict:
+        os.makedirs(self.root, exist_ok=True)
+        self.cleanup()
+        session_id = secrets.token_hex(16)
+        meta = {
+            "id": session_id,
+            "target_dir": target_dir,
+            "filename": filename,
+            "size": size,
+            "created": time.time(),
+            "user": self.user,
+        }
+        meta.update(extra)
+        # Create the (empty) part file before publishing the metadata
+        open(self._part_path(session_id), "wb").close()
+        tmp = self._meta_path(session_id) + ".tmp"
+        with open(tmp, "w") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, self._meta_path(session_id))
+        meta["offset"] = 0
+        return meta
+
+    def get(self, session_id: str) -> Dict:
+        if not _SESSION_ID_RE.match(session_id or ""):
+            raise UploadError("Invalid upload id", 400)
+        try:
+            with open(self._meta_path(session_id), "r") as fh:
+                meta = json.load(fh)
+            meta["offset"] = os.path.getsize(self._part_path(session_id))
+        except (OSError, ValueError):
+            raise UploadError("Upload session not found", 404)
+        if meta.get("user") != self.user:
+            raise UploadError("Upload belongs to another user", 403)
+        return meta
+
+    def _open_part(self, session_id: str, meta: Dict):
+        """Open the part file holding its chunk lock, or raise UploadError(409).
+
+        The file is opened without creating it, so a request racing with
+        `complete` cannot leave a stray part file behind.
+        """
+        try:
+            fh = open(self._part_path(session_id), "r+b")
+        except FileNotFoundError:
+            raise UploadError("Upload session not found", 404)
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            raise UploadError("Chunk already in progress", 409, offset=meta["offset"])
+        return fh
+
+    def append(self, session_id: str, offset: int, stream) -> int:
+        """Append the bytes of `stream` at `offset`; return the new offset.
+
+        Raises UploadError(409) when `offset` does not match the stored bytes
+        or another request is currently writing to the same session.
+        """
+        meta = self.get(session_id)
+        size = meta.get("size")
+        with self._open_part(session_id, meta) as fh:
+            current = os.fstat(fh.fileno()).st_size
+            if offset != current:
+                raise UploadError("Offset mismatch", 409, offset=current)
+            fh.seek(current)
+            hasher = None
+            if self.hash_chunks:
+                with _hashers_lock:
+                    hashed, hasher = _hashers.pop(session_id, (0, None))
+                if current == 0:
+                    hasher = hashlib.sha256()
+                elif hashed != current:
+                    hasher = None
+            written = current
+            try:
+                while True:
+                    block = stream.read(COPY_BLOCK_SIZE)
+                    if not block:
+                        break
+                    written += len(block)
+                    if size is not None and written > size:
+                        raise UploadError("Chunk exceeds declared size", 400, offset=current)
+                    fh.write(block)
+                    if hasher is not None:
+                        hasher.update(block)
+                fh.flush()
+            except Exception:
+                # Drop a partially written chunk so the client can retry it
+                fh.truncate(current)
+                raise
+            if hasher is not None:
+                with _hashers_lock:
+                    _hashers[session_id] = (written, hasher)
+            return written
+
+    def _digest(self, session_id: str, part: str, size: int) -> str:
+        with _hashers_lock:
+            hashed, hasher = _hashers.pop(session_id, (0, None))
+        if hasher is None or hashed != size:
+            hasher = hashlib.sha256()
+            with open(part, "rb") as fh:
+                for block in iter(lambda: fh.read(COPY_BLOCK_SIZE * 16), b""):
+                    hasher.update(block)
+        return hasher.hexdigest()
+
+    def complete(self, session_id: str, dedup=None) -> Dict:
+        """Move the finished upload into its target folder.
+
+        With a `DedupStore`, content already stored elsewhere becomes a
+        hardlink instead. Returns `path` and `size`, plus `sha256` and
+        `deduplicated` when deduplicating. Holds the chunk lock throughout,
+        so a chunk still being written cannot race the rename.
+        """
+        with self._open_part(session_id, self.get(session_id)) as fh:
+            # Re-read under the lock: another request may have completed or
+            # aborted the session while this one was opening the part file
+            meta = self.get(session_id)
+            offset = os.fstat(fh.fileno()).st_size
+            size = meta.get("size")
+            if size is not None and offset != size:
+                raise UploadError("Upload incomplete", 409, offset=offset)
+            os.makedirs(meta["target_dir"], exist_ok=True)
+            dest = os.path.join(meta["target_dir"], meta["filename"])
+            part = self._part_path(session_id)
+            result = {"path": dest, "size": offset}
+
+            def commit():
+                os.fsync(fh.fileno())
+                os.replace(part, dest)
+
+            if dedup is not None:
+                digest = self._digest(session_id, part, offset)
+                result["sha256"] = digest
+                result["deduplicated"] = dedup.store(digest, offset, dest, commit)
+            else:
+                commit()
+            self._remove(session_id)
+        return result
+
+    def abort(self, session_id: str) -> None:
+        self.get(session_id)
+        self._remove(session_id)
+
+    def _remove(self, session_id: str) -> None:
+        with _hashers_lock:
+            _hashers.pop(session_id, None)
+        for path in (self._meta_path(session_id), self._part_path(session_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def cleanup(self) -> None:
+        """Remove sessions that have not been touched for longer than the TTL."""
+        cutoff = time.time() - self.ttl
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return
+        for name in names:
+            if name.startswith("ingest-"):
+                # Leftover from a streaming upload whose worker died mid-request
+                path = os.path.join(self.root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+                continue
+            session_id = name.split(".", 1)[0]
+            if not _SESSION_ID_RE.match(session_id) or not name.endswith(".json"):
+                continue
+            try:
+                mtime = max(
+                    os.path.getmtime(self._meta_path(session_id)),
+                    os.path.getmtime(self._part_path(session_id)),
+                )
+            except OSError:
+                mtime = 0
+            if mtime < cutoff:
+                self._remove(session_id)
+
+
+class HashingTempFile:
+    """Write-once temp file that hashes its content as it is written.
+
+    Used as the multipart stream for uploads so the body is parsed
+    incrementally and each file part is written to disk exactly once, next to
+    its destination, with its SHA-256 computed in the same pass. `commit`
+    renames it into place; closing it uncommitted removes it.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.name = tempfile.mkstemp(prefix="ingest-", suffix=".part", dir=directory)
+        self._fh = os.fdopen(fd, "w+b")
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self._committed = False
+
+    def write(self, data: bytes) -> int:
+        self._hash.update(data)
+        self.size += len(data)
+        return self._fh.write(data)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def seek(self, *args):
+        return self._fh.seek(*args)
+
+    def tell(self) -> int:
+        return self._fh.tell()
+
+    def read(self, *args) -> bytes:
+        return self._fh.read(*args)
+
+    def flush(self) -> None:
+        self._fh.flush()
+
+    def commit(self, dest: str) -> None:
+        """Durably move the written data to `dest` (atomic on one filesystem)."""
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+        try:
+            os.replace(self.name, dest)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                # e.g. `dest` is an existing directory: never move into it
+                raise
+            # Destination on another mount: copy next to it, then rename
+            tmp = f"{dest}.{secrets.token_hex(4)}.tmp"
+            try:
+                shutil.copyfile(self.name, tmp)
+                with open(tmp, "rb") as fh:
+                    os.fsync(fh.fileno())
+                os.replace(tmp, dest)
+            except BaseException:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                raise
+            os.remove(self.name)
+        self._committed = True
+
+    def close(self) -> None:
+        if not self._fh.closed:
+            self._fh.close()
+        if not self._committed:
+            try:
+                os.remove(self.name)
+            except OSError:
+                pass
+
+
+# Endpoints whose multipart file parts are streamed into HashingTempFile
+STREAMING_UPLOAD_ENDPOINTS = {"files.api_upload_file"}
+
+
+class IngestRequest(Request):
+    """Request class that streams upload file parts to the storage root.
+
+    Werkzeug's default stream factory spools each part into a temporary file
+    that `FileStorage.save` then copies again. For upload endpoints the part
+    is instead written once, into a temp file on the storage filesystem.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint in STREAMING_UPLOAD_ENDPOINTS:
+            storage_root = current_app.config.get(
+                "STORAGE_ROOT", current_app.config["UPLOAD_FOLDER"]
+            )
+            return HashingTempFile(os.path.join(os.path.abspath(storage_root), SESSIONS_DIRNAME))
+        return super()._get_file_stream(
+            total_content_length, content_type, filename, content_length
+        )
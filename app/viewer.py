@@ -0,0 +1,273 @@
+"""Windowed file viewer with a cached, memory-mapped line index.
+
+`read_bytes` returns a byte window of a file and `read_lines` a window of
+lines. For large files the start offset of every line is stored in an index
+file (8 bytes per line) under the cache folder and memory-mapped on lookup,
+so jumping to any line is a single array access and does not load the file
+or the index into memory.
+
+The index is keyed by the file's path and validated against its inode, size
+and mtime. A file that only grew (e.g. a log) has its index extended from the
+last indexed byte instead of being rebuilt, provided the indexed part looks
+unchanged: the last indexed line still follows a newline and the checksum of
+the bytes just before the old end still matches. Extending holds an
+exclusive lock on the index, so concurrent viewers never append twice.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import zlib
+from array import array
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; extends are then not serialised
+    fcntl = None
+
+_MAGIC = b"PDLIDX2\0"
+# magic, inode, indexed size, mtime_ns, offset count, CRC32 of the tail
+_HEADER = struct.Struct("<8sQQQQI")
+_OFFSET = struct.Struct("<Q")
+SCAN_BLOCK_SIZE = 1024 * 1024
+# Bytes before the indexed end that must be unchanged to extend the index
+TAIL_CHECK_SIZE = 4096
+
+
+def _index_path(cache_dir: str, path: str) -> str:
+    key = hashlib.sha1(os.path.abspath(path).encode("utf-8", "surrogateescape")).hexdigest()
+    return os.path.join(cache_dir, "lineindex", key + ".idx")
+
+
+def _scan_offsets(fh, start: int, end: int) -> array:
+    """Return the start offset of every line beginning after a newline in [start, end)."""
+    offsets = array("Q")
+    fh.seek(start)
+    pos = start
+    while pos < end:
+        block = fh.read(min(SCAN_BLOCK_SIZE, end - pos))
+        if not block:
+            break
+        i = block.find(b"\n")
+        while i != -1:
+            offsets.append(pos + i + 1)
+            i = block.find(b"\n", i + 1)
+        pos += len(block)
+    return offsets
+
+
+class LineIndex:
+    """Memory-mapped view of a file's line-start offsets."""
+
+    def __init__(self, index_path: str, file_size: int):
+        self._fh = open(index_path, "rb")
+        _lock(self._fh, shared=True)
+        try:
+            self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            _unlock(self._fh)
+        count = _HEADER.unpack_from(self._mm)[4]
+        self._count = min(count, (len(self._mm) - _HEADER.size) // _OFFSET.size)
+        self.file_size = file_size
+        # A trailing newline produces an offset equal to the file size; that
+        # is not the start of a line (yet)
+        if self._count and self._offset_at(self._count - 1) >= file_size:
+            self._count -= 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self._mm.close()
+        self._fh.close()
+
+    def _offset_at(self, i: int) -> int:
+        return _OFFSET.unpack_from(self._mm, _HEADER.size + i * _OFFSET.size)[0]
+
+    @property
+    def line_count(self) -> int:
+        return self._count
+
+    def line_start(self, line: int) -> int:
+        """Byte offset of 0-based `line` (the file size past the last line)."""
+        if line >= self._count:
+            return self.file_size
+        return self._offset_at(line)
+
+
+def _lock(fh, shared: bool = False) -> None:
+    if fcntl is not None:
+        fcntl.flock(fh, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+
+
+def _unlock(fh) -> None:
+    if fcntl is not None:
+        fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _tail_crc(fh, size: int) -> int:
+    start = max(0, size - TAIL_CHECK_SIZE)
+    fh.seek(start)
+    return zlib.crc32(fh.read(size - start))
+
+
+def _header(fh) -> Optional[tuple]:
+    fh.seek(0)
+    try:
+        header = _HEADER.unpack(fh.read(_HEADER.size))
+    except struct.error:
+        return None
+    return header if header[0] == _MAGIC else None
+
+
+def _build(src, idx_path: str, st: os.stat_result) -> None:
+    offsets = array("Q", [0])
+    offsets.extend(_scan_offsets(src, 0, st.st_size))
+    # Unique per thread too: threads of one worker may build the same index
+    tmp = idx_path + f".{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as out:
+        out.write(_HEADER.pack(_MAGIC, st.st_ino, st.st_size, st.st_mtime_ns, len(offsets), _tail_crc(src, st.st_size)))
+        offsets.tofile(out)
+    os.replace(tmp, idx_path)
+
+
+def _extend(src, idx_path: str, st: os.stat_result) -> bool:
+    """Append the offsets of lines added since the index was written.
+
+    Returns False when the index cannot be extended and must be rebuilt.
+    """
+    try:
+        out = open(idx_path, "r+b")
+    except OSError:
+        return False
+    with out:
+        _lock(out)
+        # Re-read under the lock: another viewer may have extended it
+        header = _header(out)
+        if header is None or header[1] != st.st_ino:
+            return False
+        _magic, _ino, indexed_size, indexed_mtime, count, crc = header
+        if indexed_size == st.st_size and indexed_mtime == st.st_mtime_ns:
+            return True
+        if st.st_size <= indexed_size or count == 0:
+            return False
+        out.seek(_HEADER.size + (count - 1) * _OFFSET.size)
+        last = _OFFSET.unpack(out.read(_OFFSET.size))[0]
+        if last > 0:
+            src.seek(last - 1)
+            if src.read(1) != b"\n":
+                return False
+        if _tail_crc(src, indexed_size) != crc:
+            # Rewritten in place rather than appended to
+            return False
+        offsets = _scan_offsets(src, indexed_size, st.st_size)
+        # Drop anything past `count` (an extend interrupted before its header)
+        out.truncate(_HEADER.size + count * _OFFSET.size)
+        out.seek(0, os.SEEK_END)
+        offsets.tofile(out)
+        out.flush()
+        out.seek(0)
+        out.write(
+            _HEADER.pack(_MAGIC, st.st_ino, st.st_size, st.st_mtime_ns, count + len(offsets), _tail_crc(src, st.st_size))
+        )
+    return True
+
+
+def open_line_index(path: str, cache_dir: str) -> LineIndex:
+    """Return a LineIndex for `path`, building or extending the cached index."""
+    st = os.stat(path)
+    idx_path = _index_path(cache_dir, path)
+    os.makedirs(os.path.dirname(idx_path), exist_ok=True)
+
+    try:
+        with open(idx_path, "rb") as fh:
+            header = _header(fh)
+    except OSError:
+        header = None
+
+    fresh = (
+        header is not None
+        and header[1] == st.st_ino
+        and header[2] == st.st_size
+        and header[3] == st.st_mtime_ns
+    )
+    if not fresh:
+        with open(path, "rb") as src:
+            if header is None or header[1] != st.st_ino or not _extend(src, idx_path, st):
+                _build(src, idx_path, st)
+
+    return LineIndex(idx_path, st.st_size)
+
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+
+def read_bytes(path: str, offset: int, length: int) -> Dict:
+    """Return `length` bytes of `path` starting at `offset`."""
+    size = os.path.getsize(path)
+    offset = max(0, min(offset, size))
+    with open(path, "rb") as fh:
+        fh.seek(offset)
+        data = fh.read(max(0, length))
+    end = offset + len(data)
+    return {
+        "offset": offset,
+        "length": len(data),
+        "next_offset": end,
+        "size": size,
+        "eof": end >= size,
+        "content": _decode(data),
+    }
+
+
+def read_lines(path: str, start: int, count: int, max_bytes: int, cache_dir: str, index_threshold: int) -> Dict:
+    """Return up to `count` lines starting at 0-based line `start`.
+
+    The window is also capped at `max_bytes` so very long lines cannot blow
+    up the response; `truncated` is set when that happens. Files larger than
+    `index_threshold` are served through the cached line index.
+    """
+    size = os.path.getsize(path)
+    start = max(0, start)
+    if size <= index_threshold:
+        with open(path, "rb") as fh:
+            all_lines = fh.read().split(b"\n")
+        if all_lines[-1] == b"":
+            all_lines.pop()
+        total = len(all_lines)
+        begin = sum(len(line) + 1 for line in all_lines[:start])
+        window = b"".join(line + b"\n" for line in all_lines[start:start + count])
+        want = len(window)
+        window = window[:max_bytes]
+    else:
+        with open_line_index(path, cache_dir) as index:
+            total = index.line_count
+            begin = index.line_start(start)
+            want = index.line_start(min(start + count, total)) - begin
+        with open(path, "rb") as fh:
+            fh.seek(begin)
+            window = fh.read(min(want, max_bytes))
+
+    truncated = want > len(window)
+    lines = window.split(b"\n")
+    # Drop the empty tail after the final newline, or a partial line cut
+    # by the byte cap (unless it is the only line in the window)
+    if lines[-1] == b"" or (truncated and len(lines) > 1):
+        lines.pop()
+    return {
+        "start_line": start,
+        "lines": [_decode(line.rstrip(b"\r")) for line in lines],
+        "total_lines": total,
+        "offset": begin,
+        "next_line": start + len(lines),
+        "eof": start + len(lines) >= total,
+        "truncated": truncated,
+        "size": size,
+    }
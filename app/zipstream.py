@@ -0,0 +1,102 @@
+"""Streaming ZIP archives of folders.
+
+`iter_zip` walks a directory and yields the bytes of a ZIP archive as it is
+produced. `zipfile` writes into a non-seekable in-memory sink, so it uses
+data descriptors instead of seeking back. The sink is drained after every
+block, which keeps memory bounded by the block size plus one central
+directory record per file, and nothing is written to disk.
+
+Already-compressed media is stored as-is; everything else is deflated.
+Large members automatically use ZIP64.
+"""
+import io
+import os
+import zipfile
+from typing import Iterable, Iterator
+
+READ_BLOCK_SIZE = 256 * 1024
+# Formats that are already compressed: deflating them only burns CPU
+STORED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic",
+    ".mp3", ".m4a", ".aac", ".ogg", ".opus", ".flac",
+    ".mp4", ".m4v", ".mkv", ".mov", ".avi", ".webm",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".zst",
+    ".pdf", ".docx", ".xlsx", ".pptx", ".odt", ".epub", ".jar", ".apk",
+}
+
+
+class _ZipSink(io.RawIOBase):
+    """Write-only, non-seekable buffer that zipfile streams into."""
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def compress_type_for(name: str) -> int:
+    if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def iter_zip(root: str, skip: Iterable[str] = ()) -> Iterator[bytes]:
+    """Yield a ZIP archive of the tree under `root`.
+
+    Symlinks are skipped so the archive cannot reach outside `root`.
+    Directory names in `skip` are left out at every level.
+    """
+    skip = set(skip)
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w") as zf:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(
+                d for d in dirnames
+                if d not in skip and not os.path.islink(os.path.join(dirpath, d))
+            )
+            rel_dir = os.path.relpath(dirpath, root)
+            if rel_dir != "." and not filenames and not dirnames:
+                # Keep empty folders in the archive
+                zf.writestr(zipfile.ZipInfo(rel_dir.replace(os.sep, "/") + "/"), b"")
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                if os.path.islink(path):
+                    continue
+                arcname = os.path.normpath(os.path.join(rel_dir, name)).replace(os.sep, "/")
+                try:
+                    # Pre-1980 mtimes are clamped instead of raising ValueError
+                    zinfo = zipfile.ZipInfo.from_file(path, arcname, strict_timestamps=False)
+                    src = open(path, "rb")
+                except OSError:
+                    # Vanished or unreadable while walking; leave it out
+                    continue
+                zinfo.compress_type = compress_type_for(name)
+                with src, zf.open(zinfo, "w") as dst:
+                    while True:
+                        block = src.read(READ_BLOCK_SIZE)
+                        if not block:
+                            break
+                        dst.write(block)
+                        data = sink.drain()
+                        if data:
+                            yield data
+                data = sink.drain()
+                if data:
+                    yield data
+    # Central directory written on close
+    yield sink.drain()
@@ -0,0 +1,6 @@
+/** Classes are picked up from the templates, including the ones built in inline JS. */
+module.exports = {
+  content: ["../templates/**/*.html"],
+  theme: { extend: {} },
+  plugins: [],
+};
@@ -18,3 +18,35 @@ def client():
     app = create_app({"TESTING": True, "WTF_CSRF_ENABLED": False, "SECRET_KEY": "test"})
     with app.test_client() as client:
         yield client
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    """Storage root used by `app_client`."""
+    path = tmp_path / "uploads"
+    path.mkdir(exist_ok=True)
+    return path
+
+
+@pytest.fixture
+def app_client(tmp_path, uploads, monkeypatch):
+    """Factory for test clients whose files all stay under `tmp_path`.
+
+    ``app_client(**config)`` builds a TESTING app with UPLOAD_FOLDER set to
+    the `uploads` fixture, CACHE_FOLDER to ``tmp_path / "cache"`` and the
+    setup/users files under `tmp_path`; `config` overrides any of these.
+    """
+    monkeypatch.setenv("SETUP_CONFIG_FILE", str(tmp_path / "setup_config.json"))
+    monkeypatch.setenv("USERS_FILE", str(tmp_path / "users.json"))
+
+    def make(**config):
+        cfg = {
+            "TESTING": True,
+            "SECRET_KEY": "test",
+            "UPLOAD_FOLDER": str(uploads),
+            "CACHE_FOLDER": str(tmp_path / "cache"),
+        }
+        cfg.update(config)
+        return create_app(cfg).test_client()
+
+    return make
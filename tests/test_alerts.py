@@ -0,0 +1,134 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import create_app
+from app.alerts import FIRING, RESOLVED, AlertEngine, Ledger, Notifier, Rule, SlidingWindow, get_engine, parse_rules
+
+
+def test_parse_rules():
+    cpu, disk, hot = parse_rules("cpu_usage > 90 for 5m; disk_usage >= 90;hot: avg(cpu_temp) > 75 for 10m clear 65")
+    assert (cpu.metric, cpu.op, cpu.threshold, cpu.agg, cpu.window.duration) == ("cpu_usage", ">", 90, "min", 300)
+    assert cpu.name == "cpu_usage > 90 for 5m"
+    assert cpu.clear == 88
+    assert disk.window is None and disk.agg is None
+    assert (hot.name, hot.agg, hot.clear, hot.window.duration) == ("hot", "avg", 65, 600)
+    assert parse_rules("ram_usage < 10 for 30s")[0].agg == "max"
+    assert parse_rules(" ; ") == []
+    with pytest.raises(ValueError):
+        parse_rules("cpu_usage is high")
+
+
+def test_sliding_window():
+    w = SlidingWindow(10)
+    for ts, v in enumerate([5, 1, 7, 3, 9, 2, 8, 4, 6, 0, 5, 5, 5]):
+        w.add(ts, v)
+    # Items with ts in (2, 12]
+    values = [3, 9, 2, 8, 4, 6, 0, 5, 5, 5]
+    assert w.count == len(values)
+    assert w.value("avg") == pytest.approx(sum(values) / len(values))
+    assert (w.value("min"), w.value("max")) == (0, 9)
+    w.add(100, 1)
+    assert (w.count, w.since) == (1, 100)
+    assert not w.covers(105) and w.covers(110)
+
+
+def test_sustained_rule_with_hysteresis():
+    rule = Rule("cpu_usage > 90 for 10s")
+    assert [rule.observe(t, 95) for t in range(11)] == [None] * 10 + [FIRING]
+    # Hovering around the threshold does not flap
+    assert [rule.observe(t, v) for t, v in zip(range(11, 15), (89, 91, 88.5, 95))] == [None] * 4
+    assert rule.observe(15, 87) == RESOLVED
+    # A single dip holds the alert off until it has left the window
+    assert [rule.observe(t, 95 if t != 20 else 50) for t in range(16, 31)] == [None] * 14 + [FIRING]
+
+
+def test_engine_notifies_transitions_once_across_workers(tmp_path):
+    out = tmp_path / "alerts.jsonl"
+    ledger = Ledger(str(tmp_path / "ledger"))
+    notifier = Notifier(file_path=str(out))
+    workers = [AlertEngine(parse_rules("disk_usage > 90"), notifier, ledger) for _ in range(2)]
+    for ts, disk in enumerate([50, 95, 96, 97, 50, 50]):
+        for engine in workers:
+            engine.observe({"disk_usage": disk, "cpu_temp": "N/A"}, ts)
+    notifier.wait()
+    events = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [(e["rule"], e["state"], e["value"], e["ts"]) for e in events] == [
+        ("disk_usage > 90", FIRING, 95, 1),
+        ("disk_usage > 90", RESOLVED, 50, 4),
+    ]
+    assert workers[1].status()[0]["state"] == "ok"
+
+
+def test_restart_during_incident(tmp_path):
+    out = tmp_path / "alerts.jsonl"
+    notifier = Notifier(file_path=str(out))
+
+    def engine():
+        return AlertEngine(parse_rules("disk_usage > 90"), notifier, Ledger(str(tmp_path / "ledger"), stale=10))
+
+    before = engine()
+    for ts in range(30):
+        before.observe({"disk_usage": 95}, ts)
+    # Restarted quickly while still firing: no duplicate
+    after = engine()
+    for ts in range(31, 40):
+        after.observe({"disk_usage": 95}, ts)
+    # Restarted again; the disk recovered while PiDash was down
+    later = engine()
+    for ts in range(100, 110):
+        later.observe({"disk_usage": 50}, ts)
+    # The next incident is notified, and so is its end
+    for ts, disk in zip(range(110, 113), (95, 96, 50)):
+        later.observe({"disk_usage": disk}, ts)
+    notifier.wait()
+    events = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [(e["state"], e["ts"]) for e in events] == [(FIRING, 0), (FIRING, 110), (RESOLVED, 112)]
+
+
+def test_engine_repeats_firing_alerts():
+    notifier = Notifier()
+    engine = AlertEngine(parse_rules("cpu_usage > 90"), notifier, repeat=10)
+    states = [[e["state"] for e in engine.observe({"cpu_usage": 95}, ts)] for ts in range(25)]
+    assert [ts for ts, s in enumerate(states) if s] == [0, 10, 20]
+
+
+def test_webhook_does_not_block_sampling():
+    received, release = [], threading.Event()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            release.wait(5)
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        notifier = Notifier(webhook_url=f"http://127.0.0.1:{server.server_port}/hook")
+        engine = AlertEngine(parse_rules("ram_usage > 80"), notifier)
+        # Returns while the webhook is still blocked
+        assert engine.observe({"ram_usage": 85}, 1)[0]["state"] == FIRING
+        assert received == []
+        release.set()
+        notifier.wait()
+        assert received[0]["rule"] == "ram_usage > 80" and received[0]["value"] == 85
+    finally:
+        server.shutdown()
+
+
+def test_api_alerts(tmp_path):
+    config = {"TESTING": True, "SECRET_KEY": "test", "CACHE_FOLDER": str(tmp_path)}
+    client = create_app(config).test_client()
+    assert client.get("/api/alerts").get_json() == {"rules": []}
+
+    app = create_app({**config, "ALERT_RULES": "swap_usage > 50"})
+    get_engine(app.config).observe({"swap_usage": 60})
+    rules = app.test_client().get("/api/alerts").get_json()["rules"]
+    assert [(r["name"], r["state"], r["value"]) for r in rules] == [("swap_usage > 50", FIRING, 60)]
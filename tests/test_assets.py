@@ -0,0 +1,102 @@
+import gzip
+import os
+import subprocess
+import sys
+
+from flask import Flask, render_template_string
+
+from app import assets, create_app
+
+
+def _sources(root):
+    build = root / "assets" / "build"
+    (build / "monaco" / "vs" / "editor").mkdir(parents=True)
+    (build / "tailwind.css").write_text(".p-4{padding:1rem}\n" * 100)
+    (build / "lucide.min.js").write_text("var lucide={createIcons:function(){}};\n" * 50)
+    (build / "monaco" / "vs" / "loader.js").write_text("var require;\n" * 50)
+    (build / "monaco" / "vs" / "editor" / "editor.main.js").write_text("define([],function(){});\n" * 50)
+    (build / "fonts").mkdir()
+    for weight in (400, 700):
+        (build / "fonts" / f"inter-{weight}.woff2").write_bytes(os.urandom(64))
+
+
+def test_build_fingerprints_bundles(tmp_path):
+    _sources(tmp_path)
+    static = tmp_path / "static"
+    (static / "css").mkdir(parents=True)
+    (static / "css" / "styles.css").write_text(".custom{color:red}")
+
+    manifest = assets.build(str(tmp_path), str(static))
+    assert set(manifest) == {"app.css", "lucide.js", "monaco", "fonts"}
+    dist = static / "dist"
+    css = (dist / manifest["app.css"]).read_text()
+    assert manifest["app.css"].startswith("app.") and ".custom{color:red}" in css
+    # Inter is self-hosted; app.css points at the fingerprinted files
+    assert f"font-weight:700;font-display:swap;src:url({manifest['fonts']}/inter-700.woff2)" in css
+    assert (dist / manifest["fonts"] / "inter-400.woff2").exists()
+    assert gzip.decompress((dist / (manifest["app.css"] + ".gz")).read_bytes()).decode() == css
+    assert (dist / manifest["monaco"] / "editor" / "editor.main.js").exists()
+
+    # Same sources, same names; changed sources replace the old bundle
+    assert assets.build(str(tmp_path), str(static)) == manifest
+    (tmp_path / "assets" / "build" / "tailwind.css").write_text(".p-8{padding:2rem}\n" * 100)
+    rebuilt = assets.build(str(tmp_path), str(static))
+    assert rebuilt["app.css"] != manifest["app.css"]
+    assert not (dist / manifest["app.css"]).exists()
+    assert not (dist / (manifest["app.css"] + ".gz")).exists()
+    assert rebuilt["monaco"] == manifest["monaco"]
+
+
+def test_built_assets_are_immutable_and_drop_cdn(tmp_path):
+    _sources(tmp_path)
+    static = tmp_path / "static"
+    static.mkdir()
+    manifest = assets.build(str(tmp_path), str(static))
+
+    app = Flask(__name__, static_folder=str(static))
+    assets.init_app(app)
+    client = app.test_client()
+    with app.test_request_context():
+        html = render_template_string(
+            "{{ asset_url('tailwind.js') }}|{{ asset_url('app.css') }}|{{ asset_url('monaco') }}"
+        )
+    assert html == f"None|/static/dist/{manifest['app.css']}|/static/dist/{manifest['monaco']}"
+    resp = client.get(f"/static/dist/{manifest['lucide.js']}")
+    assert resp.status_code == 200
+    assert resp.headers["Cache-Control"] == assets.IMMUTABLE_CACHE_CONTROL
+    resp.close()
+    csp = assets.content_security_policy(app)
+    assert "unpkg.com" not in csp and "fonts.googleapis.com" not in csp
+
+
+def test_unbuilt_checkout_falls_back_to_cdn(tmp_path):
+    app = create_app({"TESTING": True, "UPLOAD_FOLDER": str(tmp_path), "SECRET_KEY": "test"})
+    if app.extensions["asset_manifest"]:
+        # A built tree (e.g. in the Docker image) has nothing to fall back to
+        return
+    html = app.test_client().get("/").get_data(as_text=True)
+    assert "https://cdn.tailwindcss.com" in html
+    assert "/static/css/styles.css" in html
+    assert "https://unpkg.com" in assets.content_security_policy(app)
+
+
+def test_standalone_build_does_not_build_the_app(tmp_path):
+    _sources(tmp_path)
+    project = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    env = dict(os.environ, PYTHONPATH=project, CACHE_FOLDER=str(tmp_path / "cache"))
+    out = subprocess.run(
+        [sys.executable, "-m", "app.assets", "--root", str(tmp_path), "--static", str(tmp_path / "static")],
+        cwd=str(tmp_path), env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert out.returncode == 0, out.stderr
+    assert "lucide.js -> dist/lucide." in out.stdout
+    assert (tmp_path / "static" / "dist" / "manifest.json").exists()
+    # No cache folder, rate-limit table or setup file created by the build
+    assert not (tmp_path / "cache").exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["assets", "static"]
+
+
+def test_pages_load_no_external_fonts(tmp_path):
+    client = create_app({"TESTING": True, "UPLOAD_FOLDER": str(tmp_path), "SECRET_KEY": "test"}).test_client()
+    for page in ("/", "/file-manager", "/setup"):
+        assert "fonts.googleapis.com" not in client.get(page).get_data(as_text=True)
@@ -0,0 +1,165 @@
+import time
+
+
+def _wait(client, url):
+    state = client.get(url).get_json()
+    deadline = time.time() + 5
+    while state["status"] not in ("done", "failed", "cancelled") and time.time() < deadline:
+        time.sleep(0.02)
+        state = client.get(url).get_json()
+    return state
+
+
+def test_batch_delete_many_files_in_one_request(app_client, uploads, monkeypatch):
+    client = app_client()
+    for i in range(50):
+        (uploads / f"f{i}.txt").write_text("x")
+    (uploads / "empty").mkdir()
+
+    import app.files as files_mod
+
+    calls = []
+    monkeypatch.setattr(files_mod, "get_user_role", lambda user: calls.append(user) or "admin")
+    with client.session_transaction() as sess:
+        sess["user"] = "alice"
+
+    paths = [f"f{i}.txt" for i in range(50)] + ["empty", "missing.txt", "../outside", ""]
+    resp = client.post("/api/batch/delete", json={"paths": paths})
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["succeeded"] == 51
+    assert body["failed"] == 3
+    assert calls == ["alice"]  # authorised once for the whole batch
+    errors = {r["path"]: r["error"] for r in body["results"] if not r["ok"]}
+    assert errors == {"missing.txt": "Not found", "../outside": "Invalid path", "": "Invalid path"}
+    assert list(uploads.iterdir()) == []
+
+
+def test_batch_delete_trees_use_one_job(app_client, uploads):
+    client = app_client()
+    for name in ("a", "b"):
+        (uploads / name / "sub").mkdir(parents=True)
+        (uploads / name / "sub" / "f").write_bytes(b"12345")
+    (uploads / "c").mkdir()
+    (uploads / "c" / "f").write_text("x")
+
+    resp = client.post("/api/batch/delete", json={"paths": ["c"]})
+    assert resp.get_json()["results"] == [{"path": "c", "ok": False, "error": "Directory not empty"}]
+
+    resp = client.post("/api/batch/delete", json={"paths": ["a", "b"], "recursive": True})
+    assert resp.status_code == 202
+    body = resp.get_json()
+    assert [r["ok"] for r in body["results"]] == [None, None]
+    state = _wait(client, body["status_url"])
+    assert state["status"] == "done"
+    assert [r["ok"] for r in state["result"]["results"]] == [True, True]
+    assert state["result"]["deleted_bytes"] == 10
+    assert sorted(p.name for p in uploads.iterdir()) == ["c"]
+
+
+def test_batch_move_and_copy(app_client, uploads):
+    client = app_client()
+    (uploads / "dest").mkdir()
+    (uploads / "one.txt").write_text("1")
+    (uploads / "two.txt").write_text("2")
+    (uploads / "dest" / "two.txt").write_text("existing")
+    (uploads / "tree" / "inner").mkdir(parents=True)
+    (uploads / "tree" / "inner" / "x").write_text("x")
+
+    resp = client.post("/api/batch/move", json={"paths": ["one.txt", "two.txt"], "destination": "dest"})
+    body = resp.get_json()
+    assert resp.status_code == 200
+    results = {r["path"]: r for r in body["results"]}
+    assert results["one.txt"]["ok"] is True
+    assert results["two.txt"]["error"] == "Destination already exists"
+    assert (uploads / "dest" / "one.txt").read_text() == "1"
+
+    resp = client.post("/api/batch/move", json={"items": [{"from": "two.txt", "to": "renamed.txt"}]})
+    assert resp.get_json()["succeeded"] == 1
+    assert (uploads / "renamed.txt").read_text() == "2"
+
+    resp = client.post("/api/batch/copy", json={"items": [
+        {"from": "tree", "to": "tree-copy"},
+        {"from": "tree", "to": "tree/inner/loop"},
+    ]})
+    assert resp.status_code == 202
+    body = resp.get_json()
+    assert body["failed"] == 1
+    state = _wait(client, body["status_url"])
+    assert state["status"] == "done"
+    assert state["result"]["results"] == [{"path": "tree", "ok": True}]
+    assert (uploads / "tree-copy" / "inner" / "x").read_text() == "x"
+    assert (uploads / "tree" / "inner" / "x").exists()
+
+
+def test_batch_item_limit(app_client):
+    client = app_client(BATCH_MAX_ITEMS=2)
+    resp = client.post("/api/batch/delete", json={"paths": ["a", "b", "c"]})
+    assert resp.status_code == 413
+    assert client.post("/api/batch/delete", json={"nope": 1}).status_code == 400
+
+
+def test_copy_file_methods_and_metadata(tmp_path, monkeypatch):
+    import errno
+    import os
+
+    from app import fileops
+
+    src = tmp_path / "src.bin"
+    data = os.urandom(3 * 1024 * 1024 + 17)
+    src.write_bytes(data)
+    os.chmod(src, 0o640)
+    os.utime(src, (1_000_000, 1_000_000))
+
+    seen = []
+    method = fileops.copy_file(str(src), str(tmp_path / "a.bin"), seen.append)
+    assert method in ("reflink", "copy_file_range", "buffered")
+    assert sum(seen) == len(data)
+    assert (tmp_path / "a.bin").read_bytes() == data
+    st = os.stat(tmp_path / "a.bin")
+    assert st.st_mode & 0o777 == 0o640
+    assert int(st.st_mtime) == 1_000_000
+
+    # No reflink and no copy_file_range support: falls back to a plain copy
+    monkeypatch.setattr(fileops, "fcntl", None)
+    monkeypatch.setattr(fileops, "COPY_BUFFER_SIZE", 1024 * 1024)
+
+    def unsupported(*args):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(os, "copy_file_range", unsupported, raising=False)
+    seen.clear()
+    assert fileops.copy_file(str(src), str(tmp_path / "b.bin"), seen.append) == "buffered"
+    assert len(seen) == 4
+    assert (tmp_path / "b.bin").read_bytes() == data
+
+    # Filesystems that report 0 bytes copied instead of failing
+    monkeypatch.setattr(os, "copy_file_range", lambda *args: 0, raising=False)
+    assert fileops.copy_file(str(src), str(tmp_path / "c.bin")) == "buffered"
+    assert (tmp_path / "c.bin").read_bytes() == data
+
+
+def test_cross_device_move_keeps_source_if_copy_is_short(tmp_path, monkeypatch):
+    import errno
+    import os
+
+    from app import fileops
+    from app.jobs import JobManager
+
+    (tmp_path / "src" / "sub").mkdir(parents=True)
+    (tmp_path / "src" / "sub" / "a.txt").write_text("hello")
+
+    def cross_device(a, b):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    def short_copy(src, dst, progress=lambda n: None):
+        open(dst, "wb").close()
+        return "copy_file_range"
+
+    monkeypatch.setattr(os, "rename", cross_device)
+    monkeypatch.setattr(fileops, "copy_file", short_copy)
+    manager = JobManager(str(tmp_path / "jobs"), workers=1)
+    job = manager.submit("move", lambda job: fileops.move_path(job, str(tmp_path / "src"), str(tmp_path / "dst")))
+    assert manager.wait(job.id)["status"] == "failed"
+    assert (tmp_path / "src" / "sub" / "a.txt").read_text() == "hello"
+    assert not (tmp_path / "dst").exists()
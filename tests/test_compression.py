@@ -0,0 +1,61 @@
+import gzip
+import json
+
+import pytest
+
+from app import compression
+from app.compression import negotiate
+
+
+def test_negotiate(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert negotiate("gzip, deflate, br") == "gzip"
+    assert negotiate("gzip;q=0, identity") is None
+    assert negotiate("*") == "gzip"
+    assert negotiate("") is None
+    monkeypatch.setattr(compression, "brotli", object())
+    assert negotiate("gzip, br") == "br"
+    assert negotiate("gzip, br;q=0.5") == "gzip"
+
+
+def test_large_json_is_gzipped(app_client, uploads):
+    client = app_client()
+    for i in range(200):
+        (uploads / f"file-{i:04d}.txt").write_text("x")
+
+    plain = client.get("/api/files")
+    assert "Content-Encoding" not in plain.headers
+    assert "Accept-Encoding" in plain.headers["Vary"]
+
+    resp = client.get("/api/files", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in resp.headers["Vary"]
+    assert len(resp.data) < len(plain.data)
+    assert json.loads(gzip.decompress(resp.data)) == plain.get_json()
+
+
+def test_small_and_streamed_responses_are_not_compressed(app_client, uploads):
+    client = app_client()
+    resp = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in resp.headers
+
+    (uploads / "big.json").write_text(json.dumps(list(range(5000))))
+    resp = client.get("/download/big.json", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in resp.headers
+
+
+def test_static_files_are_precompressed(app_client, tmp_path):
+    client = app_client()
+    plain = client.get("/static/css/styles.css")
+    plain_data = plain.data
+    plain.close()
+    if len(plain_data) < compression.STATIC_MIN_SIZE:
+        pytest.skip("stylesheet too small to be precompressed")
+
+    resp = client.get("/static/css/styles.css", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert resp.mimetype == "text/css"
+    assert "Accept-Encoding" in resp.headers["Vary"]
+    assert gzip.decompress(resp.data) == plain_data
+    resp.close()
+    assert (tmp_path / "cache" / "static" / "css" / "styles.css.gz").exists()
@@ -0,0 +1,114 @@
+import os
+import time
+
+import pytest
+
+import app as app_module
+from app import create_app
+from app.dirsize import dir_sizes
+from app.metrics_buffer import buffer
+
+
+@pytest.fixture
+def client(tmp_path):
+    buffer.clear()
+    app = create_app({"TESTING": True, "UPLOAD_FOLDER": str(tmp_path), "SECRET_KEY": "test"})
+    yield app.test_client()
+    buffer.clear()
+
+
+def _sample(cpu=1.0):
+    buffer.append_sample({"cpu_usage": cpu, "ram_usage": 2.0, "disk_usage": 3.0})
+
+
+def test_stats_304_until_next_sample(client, monkeypatch):
+    _sample()
+    resp = client.get("/api/stats")
+    etag = resp.headers["ETag"]
+    assert resp.headers["Cache-Control"] == "no-cache"
+    assert resp.get_json()["cpu_usage"] == 1.0
+
+    def fail():
+        raise AssertionError("stats computed for a 304")
+
+    monkeypatch.setattr(app_module, "get_system_stats", fail)
+    resp = client.get("/api/stats", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers["ETag"] == etag
+    assert resp.data == b""
+
+    # MessagePack is a different representation
+    resp = client.get("/api/stats", headers={"If-None-Match": etag, "Accept": "application/msgpack"})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+    _sample(cpu=5.0)
+    resp = client.get("/api/stats", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.get_json()["cpu_usage"] == 5.0
+    assert resp.headers["ETag"] != etag
+
+
+def test_stats_without_sampler_has_no_etag(client, monkeypatch):
+    monkeypatch.setattr(app_module, "get_system_stats", lambda: {"cpu_usage": 9.0})
+    resp = client.get("/api/stats")
+    assert resp.get_json() == {"cpu_usage": 9.0}
+    assert "ETag" not in resp.headers
+
+
+def test_history_304_matches_compressed_variant(client, monkeypatch):
+    now = time.time()
+    for i in range(200):
+        buffer.append_sample({"cpu_usage": float(i), "ram_usage": 2.0, "disk_usage": 3.0}, ts=now - 200 + i)
+    _sample()
+    headers = {"Accept-Encoding": "gzip"}
+    resp = client.get("/api/stats/history?minutes=5", headers=headers)
+    assert resp.headers["Content-Encoding"] == "gzip"
+    etag = resp.headers["ETag"]
+    assert etag.endswith('-gzip"')
+
+    monkeypatch.setattr(buffer, "get_history", lambda **kw: pytest.fail("history rebuilt for a 304"))
+    resp = client.get("/api/stats/history?minutes=5", headers={**headers, "If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers["ETag"] == etag
+    monkeypatch.undo()
+    # Other parameters are other resources
+    resp = client.get("/api/stats/history?minutes=5&layout=columns", headers={"If-None-Match": etag})
+    assert resp.status_code != 304
+
+
+def test_listing_304_until_directory_changes(client, tmp_path, monkeypatch):
+    (tmp_path / "a.txt").write_text("a")
+    old = time.time() - 60
+    os.utime(tmp_path, (old, old))
+
+    resp = client.get("/api/files?path=")
+    etag = resp.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    monkeypatch.setattr("app.files._list_directory", lambda *a: pytest.fail("listed for a 304"))
+    resp = client.get("/api/files?path=", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    monkeypatch.undo()
+
+    (tmp_path / "b.txt").write_text("b")
+    os.utime(tmp_path, (old + 1, old + 1))
+    resp = client.get("/api/files?path=", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert {e["name"] for e in resp.get_json()["entries"]} == {"a.txt", "b.txt"}
+
+
+def test_listing_etag_follows_folder_sizes_and_skips_racy_dirs(client, tmp_path):
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    old = time.time() - 60
+    os.utime(tmp_path, (old, old))
+
+    first = client.get("/api/files?path=").headers["ETag"]
+    dir_sizes.wait()
+    # The folder size became known: same directory, new validator
+    assert client.get("/api/files?path=").headers["ETag"] != first
+
+    # Just modified: no validator until the mtime tick has passed
+    (tmp_path / "new.txt").write_text("x")
+    assert "ETag" not in client.get("/api/files?path=").headers
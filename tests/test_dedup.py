@@ -0,0 +1,81 @@
+import hashlib
+import io
+import os
+
+from app.dedup import DedupStore
+from app.uploads import SESSIONS_DIRNAME
+
+
+def _upload(client, content, name, path=""):
+    data = {"file": (io.BytesIO(content), name), "path": path}
+    return client.post("/api/upload", data=data, content_type="multipart/form-data").get_json()
+
+
+def test_identical_uploads_are_hardlinked(app_client, uploads):
+    client = app_client(DEDUP_UPLOADS=True)
+    content = os.urandom(64 * 1024)
+
+    first = _upload(client, content, "a.jpg")
+    assert first["deduplicated"] is False
+    second = _upload(client, content, "b.jpg", "backup")
+    assert second["deduplicated"] is True
+    assert second["sha256"] == hashlib.sha256(content).hexdigest()
+
+    a, b = uploads / "a.jpg", uploads / "backup" / "b.jpg"
+    assert b.read_bytes() == content
+    assert os.stat(a).st_ino == os.stat(b).st_ino
+    assert _upload(client, b"different", "c.txt")["deduplicated"] is False
+
+    stats = client.get("/api/dedup").get_json()
+    assert stats["enabled"] is True
+    assert stats["saved_bytes"] == len(content)
+    assert stats["files"] == 3
+    # No ingest temp files left behind
+    assert not [n for n in os.listdir(uploads / SESSIONS_DIRNAME) if n.startswith("ingest-")]
+
+
+def test_resumable_upload_dedups_against_existing_blob(app_client, uploads):
+    client = app_client(DEDUP_UPLOADS=True)
+    content = b"0123456789" * 100
+    assert _upload(client, content, "orig.txt")["deduplicated"] is False
+
+    sid = client.post("/api/upload/session", json={"filename": "copy.txt", "size": len(content)}).get_json()["id"]
+    client.put(f"/api/upload/session/{sid}?offset=0", data=content[:400])
+    client.put(f"/api/upload/session/{sid}?offset=400", data=content[400:])
+    result = client.post(f"/api/upload/session/{sid}/complete").get_json()
+    assert result["deduplicated"] is True
+    assert result["sha256"] == hashlib.sha256(content).hexdigest()
+    assert os.stat(uploads / "copy.txt").st_ino == os.stat(uploads / "orig.txt").st_ino
+
+
+def test_modified_blob_is_not_reused_and_gc_drops_orphans(tmp_path):
+    store = DedupStore(str(tmp_path))
+    path = tmp_path / "x.bin"
+    path.write_bytes(b"abc")
+    digest = hashlib.sha256(b"abc").hexdigest()
+    store.add(digest, str(path))
+    assert store.lookup(digest, 3) is not None
+
+    # Another worker process sees the same index
+    other = DedupStore(str(tmp_path))
+    assert other.lookup(digest, 3) is not None
+
+    # Edited in place (same inode, new mtime): no longer a valid blob
+    with open(path, "r+b") as fh:
+        fh.write(b"xyz")
+    os.utime(path, ns=(0, 12345))
+    assert store.lookup(digest, 3) is None
+
+    # Once every user copy is gone the blob is collected
+    os.remove(path)
+    assert store.gc()["removed_blobs"] == 1
+    assert other.lookup(digest, 3) is None
+    assert store.stats()["blobs"] == 0
+
+
+def test_dedup_disabled_by_default(app_client, uploads):
+    client = app_client()
+    content = b"same"
+    assert "deduplicated" not in _upload(client, content, "a.txt")
+    _upload(client, content, "b.txt")
+    assert os.stat(uploads / "a.txt").st_ino != os.stat(uploads / "b.txt").st_ino
@@ -0,0 +1,71 @@
+import os
+
+from app import create_app
+from app.dirsize import DirSizeCache, dir_sizes
+
+
+def test_compute_recursive_size(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "b").mkdir()
+    (tmp_path / "top.bin").write_bytes(b"x" * 10)
+    (tmp_path / "a" / "f.bin").write_bytes(b"x" * 20)
+    (tmp_path / "a" / "b" / "g.bin").write_bytes(b"x" * 30)
+
+    cache = DirSizeCache()
+    assert cache.compute(str(tmp_path)) == 60
+    assert cache.cached(str(tmp_path / "a")) == 50
+
+
+def test_only_changed_subtrees_are_rescanned(tmp_path, monkeypatch):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    (tmp_path / "a" / "f.bin").write_bytes(b"x" * 5)
+    (tmp_path / "b" / "g.bin").write_bytes(b"x" * 7)
+
+    cache = DirSizeCache()
+    assert cache.compute(str(tmp_path)) == 12
+
+    scanned = []
+    original = cache._scan
+
+    def tracking_scan(path, st):
+        scanned.append(path)
+        return original(path, st)
+
+    monkeypatch.setattr(cache, "_scan", tracking_scan)
+    (tmp_path / "b" / "h.bin").write_bytes(b"x" * 3)
+    assert cache.compute(str(tmp_path)) == 15
+    assert scanned == [str(tmp_path / "b")]
+
+
+def test_removed_subdirectories_are_forgotten(tmp_path):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    (tmp_path / "a" / "b" / "f.bin").write_bytes(b"x" * 4)
+    cache = DirSizeCache()
+    assert cache.compute(str(tmp_path)) == 4
+
+    os.remove(tmp_path / "a" / "b" / "f.bin")
+    os.rmdir(tmp_path / "a" / "b")
+    assert cache.compute(str(tmp_path)) == 0
+    assert cache.cached(str(tmp_path / "a" / "b")) is None
+
+
+def test_listing_reports_computing_then_ready(tmp_path):
+    uploads = tmp_path / "uploads"
+    (uploads / "sub").mkdir(parents=True)
+    (uploads / "sub" / "f.bin").write_bytes(b"x" * 42)
+
+    dir_sizes.clear()
+    app = create_app({"TESTING": True, "UPLOAD_FOLDER": str(uploads), "SECRET_KEY": "test"})
+    client = app.test_client()
+
+    resp = client.get("/api/files")
+    entry = resp.get_json()["entries"][0]
+    assert entry["is_dir"] is True
+    assert entry["size_status"] in ("computing", "ready")
+
+    dir_sizes.wait()
+    resp = client.get("/api/files")
+    entry = resp.get_json()["entries"][0]
+    assert entry["size_status"] == "ready"
+    assert entry["size"] == 42
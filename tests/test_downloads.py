@@ -0,0 +1,69 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def data_file(uploads):
+    path = uploads / "data.bin"
+    path.write_bytes(bytes(range(256)) * 4)
+    return path
+
+
+def test_full_download_has_validators(app_client):
+    client = app_client()
+    resp = client.get("/download/data.bin")
+    assert resp.status_code == 200
+    assert len(resp.data) == 1024
+    assert resp.headers["Accept-Ranges"] == "bytes"
+    assert resp.headers["ETag"]
+    assert "attachment" in resp.headers["Content-Disposition"]
+
+    resp = client.get("/download/data.bin", headers={"If-None-Match": resp.headers["ETag"]})
+    assert resp.status_code == 304
+    assert resp.data == b""
+
+
+def test_range_request_returns_partial_content(app_client):
+    client = app_client()
+    resp = client.get("/open/data.bin", headers={"Range": "bytes=10-19"})
+    assert resp.status_code == 206
+    assert resp.data == bytes(range(10, 20))
+    assert resp.headers["Content-Range"] == "bytes 10-19/1024"
+    assert resp.headers["Content-Length"] == "10"
+
+    resp = client.get("/open/data.bin", headers={"Range": "bytes=5000-"})
+    assert resp.status_code == 416
+    assert resp.headers["Content-Range"] == "bytes */1024"
+
+
+def test_unsupported_ranges_send_full_file(app_client):
+    client = app_client()
+    for header in ("bytes=0-9,20-29", "items=0-9"):
+        resp = client.get("/open/data.bin", headers={"Range": header})
+        assert resp.status_code == 200
+        assert "Content-Range" not in resp.headers
+        assert resp.data == bytes(range(256)) * 4
+
+
+def test_if_range_with_stale_etag_sends_full_file(app_client):
+    client = app_client()
+    resp = client.get("/open/data.bin", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert resp.status_code == 200
+    assert len(resp.data) == 1024
+
+    etag = client.get("/open/data.bin").headers["ETag"]
+    resp = client.get("/open/data.bin", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert resp.status_code == 206
+
+
+def test_x_accel_redirect_offload(app_client):
+    client = app_client(DOWNLOAD_OFFLOAD="x-accel-redirect", DOWNLOAD_OFFLOAD_PREFIX="/internal/")
+    resp = client.get("/download/data.bin")
+    assert resp.status_code == 200
+    assert resp.headers["X-Accel-Redirect"] == "/internal/data.bin"
+    assert resp.data == b""
+
+
+def test_x_sendfile_offload(app_client, data_file):
+    client = app_client(DOWNLOAD_OFFLOAD="x-sendfile")
+    resp = client.get("/download/data.bin")
+    assert resp.headers["X-Sendfile"] == str(data_file)
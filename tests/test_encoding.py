@@ -0,0 +1,132 @@
+import struct
+
+import pytest
+
+from app import create_app
+from app import encoding
+from app.encoding import columns, packb
+
+
+def _unpack(data, pos=0):
+    """Minimal MessagePack decoder for the types the stats APIs produce."""
+    b = data[pos]
+    pos += 1
+    if b <= 0x7F:
+        return b, pos
+    if b >= 0xE0:
+        return b - 0x100, pos
+    if 0x80 <= b <= 0x8F or b in (0xDE, 0xDF):
+        n, pos = (b & 0x0F, pos) if b <= 0x8F else _length(data, pos, b == 0xDE)
+        out = {}
+        for _ in range(n):
+            k, pos = _unpack(data, pos)
+            out[k], pos = _unpack(data, pos)
+        return out, pos
+    if 0x90 <= b <= 0x9F or b in (0xDC, 0xDD):
+        n, pos = (b & 0x0F, pos) if b <= 0x9F else _length(data, pos, b == 0xDC)
+        out = []
+        for _ in range(n):
+            v, pos = _unpack(data, pos)
+            out.append(v)
+        return out, pos
+    if 0xA0 <= b <= 0xBF or b in (0xD9, 0xDA, 0xDB):
+        if b <= 0xBF:
+            n = b & 0x1F
+        elif b == 0xD9:
+            n, pos = data[pos], pos + 1
+        else:
+            n, pos = _length(data, pos, b == 0xDA)
+        return data[pos:pos + n].decode(), pos + n
+    fixed = {0xC0: None, 0xC2: False, 0xC3: True}
+    if b in fixed:
+        return fixed[b], pos
+    fmt = {0xCB: ">d", 0xCC: ">B", 0xCD: ">H", 0xCE: ">I", 0xCF: ">Q", 0xD0: ">b", 0xD1: ">h", 0xD2: ">i", 0xD3: ">q"}[b]
+    size = struct.calcsize(fmt)
+    return struct.unpack_from(fmt, data, pos)[0], pos + size
+
+
+def _length(data, pos, short):
+    fmt = ">H" if short else ">I"
+    return struct.unpack_from(fmt, data, pos)[0], pos + struct.calcsize(fmt)
+
+
+def unpackb(data):
+    value, pos = _unpack(data)
+    assert pos == len(data)
+    return value
+
+
+def test_builtin_encoder_matches_spec(monkeypatch):
+    monkeypatch.setattr(encoding, "msgpack", None)
+    assert packb(None) == b"\xc0"
+    assert packb([True, False]) == b"\x92\xc3\xc2"
+    assert packb(5) == b"\x05"
+    assert packb(-1) == b"\xff"
+    assert packb(200) == b"\xcc\xc8"
+    assert packb(-200) == b"\xd1\xff\x38"
+    assert packb(2**40) == b"\xcf" + struct.pack(">Q", 2**40)
+    assert packb(1.5) == b"\xcb" + struct.pack(">d", 1.5)
+    assert packb("abc") == b"\xa3abc"
+    assert packb("x" * 40) == b"\xd9\x28" + b"x" * 40
+    assert packb({"a": [1.0, 2.0]}) == b"\x81\xa1a\x92" + b"\xcb" + struct.pack(">d", 1.0) + b"\xcb" + struct.pack(">d", 2.0)
+    value = {"n": list(range(300)), "s": "é" * 100, "f": [0.5] * 20, "neg": -2**40}
+    assert unpackb(packb(value)) == value
+    with pytest.raises(TypeError):
+        packb(object())
+
+
+def test_columns():
+    samples = [{"ts": 1, "cpu_usage": 1.0}, {"ts": 2, "cpu_usage": 2.0, "count": 3}]
+    assert columns(samples) == {"ts": [1, 2], "cpu_usage": [1.0, 2.0], "count": [None, 3]}
+    assert columns([]) == {}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(encoding, "msgpack", None)
+    from app.metrics_buffer import buffer
+
+    buffer.clear()
+    for i in range(3):
+        buffer.append_sample({"cpu_usage": 10.0 * i, "ram_usage": 50.0, "disk_usage": 70.0})
+    app = create_app({"TESTING": True, "SECRET_KEY": "test"})
+    yield app.test_client()
+    buffer.clear()
+
+
+def test_history_negotiates_msgpack_columns(client):
+    resp = client.get("/api/stats/history?minutes=1&step=60", headers={"Accept": "application/msgpack"})
+    assert resp.mimetype == "application/msgpack"
+    assert "Accept" in resp.headers["Vary"]
+    data = unpackb(resp.data)
+    assert data["minutes"] == 1
+    assert set(data["columns"]) == {"ts", "cpu_usage", "ram_usage", "disk_usage", "count"}
+    assert sum(data["columns"]["count"]) == 3
+
+    # Browsers and existing clients still get JSON rows
+    for accept in ("*/*", "application/json", "application/json, application/msgpack;q=0.5"):
+        resp = client.get("/api/stats/history?minutes=1&step=60", headers={"Accept": accept})
+        assert resp.mimetype == "application/json"
+        assert "samples" in resp.get_json()
+
+    resp = client.get("/api/stats/history?minutes=1&step=60&layout=columns")
+    assert resp.get_json()["columns"]["count"] == data["columns"]["count"]
+    assert client.get("/api/stats/history?format=msgpack").mimetype == "application/msgpack"
+
+
+def test_stats_and_stream_msgpack(client, monkeypatch):
+    monkeypatch.setenv("REALTIME_INTERVAL", "0")
+    resp = client.get("/api/stats", headers={"Accept": "application/x-msgpack"})
+    assert resp.mimetype == "application/msgpack"
+    assert "cpu_usage" in unpackb(resp.data)
+
+    resp = client.get("/api/stats/stream?count=2", headers={"Accept": "application/msgpack"})
+    assert resp.mimetype == "application/msgpack"
+    first, pos = _unpack(resp.data)
+    second, end = _unpack(resp.data, pos)
+    assert end == len(resp.data)
+    assert "cpu_usage" in first and "cpu_usage" in second
+
+    resp = client.get("/api/stats/stream?count=1")
+    assert resp.mimetype == "text/event-stream"
+    assert resp.data.startswith(b"data: {")
@@ -1,4 +1,5 @@
 import os
+import time
 from app import create_app
 
 
@@ -84,7 +85,13 @@ def test_api_delete_and_move(tmp_path):
 
     # Now delete recursively
     resp = client.post("/api/delete", json={"path": "todel", "recursive": True})
-    assert resp.status_code == 200
+    assert resp.status_code == 202
+    job = client.get(resp.get_json()["status_url"]).get_json()
+    deadline = time.time() + 5
+    while job["status"] not in ("done", "failed") and time.time() < deadline:
+        time.sleep(0.02)
+        job = client.get(resp.get_json()["status_url"]).get_json()
+    assert job["status"] == "done"
     assert not (uploads / "todel").exists()
 
     # Test renaming/moving a file
@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import create_app
+from app.fleet import Fleet, PeerPoller, parse_peers
+
+
+class StandIn:
+    """A local stand-in for a PiDash node serving /api/stats over keep-alive HTTP/1.1."""
+
+    def __init__(self, name, delay=0.0):
+        self.delay = delay
+        self.ports = set()
+        self.keys = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if self.path.startswith("/api/stats/history"):
+                    payload = {"minutes": 5, "step": 5, "samples": [{"ts": 1, "cpu_usage": 10.0}]}
+                elif self.path == "/api/stats":
+                    stand_in.ports.add(self.client_address[1])
+                    stand_in.keys.append(self.headers.get("X-API-KEY"))
+                    time.sleep(stand_in.delay)
+                    payload = {"hostname": name, "cpu_usage": 12.5, "ram_usage": 40.0, "disk_usage": 70.0}
+                else:
+                    self.send_error(404)
+                    return
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_ins():
+    nodes = []
+
+    def make(name, delay=0.0):
+        node = StandIn(name, delay)
+        nodes.append(node)
+        return node
+
+    yield make
+    for node in nodes:
+        node.stop()
+
+
+def test_parse_peers():
+    assert parse_peers("pi2=http://10.0.0.2:5001/, http://pi3.local:5001") == [
+        ("pi2", "http://10.0.0.2:5001"),
+        ("pi3.local", "http://pi3.local:5001"),
+    ]
+    assert parse_peers("") == []
+    with pytest.raises(ValueError):
+        parse_peers("pi2=ftp://10.0.0.2")
+
+
+def test_poller_reuses_connection_and_keeps_last_snapshot(stand_ins):
+    node = stand_ins("alpha")
+    poller = PeerPoller("alpha", node.url, api_key="k", timeout=2)
+    assert poller.state()["status"] == "pending"
+
+    assert poller.poll(history=True)
+    assert poller.poll()
+    assert poller.poll()
+    state = poller.state()
+    assert state["status"] == "ok"
+    assert state["stats"]["hostname"] == "alpha"
+    assert state["history"] == [{"ts": 1, "cpu_usage": 10.0}]
+    # One keep-alive connection served every request
+    assert len(node.ports) == 1
+    assert node.keys == ["k", "k", "k"]
+
+    node.stop()
+    poller.close()
+    assert not poller.poll()
+    state = poller.state()
+    assert state["status"] == "unreachable"
+    assert state["error"]
+    # Last-known data is still served
+    assert state["stats"]["hostname"] == "alpha"
+
+
+def test_slow_peer_does_not_delay_others(stand_ins):
+    fast = stand_ins("fast")
+    slow = stand_ins("slow", delay=1.5)
+    fleet = Fleet([("fast", fast.url), ("slow", slow.url)], timeout=0.3, interval=0.2, idle=2)
+
+    started = time.monotonic()
+    snapshot = fleet.snapshot()
+    assert time.monotonic() - started < 0.2
+    assert [n["status"] for n in snapshot["nodes"]] == ["pending", "pending"]
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        nodes = {n["name"]: n for n in fleet.snapshot()["nodes"]}
+        if nodes["fast"]["status"] == "ok" and nodes["slow"]["status"] == "unreachable":
+            break
+        time.sleep(0.05)
+    assert nodes["fast"]["status"] == "ok"
+    assert nodes["fast"]["stats"]["hostname"] == "fast"
+    assert nodes["slow"]["status"] == "unreachable"
+
+    # The fast node kept updating while the slow one timed out
+    first = nodes["fast"]["updated"]
+    time.sleep(0.6)
+    nodes = {n["name"]: n for n in fleet.snapshot()["nodes"]}
+    assert nodes["fast"]["updated"] > first
+    assert fleet.snapshot()["summary"] == {"total": 2, "ok": 1, "unreachable": 1}
+
+
+def test_fleet_endpoint_and_page(tmp_path, stand_ins):
+    node = stand_ins("beta")
+    app = create_app(
+        {
+            "TESTING": True,
+            "UPLOAD_FOLDER": str(tmp_path),
+            "SECRET_KEY": "test",
+            "FLEET_PEERS": f"beta={node.url}",
+            "FLEET_POLL_INTERVAL": 0.2,
+            "FLEET_IDLE_SECONDS": 2,
+        }
+    )
+    client = app.test_client()
+    assert b"Fleet" in client.get("/fleet").data
+
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        data = client.get("/api/fleet").get_json()
+        if data["nodes"][0]["status"] == "ok":
+            break
+        time.sleep(0.05)
+    assert data["nodes"][0]["name"] == "beta"
+    assert data["nodes"][0]["stats"]["cpu_usage"] == 12.5
+    assert data["summary"]["ok"] == 1
+
+
+def test_fleet_requires_api_key(tmp_path, monkeypatch):
+    # Peer stats are fetched with FLEET_API_KEY, so they must not be
+    # republished to clients without one
+    monkeypatch.setenv("API_KEY", "secret")
+    app = create_app({"TESTING": True, "UPLOAD_FOLDER": str(tmp_path), "SECRET_KEY": "test"})
+    client = app.test_client()
+    assert client.get("/api/fleet").status_code == 401
+    assert client.get("/fleet").status_code == 401
+    assert client.get("/api/fleet", headers={"X-API-KEY": "secret"}).status_code == 200
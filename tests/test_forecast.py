@@ -0,0 +1,73 @@
+import pytest
+
+from app import create_app
+from app.forecast import DiskForecast, LinearTrend, MinuteRollup, get_forecast
+
+GB = 1024**3
+
+
+def test_linear_trend_slides_and_stays_precise():
+    trend = LinearTrend(window=600)
+    base = 1.7e9
+    for i in range(1000):
+        x = base + 60 * i
+        # Slope flips halfway; only the last 10 minutes count
+        y = 500 * GB + (1000 * 60 * i if i < 500 else -2000 * 60 * i)
+        trend.add(x, y)
+    slope, value = trend.fit()
+    assert len(trend) == 10
+    assert slope == pytest.approx(-2000)
+    assert value == pytest.approx(500 * GB - 2000 * 60 * 999)
+    assert LinearTrend(60).fit() is None
+
+
+def test_minute_rollup():
+    rollup = MinuteRollup()
+    assert [rollup.add(t, t) for t in (0, 30, 59)] == [None] * 3
+    assert rollup.add(60, 100) == (pytest.approx(89 / 3), pytest.approx(89 / 3))
+    assert rollup.add(200, 0) == (60, 100)
+
+
+def test_forecast_time_until_full():
+    forecast = DiskForecast(["/", "/mnt/usb"], window_minutes=60, min_minutes=5)
+    snapshots = []
+    for t in range(0, 20 * 60, 10):
+        # 10 MB/min on / (20 GB, 1 GB of it reserved for root), shrinking /mnt/usb
+        used = 10 * GB + t * 10 * 1024**2 // 60
+        snapshots.append(forecast.observe(t, {"/": (used, 19 * GB - used), "/mnt/usb": (GB - t, GB + t)}))
+    root, usb = snapshots[-1]["/"], snapshots[-1]["/mnt/usb"]
+    assert root["minutes"] == 19
+    assert root["bytes_per_hour"] == pytest.approx(600 * 1024**2)
+    # 9 GB were free to PiDash at t=0; the newest closed minute averages t=1105s
+    rate = 10 * 1024**2 / 60
+    assert root["seconds_until_full"] == pytest.approx(9 * GB / rate - 1105)
+    assert usb["bytes_per_hour"] < 0 and usb["seconds_until_full"] is None
+    # Unchanged between minute boundaries
+    assert snapshots[-1] is snapshots[-2]
+
+    early = DiskForecast(["/"], min_minutes=5).observe(0, {"/": (1, 2)})
+    assert early == {"/": {"bytes_per_hour": None, "seconds_until_full": None, "minutes": 0}}
+
+
+def test_stats_and_metrics_expose_forecast(monkeypatch):
+    from app.metrics_buffer import buffer
+
+    app = create_app({"TESTING": True, "SECRET_KEY": "test", "DISK_FORECAST_MOUNTS": "/data"})
+    forecast = get_forecast(app.config)
+    for t in range(0, 15 * 60, 30):
+        snapshot = forecast.observe(t, {"/data": (GB + t * 1000, GB - t * 1000)})
+    buffer.clear()
+    buffer.append_sample({"cpu_usage": 1.0, "disk_usage": 50.0, "disk_forecast": snapshot})
+    try:
+        client = app.test_client()
+        data = client.get("/api/stats").get_json()
+        assert data["disk_forecast"]["/data"]["bytes_per_hour"] == pytest.approx(3600 * 1000)
+
+        body = client.get("/metrics").data.decode()
+        assert 'pidash_disk_fill_rate_bytes_per_second{hostname=' in body
+        assert 'mount="/data"' in body
+        assert "pidash_disk_seconds_until_full" in body
+    finally:
+        buffer.clear()
+
+    assert get_forecast({"DISK_FORECAST_MOUNTS": ""}) is None
@@ -0,0 +1,158 @@
+import errno
+import os
+import threading
+import time
+
+import pytest
+
+from app.jobs import JobManager, JobQueueFull
+
+
+def test_job_reports_progress_and_result(tmp_path):
+    manager = JobManager(str(tmp_path / "jobs"), workers=1)
+
+    def work(job):
+        for _ in range(3):
+            job.advance(1, 10)
+        return {"ok": True}
+
+    job = manager.submit("test", work, {"n": 3})
+    state = manager.wait(job.id)
+    assert state["status"] == "done"
+    assert state["result"] == {"ok": True}
+    assert state["progress"]["files"] == 3
+    assert state["progress"]["bytes"] == 30
+
+    # Another process sees the same state through the state file
+    other = JobManager(str(tmp_path / "jobs"), workers=1)
+    assert other.get(job.id)["status"] == "done"
+    assert other.get("../../etc/passwd") is None
+
+
+def test_cancel_running_job_from_other_process(tmp_path):
+    manager = JobManager(str(tmp_path / "jobs"), workers=1)
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        while True:
+            job.advance(1)
+
+    job = manager.submit("spin", work)
+    assert started.wait(5)
+    other = JobManager(str(tmp_path / "jobs"), workers=1)
+    assert other.cancel(job.id)["cancel_requested"] is True
+    assert manager.wait(job.id)["status"] == "cancelled"
+
+
+def test_failed_job_and_queue_limit(tmp_path):
+    manager = JobManager(str(tmp_path / "jobs"), workers=1, max_queued=1)
+    gate = threading.Event()
+    running = threading.Event()
+
+    def boom(job):
+        raise ValueError("nope")
+
+    def block(job):
+        running.set()
+        gate.wait(5)
+
+    blocker = manager.submit("block", block)
+    assert running.wait(5)
+    queued = manager.submit("boom", boom)
+    with pytest.raises(JobQueueFull):
+        manager.submit("boom", boom)
+    gate.set()
+    assert manager.wait(blocker.id)["status"] == "done"
+    state = manager.wait(queued.id)
+    assert state["status"] == "failed"
+    assert state["error"] == "nope"
+
+
+def _wait(client, url):
+    state = client.get(url).get_json()
+    deadline = time.time() + 5
+    while state["status"] not in ("done", "failed", "cancelled") and time.time() < deadline:
+        time.sleep(0.02)
+        state = client.get(url).get_json()
+    return state
+
+
+def test_recursive_delete_runs_as_job(app_client, uploads):
+    client = app_client()
+    tree = uploads / "big" / "sub"
+    tree.mkdir(parents=True)
+    for i in range(5):
+        (tree / f"f{i}").write_bytes(b"x" * 100)
+
+    resp = client.post("/api/delete", json={"path": "big", "recursive": True})
+    assert resp.status_code == 202
+    body = resp.get_json()
+    state = _wait(client, body["status_url"])
+    assert state["status"] == "done"
+    assert state["kind"] == "delete"
+    assert state["result"] == {"deleted_files": 5, "deleted_bytes": 500}
+    assert not (uploads / "big").exists()
+
+    listed = client.get("/api/jobs").get_json()["jobs"]
+    assert any(j["id"] == body["job_id"] for j in listed)
+    assert client.get("/api/jobs/" + "0" * 32).status_code == 404
+    # Cancelling a finished job is a no-op
+    assert client.post(f"/api/jobs/{body['job_id']}/cancel").get_json()["status"] == "done"
+
+
+def test_recursive_delete_of_symlink_keeps_target(app_client, uploads, tmp_path):
+    client = app_client()
+    outside = tmp_path / "outside"
+    (outside / "sub").mkdir(parents=True)
+    (outside / "a.txt").write_text("a")
+    (outside / "sub" / "b.txt").write_text("b")
+    (uploads / "link").symlink_to(outside, target_is_directory=True)
+
+    resp = client.post("/api/delete", json={"path": "link", "recursive": True})
+    assert resp.status_code == 200
+    assert not os.path.lexists(uploads / "link")
+    assert (outside / "a.txt").exists() and (outside / "sub" / "b.txt").exists()
+
+    # Called directly (e.g. from a batch), the job also only unlinks
+    from app.fileops import delete_tree
+
+    (uploads / "link").symlink_to(outside, target_is_directory=True)
+    manager = JobManager(str(tmp_path / "jobs"), workers=1)
+    job = manager.submit("delete", lambda job: delete_tree(job, str(uploads / "link")), {})
+    assert manager.wait(job.id)["status"] == "done"
+    assert not os.path.lexists(uploads / "link")
+    assert (outside / "sub" / "b.txt").exists()
+
+
+def test_cross_device_rename_moves_in_background(app_client, uploads, monkeypatch):
+    client = app_client()
+    (uploads / "src" / "inner").mkdir(parents=True)
+    (uploads / "src" / "inner" / "a.txt").write_text("hello")
+    real_rename = os.rename
+
+    def fake_rename(a, b):
+        if str(a).startswith(str(uploads)):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        return real_rename(a, b)
+
+    monkeypatch.setattr(os, "rename", fake_rename)
+    resp = client.post("/api/rename", json={"old_path": "src", "new_path": "other/dst"})
+    assert resp.status_code == 202
+    state = _wait(client, resp.get_json()["status_url"])
+    assert state["status"] == "done"
+    assert state["result"]["copied"] is True
+    assert (uploads / "other" / "dst" / "inner" / "a.txt").read_text() == "hello"
+    assert not (uploads / "src").exists()
+
+
+def test_job_routes_require_admin(app_client, monkeypatch):
+    import app.files as files_mod
+
+    client = app_client()
+    monkeypatch.setattr(files_mod, "get_user_role", lambda user: "viewer")
+    with client.session_transaction() as sess:
+        sess["user"] = "bob"
+    assert client.get("/api/jobs").status_code == 403
+    assert client.get("/api/jobs/" + "0" * 32).status_code == 403
+    assert client.post("/api/jobs/" + "0" * 32 + "/cancel").status_code == 403
@@ -25,3 +25,20 @@ def test_get_history_aggregation(monkeypatch):
     assert hist[0]["cpu_usage"] == 15.0
     assert hist[0]["ram_usage"] == 35.0
     assert hist[0]["disk_usage"] == 10.0
+
+
+def test_forked_workers_get_their_own_epoch():
+    import os
+
+    b = MetricsBuffer(sample_interval=1, max_seconds=60)
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # A worker forked from a preloaded app
+        os.write(write, b.epoch.encode())
+        os._exit(0)
+    os.waitpid(pid, 0)
+    os.close(write)
+    child_epoch = os.read(read, 100).decode()
+    os.close(read)
+    assert child_epoch and child_epoch != b.epoch
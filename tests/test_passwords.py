@@ -0,0 +1,127 @@
+import json
+import threading
+
+import pytest
+
+from app import create_app, passwords
+from app.auth import create_user
+from app.fsutil import SlotFiles
+from app.passwords import PasswordVerifier, VerifierBusy, needs_rehash, normalize_method
+
+
+def test_normalize_method_spells_out_defaults():
+    assert normalize_method("pbkdf2") == passwords.DEFAULT_METHOD
+    assert normalize_method("pbkdf2:sha512") == f"pbkdf2:sha512:{passwords.DEFAULT_PBKDF2_ITERATIONS}"
+    assert normalize_method("scrypt") == "scrypt:32768:8:1"
+    assert normalize_method("scrypt:16384") == "scrypt:16384:8:1"
+    assert not needs_rehash("pbkdf2:sha256:1000$salt$hash", "pbkdf2:sha256:1000")
+    assert needs_rehash("pbkdf2:sha256:1000$salt$hash", "pbkdf2:sha256:2000")
+
+
+def test_verifier_rejects_when_saturated(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_check(stored, password, method):
+        started.set()
+        release.wait(5)
+        return True, None
+
+    monkeypatch.setattr(passwords, "_check", slow_check)
+    verifier = PasswordVerifier(workers=1, max_pending=0)
+    t = threading.Thread(target=verifier.verify, args=("h", "pw"))
+    t.start()
+    assert started.wait(5)
+
+    with pytest.raises(VerifierBusy):
+        verifier.verify("h", "pw")
+
+    release.set()
+    t.join(5)
+    # The slot is free again once the running check finished
+    assert verifier.verify("h", "pw") == (True, None)
+
+
+def test_admission_is_shared_across_processes(tmp_path, monkeypatch):
+    import os
+
+    started, release = threading.Event(), threading.Event()
+
+    def slow_check(stored, password, method):
+        started.set()
+        release.wait(5)
+        return True, None
+
+    monkeypatch.setattr(passwords, "_check", slow_check)
+    slots = str(tmp_path / "slots")
+    # Two verifiers with the same slot directory stand in for two workers
+    first = PasswordVerifier(workers=1, max_pending=0, slots_dir=slots)
+    second = PasswordVerifier(workers=1, max_pending=0, slots_dir=slots)
+    t = threading.Thread(target=first.verify, args=("h", "pw"))
+    t.start()
+    assert started.wait(5)
+    with pytest.raises(VerifierBusy):
+        second.verify("h", "pw")
+    release.set()
+    t.join(5)
+    assert second.verify("h", "pw") == (True, None)
+
+    # A worker that dies holding a slot does not leak it
+    pid = os.fork()
+    if pid == 0:
+        first._slots.try_acquire()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert second.verify("h", "pw") == (True, None)
+
+
+def test_login_rehashes_outdated_hash(tmp_path, monkeypatch):
+    users_file = tmp_path / "users.json"
+    monkeypatch.setenv("USERS_FILE", str(users_file))
+    monkeypatch.setenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+    create_user("admin", "secret", role="admin")
+    assert json.loads(users_file.read_text())["admin"]["password_hash"].startswith("pbkdf2:sha256:1000$")
+
+    app = create_app(
+        {
+            "TESTING": True,
+            "UPLOAD_FOLDER": str(tmp_path),
+            "SECRET_KEY": "test",
+            "PASSWORD_HASH_METHOD": "pbkdf2:sha256:2000",
+        }
+    )
+    client = app.test_client()
+
+    resp = client.post("/login", data={"username": "admin", "password": "wrong"})
+    assert json.loads(users_file.read_text())["admin"]["password_hash"].startswith("pbkdf2:sha256:1000$")
+
+    resp = client.post("/login", data={"username": "admin", "password": "secret"})
+    assert resp.status_code == 302
+    stored = json.loads(users_file.read_text())["admin"]["password_hash"]
+    assert stored.startswith("pbkdf2:sha256:2000$")
+
+    client.get("/logout")
+    resp = client.post("/login", data={"username": "admin", "password": "secret"}, follow_redirects=True)
+    assert b"Logged in successfully" in resp.data
+
+
+def test_login_overload_returns_503(tmp_path, monkeypatch):
+    monkeypatch.setenv("USERS_FILE", str(tmp_path / "users.json"))
+    create_user("admin", "secret", role="admin")
+
+    cache = tmp_path / "cache"
+    app = create_app({
+        "TESTING": True,
+        "UPLOAD_FOLDER": str(tmp_path),
+        "SECRET_KEY": "test",
+        "CACHE_FOLDER": str(cache),
+        "PASSWORD_VERIFY_WORKERS": 1,
+        "PASSWORD_VERIFY_QUEUE": 0,
+    })
+    # The only slot is held by a check running in another worker
+    release = SlotFiles(str(cache / "password-slots"), 1).try_acquire()
+    assert release is not None
+    resp = app.test_client().post("/login", data={"username": "admin", "password": "secret"})
+    release()
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"
+    assert b"Too many login attempts" in resp.data
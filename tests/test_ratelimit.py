@@ -0,0 +1,159 @@
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from app import create_app
+from app.ratelimit import TokenBuckets, parse_rate, parse_rules
+
+
+def test_parse_rate_and_rules():
+    assert parse_rate("10/s") == (10.0, 10.0)
+    assert parse_rate("60/m:5") == (1.0, 5.0)
+    assert parse_rate("36 / hour") == (0.01, 36.0)
+    with pytest.raises(ValueError):
+        parse_rate("fast")
+    assert parse_rules("api_stats=5/s:20; files=1/s") == {"api_stats": "5/s:20", "files": "1/s"}
+    assert parse_rules({"files.api_list_files": 4}) == {"files.api_list_files": "4"}
+    assert parse_rules("") == {}
+
+
+def test_bucket_burst_then_refill(tmp_path):
+    buckets = TokenBuckets(str(tmp_path / "rl.bin"), slots=64)
+    now = 1000.0
+    assert [buckets.take("a", 1.0, 3, now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = buckets.take("a", 1.0, 3, now)
+    assert wait == pytest.approx(1.0)
+    # Other clients have their own bucket
+    assert buckets.take("b", 1.0, 3, now) == 0.0
+    assert buckets.take("a", 1.0, 3, now + 0.5) == pytest.approx(0.5)
+    assert buckets.take("a", 1.0, 3, now + 1.0) == 0.0
+
+
+def test_buckets_survive_reopen_and_recycle_slots(tmp_path):
+    path = str(tmp_path / "rl.bin")
+    TokenBuckets(path, slots=64).take("a", 0.001, 1, 1000.0)
+    # Another worker mapping the same file sees the empty bucket
+    assert TokenBuckets(path, slots=64).take("a", 0.001, 1, 1000.0) > 0
+
+    buckets = TokenBuckets(path, slots=64)
+    for i in range(1000):
+        buckets.take(f"client-{i}", 1.0, 1, 2000.0 + i)
+    # The table stays its fixed size and new clients are still admitted
+    assert buckets.take("late", 1.0, 1, 5000.0) == 0.0
+
+
+def _take_many(path, n, out):
+    buckets = TokenBuckets(path, slots=64)
+    out.put(sum(1 for _ in range(n) if buckets.take("shared", 0.000001, 100) == 0.0))
+
+
+def test_buckets_shared_across_processes(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    path = str(tmp_path / "rl.bin")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_take_many, args=(path, 60, out)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    allowed = sum(out.get(timeout=20) for _ in procs)
+    for p in procs:
+        p.join(20)
+    assert allowed == 100
+
+
+def _app(tmp_path, monkeypatch, **config):
+    monkeypatch.setenv("SETUP_CONFIG_FILE", str(tmp_path / "setup_config.json"))
+    return create_app(
+        {
+            "UPLOAD_FOLDER": str(tmp_path / "files"),
+            "CACHE_FOLDER": str(tmp_path / "cache"),
+            "SECRET_KEY": "test",
+            "RATE_LIMITS": {},
+            "CONCURRENCY_LIMITS": {},
+            **config,
+        }
+    )
+
+
+def test_rate_limited_route_returns_429(tmp_path, monkeypatch):
+    app = _app(tmp_path, monkeypatch, RATE_LIMITS={"health_check": "1/m:2"})
+    client = app.test_client()
+    assert client.get("/health").status_code == 200
+    assert client.get("/health").status_code == 200
+    resp = client.get("/health")
+    assert resp.status_code == 429
+    assert 1 <= int(resp.headers["Retry-After"]) <= 60
+
+    # Keyed per client: a logged-in user has a separate bucket
+    with client.session_transaction() as sess:
+        sess["user"] = "alice"
+    assert client.get("/health").status_code == 200
+    # Unlisted routes are not limited
+    assert app.test_client().get("/api/jobs").status_code != 429
+
+
+def test_concurrency_cap_returns_429(tmp_path, monkeypatch):
+    app = _app(tmp_path, monkeypatch, CONCURRENCY_LIMITS={"health_check": "1"})
+    entered, release = threading.Event(), threading.Event()
+    view = app.view_functions["health_check"]
+
+    def slow_health():
+        entered.set()
+        release.wait(5)
+        return view()
+
+    app.view_functions["health_check"] = slow_health
+    results = []
+    # buffered: the body is consumed and closed, like a WSGI server does
+    t = threading.Thread(target=lambda: results.append(app.test_client().get("/health", buffered=True).status_code))
+    t.start()
+    assert entered.wait(5)
+
+    resp = app.test_client().get("/health")
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "1"
+
+    release.set()
+    t.join(5)
+    assert results == [200]
+    assert app.test_client().get("/health", buffered=True).status_code == 200
+
+
+def test_limits_off_when_testing(tmp_path, monkeypatch):
+    app = _app(tmp_path, monkeypatch, TESTING=True, RATE_LIMITS={"health_check": "1/m:1"})
+    client = app.test_client()
+    assert [client.get("/health").status_code for _ in range(3)] == [200, 200, 200]
+
+
+def test_concurrency_cap_held_while_streaming(tmp_path, monkeypatch):
+    app = _app(tmp_path, monkeypatch, CONCURRENCY_LIMITS={"files.download_folder": "1"})
+    big = tmp_path / "files" / "big"
+    big.mkdir(parents=True)
+    for i in range(4):
+        (big / f"f{i}.bin").write_bytes(os.urandom(256 * 1024))
+
+    first = app.test_client().get("/download-zip/big", buffered=False)
+    assert first.status_code == 200
+    next(first.response)
+    # The first archive is still streaming after its view returned
+    assert app.test_client().get("/download-zip/big", buffered=True).status_code == 429
+
+    # Released once the server closes the finished body
+    first.close()
+    assert app.test_client().get("/download-zip/big", buffered=True).status_code == 200
+    assert app.test_client().get("/download-zip/big", buffered=True).status_code == 200
+
+
+def test_concurrency_cap_is_shared_by_workers(tmp_path, monkeypatch):
+    # Two app instances with one CACHE_FOLDER stand in for two gunicorn workers
+    workers = [_app(tmp_path, monkeypatch, CONCURRENCY_LIMITS={"files.download_folder": "1"}) for _ in range(2)]
+    big = tmp_path / "files" / "big"
+    big.mkdir(parents=True)
+    (big / "f.bin").write_bytes(os.urandom(256 * 1024))
+
+    first = workers[0].test_client().get("/download-zip/big", buffered=False)
+    next(first.response)
+    assert workers[1].test_client().get("/download-zip/big", buffered=True).status_code == 429
+    first.close()
+    assert workers[1].test_client().get("/download-zip/big", buffered=True).status_code == 200
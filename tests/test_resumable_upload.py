@@ -0,0 +1,99 @@
+import fcntl
+import io
+import os
+
+import pytest
+
+from app.uploads import SESSIONS_DIRNAME, UploadError, UploadSessions
+
+
+def test_chunked_upload_resume_and_complete(app_client, uploads):
+    # Chunks are per-request, so the per-request limit no longer caps file size
+    client = app_client(MAX_CONTENT_LENGTH=64)
+    payload = b"0123456789" * 15
+
+    resp = client.post("/api/upload/session", json={"path": "docs", "filename": "big.txt", "size": len(payload)})
+    assert resp.status_code == 201
+    session = resp.get_json()
+    assert session["offset"] == 0
+    assert session["chunk_size"] == 64
+    sid = session["id"]
+
+    resp = client.put(f"/api/upload/session/{sid}?offset=0", data=payload[:64])
+    assert resp.get_json()["offset"] == 64
+
+    # A retried chunk with a stale offset is rejected with the real offset
+    resp = client.put(f"/api/upload/session/{sid}?offset=0", data=payload[:64])
+    assert resp.status_code == 409
+    assert resp.get_json()["offset"] == 64
+
+    # Completing early is refused
+    assert client.post(f"/api/upload/session/{sid}/complete").status_code == 409
+
+    assert client.get(f"/api/upload/session/{sid}").get_json()["offset"] == 64
+    client.put(f"/api/upload/session/{sid}?offset=64", data=payload[64:128])
+    client.put(f"/api/upload/session/{sid}?offset=128", data=payload[128:])
+
+    resp = client.post(f"/api/upload/session/{sid}/complete")
+    assert resp.status_code == 200
+    assert (uploads / "docs" / "big.txt").read_bytes() == payload
+    assert os.listdir(uploads / SESSIONS_DIRNAME) == []
+    assert client.get(f"/api/upload/session/{sid}").status_code == 404
+
+
+def test_chunk_beyond_declared_size_is_rejected(app_client, uploads):
+    client = app_client()
+    sid = client.post("/api/upload/session", json={"filename": "a.txt", "size": 3}).get_json()["id"]
+    resp = client.put(f"/api/upload/session/{sid}?offset=0", data=b"abcdef")
+    assert resp.status_code == 400
+    assert client.get(f"/api/upload/session/{sid}").get_json()["offset"] == 0
+
+
+def test_session_validation_and_listing(app_client, uploads, monkeypatch):
+    monkeypatch.setenv("ALLOWED_EXTENSIONS", "txt")
+    client = app_client()
+    assert client.post("/api/upload/session", json={"filename": "x.exe"}).status_code == 400
+    assert client.post("/api/upload/session", json={"filename": "../.txt"}).status_code == 400
+    assert client.post("/api/upload/session", json={"filename": "x.txt", "path": "../.."}).status_code == 400
+    assert client.get("/api/upload/session/../../etc").status_code == 404
+    assert client.get("/api/upload/session/nothex").status_code == 400
+
+    sid = client.post("/api/upload/session", json={"filename": "x.txt"}).get_json()["id"]
+    names = [e["name"] for e in client.get("/api/files").get_json()["entries"]]
+    assert SESSIONS_DIRNAME not in names
+    assert client.delete(f"/api/upload/session/{sid}").status_code == 200
+    assert client.get(f"/api/upload/session/{sid}").status_code == 404
+
+
+def test_sessions_belong_to_their_creator(app_client, uploads):
+    client = app_client()
+    with client.session_transaction() as sess:
+        sess["user"] = "alice"
+    sid = client.post("/api/upload/session", json={"filename": "a.txt", "size": 3}).get_json()["id"]
+
+    with client.session_transaction() as sess:
+        sess["user"] = "mallory"
+    assert client.get(f"/api/upload/session/{sid}").status_code == 403
+    assert client.put(f"/api/upload/session/{sid}?offset=0", data=b"abc").status_code == 403
+    assert client.post(f"/api/upload/session/{sid}/complete").status_code == 403
+    assert client.delete(f"/api/upload/session/{sid}").status_code == 403
+
+    with client.session_transaction() as sess:
+        sess["user"] = "alice"
+    assert client.put(f"/api/upload/session/{sid}?offset=0", data=b"abc").get_json()["offset"] == 3
+    assert client.post(f"/api/upload/session/{sid}/complete").status_code == 200
+    assert (uploads / "a.txt").read_bytes() == b"abc"
+
+
+def test_complete_waits_for_chunk_in_progress(uploads):
+    sessions = UploadSessions(str(uploads))
+    sid = sessions.create(str(uploads), "a.txt")["id"]
+    sessions.append(sid, 0, io.BytesIO(b"abc"))
+    with open(uploads / SESSIONS_DIRNAME / f"{sid}.part", "ab") as fh:
+        # Held by a request still writing a chunk
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        with pytest.raises(UploadError) as err:
+            sessions.complete(sid)
+        assert err.value.status == 409
+    assert sessions.complete(sid)["size"] == 3
+    assert (uploads / "a.txt").read_bytes() == b"abc"
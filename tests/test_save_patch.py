@@ -0,0 +1,96 @@
+def test_ranged_edits_against_version(app_client, uploads):
+    (uploads / "conf.txt").write_bytes("héllo 😀 world\r\nsecond\r\n".encode("utf-8"))
+    client = app_client()
+    data = client.get("/api/file/conf.txt").get_json()
+    content, version = data["content"], data["version"]
+    assert content == "héllo 😀 world\r\nsecond\r\n"
+
+    # Offsets are JavaScript (UTF-16) indices: the emoji counts as two
+    start = content.index("world") + 1  # one extra unit for the surrogate pair
+    resp = client.post("/api/save", json={
+        "path": "conf.txt",
+        "version": version,
+        "edits": [{"start": start, "end": start + 5, "text": "there"}, {"start": 0, "end": 1, "text": "H"}],
+    })
+    assert resp.status_code == 200
+    assert (uploads / "conf.txt").read_bytes() == "Héllo 😀 there\r\nsecond\r\n".encode("utf-8")
+    new_version = resp.get_json()["version"]
+    assert new_version != version
+
+    # Saving against the old version is rejected
+    resp = client.post("/api/save", json={"path": "conf.txt", "version": version, "content": "x"})
+    assert resp.status_code == 409
+    assert resp.get_json()["version"] == new_version
+    assert (uploads / "conf.txt").read_bytes().startswith("Héllo".encode("utf-8"))
+
+
+def test_invalid_edits_are_rejected(app_client, uploads):
+    (uploads / "a.txt").write_text("abcdef")
+    client = app_client()
+    version = client.get("/api/file/a.txt").get_json()["version"]
+    for edits in ([{"start": 2, "end": 99, "text": ""}], [{"start": 0, "end": 3}, {"start": 2, "end": 4}], [{"end": 1}]):
+        resp = client.post("/api/save", json={"path": "a.txt", "version": version, "edits": edits})
+        assert resp.status_code == 400
+    assert (uploads / "a.txt").read_text() == "abcdef"
+
+    (uploads / "bin.txt").write_bytes(b"\xff\xfe")
+    version = client.get("/api/file/bin.txt").get_json()["version"]
+    resp = client.post("/api/save", json={"path": "bin.txt", "version": version, "edits": [{"start": 0, "end": 0, "text": "x"}]})
+    assert resp.status_code == 422
+
+
+def test_full_content_save_is_atomic_and_keeps_mode(app_client, uploads):
+    target = uploads / "run.sh"
+    target.write_text("old")
+    target.chmod(0o750)
+    client = app_client()
+    resp = client.post("/api/save", json={"path": "run.sh", "content": "new"})
+    assert resp.status_code == 200
+    assert target.read_text() == "new"
+    assert target.stat().st_mode & 0o777 == 0o750
+    assert sorted(p.name for p in uploads.iterdir()) == ["run.sh"]
+
+
+def test_edits_require_version_and_saves_follow_symlinks(app_client, uploads):
+    (uploads / "real.txt").write_text("abc")
+    (uploads / "link.txt").symlink_to("real.txt")
+    client = app_client()
+    resp = client.post("/api/save", json={"path": "link.txt", "edits": [{"start": 0, "end": 1, "text": "A"}]})
+    assert resp.status_code == 400
+
+    version = client.get("/api/file/link.txt").get_json()["version"]
+    resp = client.post("/api/save", json={"path": "link.txt", "version": version, "edits": [{"start": 0, "end": 1, "text": "A"}]})
+    assert resp.status_code == 200
+    assert (uploads / "link.txt").is_symlink()
+    assert (uploads / "real.txt").read_text() == "Abc"
+
+    # Same size, possibly within the same mtime tick: still a new version
+    assert client.post("/api/save", json={"path": "real.txt", "content": "xyz"}).status_code == 200
+    resp = client.post("/api/save", json={"path": "real.txt", "version": resp.get_json()["version"], "content": "q"})
+    assert resp.status_code == 409
+
+    # A link that leaves storage is refused
+    outside = uploads.parent / "outside.txt"
+    outside.write_text("keep")
+    (uploads / "escape.txt").symlink_to(outside)
+    assert client.post("/api/save", json={"path": "escape.txt", "content": "x"}).status_code == 400
+    assert outside.read_text() == "keep"
+
+
+def test_concurrent_saves_of_one_version(app_client, uploads):
+    import threading
+
+    (uploads / "c.txt").write_text("0")
+    client = app_client()
+    version = client.get("/api/file/c.txt").get_json()["version"]
+    codes = []
+
+    def save(text):
+        codes.append(client.post("/api/save", json={"path": "c.txt", "version": version, "content": text}).status_code)
+
+    threads = [threading.Thread(target=save, args=(f"v{i}",)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(codes) == [200] + [409] * 7
@@ -0,0 +1,81 @@
+import json
+import os
+
+from app import fsutil
+from app.setup import load_setup, save_setup
+
+
+def _count_parses(monkeypatch):
+    calls = []
+    real = fsutil.json.load
+
+    def counting(fh):
+        calls.append(fh.name)
+        return real(fh)
+
+    monkeypatch.setattr(fsutil.json, "load", counting)
+    return calls
+
+
+def test_load_setup_parses_once_until_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "setup_config.json"
+    path.write_text(json.dumps({"quick_links": [], "storage_root": "/a"}))
+    monkeypatch.setenv("SETUP_CONFIG_FILE", str(path))
+    calls = _count_parses(monkeypatch)
+
+    assert load_setup()["storage_root"] == "/a"
+    assert load_setup()["storage_root"] == "/a"
+    assert len(calls) == 1
+
+    # Another process rewrites the file (as another worker's save would)
+    other = tmp_path / "other.json"
+    other.write_text(json.dumps({"storage_root": "/b"}))
+    os.replace(other, path)
+    assert load_setup()["storage_root"] == "/b"
+    assert len(calls) == 2
+
+    # Edited in place: same inode, different mtime/size
+    path.write_text(json.dumps({"storage_root": "/ccc"}))
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert load_setup()["storage_root"] == "/ccc"
+
+
+def test_load_setup_returns_private_copies(tmp_path, monkeypatch):
+    path = tmp_path / "setup_config.json"
+    path.write_text(json.dumps({"quick_links": [{"name": "a"}]}))
+    monkeypatch.setenv("SETUP_CONFIG_FILE", str(path))
+
+    cfg = load_setup()
+    cfg["quick_links"].append({"name": "b"})
+    assert load_setup() == {"quick_links": [{"name": "a"}]}
+
+
+def test_save_setup_replaces_file_atomically(tmp_path, monkeypatch):
+    path = tmp_path / "setup_config.json"
+    path.write_text(json.dumps({"quick_links": []}))
+    os.chmod(path, 0o640)
+    monkeypatch.setenv("SETUP_CONFIG_FILE", str(path))
+    before = os.stat(path).st_ino
+
+    save_setup({"quick_links": [], "upload_folder": "/x"})
+
+    st = os.stat(path)
+    assert st.st_ino != before
+    assert st.st_mode & 0o777 == 0o640
+    assert json.loads(path.read_text())["upload_folder"] == "/x"
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
+    assert load_setup()["upload_folder"] == "/x"
+
+
+def test_unparsable_file_keeps_last_good_config(tmp_path, monkeypatch):
+    path = tmp_path / "setup_config.json"
+    monkeypatch.setenv("SETUP_CONFIG_FILE", str(path))
+    assert load_setup() == {}
+
+    save_setup({"storage_root": "/a"})
+    path.write_text('{"storage_root": ')
+    assert load_setup() == {"storage_root": "/a"}
+
+    os.remove(path)
+    assert load_setup() == {}
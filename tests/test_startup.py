@@ -0,0 +1,102 @@
+import json
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Budgets for `import app` in a fresh interpreter; generous compared to a
+# desktop (about 0.2s and 30MB) so slower CI machines pass
+IMPORT_SECONDS_BUDGET = 2.0
+IMPORT_RSS_MB_BUDGET = 64
+
+
+def _run(code, tmp_path, **env):
+    full_env = dict(
+        os.environ,
+        PYTHONPATH=PROJECT_ROOT,
+        SETUP_CONFIG_FILE=str(tmp_path / "setup_config.json"),
+        UPLOAD_FOLDER=str(tmp_path / "files"),
+        CACHE_FOLDER=str(tmp_path / "cache"),
+        **env,
+    )
+    full_env.pop("FLASK_ENV", None)
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=str(tmp_path), env=full_env, capture_output=True, text=True, timeout=60
+    )
+    assert out.returncode == 0, out.stderr
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_import_is_cheap_and_builds_nothing(tmp_path):
+    result = _run(
+        """
+import json, resource, sys, threading, time
+t = time.perf_counter()
+import app
+elapsed = time.perf_counter() - t
+print(json.dumps({
+    "seconds": elapsed,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy": [m for m in ("psutil", "prometheus_client", "flask_wtf") if m in sys.modules],
+    "built": app._default_app is not None,
+    "threads": [t.name for t in threading.enumerate()],
+}))
+""",
+        tmp_path,
+    )
+    assert result["heavy"] == []
+    assert result["built"] is False
+    assert "pidash-metrics-sampler" not in result["threads"]
+    assert not (tmp_path / "setup_config.json").exists()
+    assert result["seconds"] < IMPORT_SECONDS_BUDGET
+    assert result["rss_mb"] < IMPORT_RSS_MB_BUDGET
+
+
+def test_entry_point_builds_one_app_and_one_sampler(tmp_path):
+    result = _run(
+        """
+import json, threading
+import app as pkg
+from app import app
+import app as again
+from app import create_app
+create_app()
+print(json.dumps({
+    "same": app is pkg.app is again.get_app(),
+    "samplers": sum(t.name == "pidash-metrics-sampler" for t in threading.enumerate()),
+}))
+""",
+        tmp_path,
+        METRICS_SAMPLER_ENABLED="true",
+        METRICS_SAMPLE_INTERVAL="60",
+    )
+    assert result == {"same": True, "samplers": 1}
+
+
+def test_preloaded_app_starts_sampler_in_forked_worker(tmp_path):
+    # gunicorn --preload: the master builds the app, workers are forked
+    result = _run(
+        """
+import json, os, threading
+from app import app
+
+def samplers():
+    return sum(t.name == "pidash-metrics-sampler" for t in threading.enumerate())
+
+r, w = os.pipe()
+pid = os.fork()
+if pid == 0:
+    before = samplers()
+    status = app.test_client().get("/health").status_code
+    app.test_client().get("/health")
+    os.write(w, json.dumps([before, status, samplers()]).encode())
+    os._exit(0)
+os.waitpid(pid, 0)
+print(json.dumps({"master": samplers(), "worker": json.loads(os.read(r, 1024))}))
+""",
+        tmp_path,
+        METRICS_SAMPLER_ENABLED="true",
+        METRICS_SAMPLE_INTERVAL="60",
+    )
+    assert result == {"master": 1, "worker": [0, 200, 1]}
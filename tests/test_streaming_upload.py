@@ -0,0 +1,68 @@
+import errno
+import hashlib
+import io
+import os
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app import create_app
+from app.uploads import HashingTempFile, SESSIONS_DIRNAME
+
+
+def test_upload_streams_once_and_returns_checksum(tmp_path, monkeypatch):
+    app = create_app({"TESTING": True, "UPLOAD_FOLDER": str(tmp_path), "SECRET_KEY": "test"})
+    client = app.test_client()
+
+    def no_copy(*args, **kwargs):
+        raise AssertionError("upload must not be copied with FileStorage.save")
+
+    monkeypatch.setattr(FileStorage, "save", no_copy)
+
+    content = os.urandom(300 * 1024)
+    data = {"file": (io.BytesIO(content), "photo.jpg"), "path": "pics"}
+    resp = client.post("/api/upload", data=data, content_type="multipart/form-data")
+    assert resp.status_code == 200
+    result = resp.get_json()
+    assert result["sha256"] == hashlib.sha256(content).hexdigest()
+    assert result["size"] == len(content)
+    assert (tmp_path / "pics" / "photo.jpg").read_bytes() == content
+    assert os.listdir(tmp_path / SESSIONS_DIRNAME) == []
+
+
+def test_rejected_upload_leaves_no_temp_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("ALLOWED_EXTENSIONS", "txt")
+    app = create_app({"TESTING": True, "UPLOAD_FOLDER": str(tmp_path), "SECRET_KEY": "test"})
+    client = app.test_client()
+    data = {"file": (io.BytesIO(b"MZ"), "bad.exe")}
+    resp = client.post("/api/upload", data=data, content_type="multipart/form-data")
+    assert resp.status_code == 400
+    assert os.listdir(tmp_path / SESSIONS_DIRNAME) == []
+
+
+def test_commit_refuses_directory_and_copies_across_mounts(tmp_path, monkeypatch):
+    dest_dir = tmp_path / "taken"
+    dest_dir.mkdir()
+    part = HashingTempFile(str(tmp_path / "incoming"))
+    part.write(b"data")
+    with pytest.raises(OSError):
+        part.commit(str(dest_dir))
+    part.close()
+    assert os.listdir(dest_dir) == []
+    assert os.listdir(tmp_path / "incoming") == []
+
+    part = HashingTempFile(str(tmp_path / "incoming"))
+    part.write(b"data")
+    real_replace = os.replace
+
+    def cross_device(src, dst):
+        if src == part.name:
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", cross_device)
+    part.commit(str(tmp_path / "out.bin"))
+    part.close()
+    assert (tmp_path / "out.bin").read_bytes() == b"data"
+    assert os.listdir(tmp_path / "incoming") == []
+    assert sorted(os.listdir(tmp_path)) == ["incoming", "out.bin", "taken"]
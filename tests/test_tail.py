@@ -0,0 +1,74 @@
+import json
+
+from app import create_app
+from app.tail import FollowerRegistry, tail_lines
+
+
+def _events(resp):
+    """Yield parsed SSE events from a streamed test response."""
+    buf = ""
+    for chunk in resp.response:
+        buf += chunk.decode() if isinstance(chunk, bytes) else chunk
+        while "\n\n" in buf:
+            raw, buf = buf.split("\n\n", 1)
+            fields = dict(line.split(": ", 1) for line in raw.splitlines() if not line.startswith(":"))
+            if fields:
+                yield fields["event"], json.loads(fields["data"])
+
+
+def test_tail_lines_ignores_partial_line(tmp_path):
+    log = tmp_path / "a.log"
+    log.write_bytes(b"one\ntwo\nthree\npart")
+    lines, offset = tail_lines(str(log), 2)
+    assert lines == ["two", "three"]
+    assert offset == len(b"one\ntwo\nthree\n")
+
+
+def test_follower_shares_reader_and_handles_truncation(tmp_path):
+    log = tmp_path / "a.log"
+    log.write_bytes(b"a\n")
+    registry = FollowerRegistry()
+    first = registry.subscribe(str(log), 2, interval=60)
+    second = registry.subscribe(str(log), 2, interval=60)
+    follower = registry.get(str(log))
+    assert first.follower is second.follower is follower
+
+    with open(log, "ab") as fh:
+        fh.write(b"b\nc")
+    follower.poll_once()
+    for sub in (first, second):
+        assert sub.get(timeout=1) == {"event": "lines", "lines": ["b"], "offset": 4}
+
+    log.write_bytes(b"z\n")
+    follower.poll_once()
+    assert first.get(timeout=1) == {"event": "truncated", "offset": 0}
+    assert first.get(timeout=1)["lines"] == ["z"]
+
+    # A late subscriber resuming from an older offset catches up privately
+    late = registry.subscribe(str(log), 0, interval=60)
+    assert late.get(timeout=1)["lines"] == ["z"]
+    for sub in (first, second, late):
+        sub.close()
+
+
+def test_tail_endpoint_streams_tail_then_appends(tmp_path):
+    log = tmp_path / "app.log"
+    log.write_text("".join(f"l{i}\n" for i in range(10)))
+    app = create_app({"TESTING": True, "UPLOAD_FOLDER": str(tmp_path), "SECRET_KEY": "test", "TAIL_POLL_INTERVAL": 0.01})
+    client = app.test_client()
+
+    resp = client.get("/api/tail/app.log?lines=3&count=2", buffered=False)
+    assert resp.mimetype == "text/event-stream"
+    events = _events(resp)
+    name, data = next(events)
+    assert name == "lines"
+    assert data["lines"] == ["l7", "l8", "l9"]
+
+    with open(log, "a") as fh:
+        fh.write("new\n")
+    name, data = next(events)
+    assert data["lines"] == ["new"]
+    assert data["offset"] == log.stat().st_size
+    resp.close()
+
+    assert client.get("/api/tail/missing.log").status_code == 404
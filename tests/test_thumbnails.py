@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from app import create_app
+from app import thumbnails
+from app.thumbnails import ThumbnailCache, size_bucket
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _make_image(path, size=(800, 600), mode="RGB"):
+    Image.new(mode, size, (200, 10, 10) if mode == "RGB" else (200, 10, 10, 128)).save(path)
+
+
+def test_size_buckets():
+    assert size_bucket(10) == 64
+    assert size_bucket(200) == 256
+    assert size_bucket(5000) == 1024
+
+
+def test_thumbnail_endpoint_caches_and_sets_headers(tmp_path):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    _make_image(uploads / "photo.jpg")
+    app = create_app({"TESTING": True, "UPLOAD_FOLDER": str(uploads), "SECRET_KEY": "test", "CACHE_FOLDER": str(tmp_path / "cache")})
+    client = app.test_client()
+
+    resp = client.get("/api/thumb/photo.jpg?size=200&v=123")
+    assert resp.status_code == 200
+    assert resp.mimetype == "image/jpeg"
+    assert "immutable" in resp.headers["Cache-Control"]
+    with Image.open(__import__("io").BytesIO(resp.data)) as img:
+        assert max(img.size) == 256
+
+    etag = resp.headers["ETag"]
+    resp = client.get("/api/thumb/photo.jpg?size=200", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+
+    # Changing the image produces a new cache key
+    _make_image(uploads / "photo.jpg", size=(100, 50))
+    os.utime(uploads / "photo.jpg", ns=(1, 10**18))
+    assert client.get("/api/thumb/photo.jpg?size=200").headers["ETag"] != etag
+
+    assert client.get("/api/thumb/notes.txt").status_code == 404
+    (uploads / "notes.txt").write_text("x")
+    assert client.get("/api/thumb/notes.txt").status_code == 400
+
+
+def test_lru_eviction_by_total_bytes(tmp_path):
+    for i in range(4):
+        _make_image(tmp_path / f"{i}.png", mode="RGBA")
+    cache = ThumbnailCache(str(tmp_path / "cache"), max_bytes=10**9, workers=1)
+    paths = [cache.get(str(tmp_path / f"{i}.png"), 512)[0] for i in range(4)]
+    one = os.path.getsize(paths[0])
+
+    # Touch the oldest so it becomes most recently used
+    os.utime(paths[0], (10**9 + 100, 10**9 + 100))
+    for p in paths[1:]:
+        os.utime(p, (10**9, 10**9))
+    cache.max_bytes = int(one * 2.5)
+    cache.evict()
+    remaining = [p for p in paths if os.path.exists(p)]
+    assert paths[0] in remaining
+    assert len(remaining) == 2
+
+
+def test_falls_back_to_original_without_pillow(tmp_path, monkeypatch):
+    _make_image(tmp_path / "p.jpg")
+    monkeypatch.setattr(thumbnails, "Image", None)
+    app = create_app({"TESTING": True, "UPLOAD_FOLDER": str(tmp_path), "SECRET_KEY": "test", "CACHE_FOLDER": str(tmp_path / "c")})
+    resp = app.test_client().get("/api/thumb/p.jpg")
+    assert resp.status_code == 200
+    assert resp.data == (tmp_path / "p.jpg").read_bytes()
@@ -0,0 +1,70 @@
+import json
+import os
+
+from app import create_app, fsutil
+from app.auth import create_user, get_user_role, load_users, save_users, verify_user
+
+
+def _replace_users(path, users):
+    tmp = path.with_name("users.new")
+    tmp.write_text(json.dumps(users))
+    os.replace(tmp, path)
+
+
+def test_users_parsed_once_until_file_changes(tmp_path, monkeypatch):
+    path = tmp_path / "users.json"
+    monkeypatch.setenv("USERS_FILE", str(path))
+    create_user("admin", "pw", role="admin")
+
+    calls = []
+    real = fsutil.json.load
+    monkeypatch.setattr(fsutil.json, "load", lambda fh: calls.append(1) or real(fh))
+
+    for _ in range(5):
+        assert get_user_role("admin") == "admin"
+        assert verify_user("admin", "pw")
+    assert calls == []
+
+    _replace_users(path, {"admin": {"password_hash": "", "role": "user"}})
+    assert get_user_role("admin") == "user"
+    assert len(calls) == 1
+
+
+def test_role_memoised_per_request(tmp_path, monkeypatch):
+    path = tmp_path / "users.json"
+    monkeypatch.setenv("USERS_FILE", str(path))
+    create_user("alice", "pw", role="admin")
+    app = create_app({"TESTING": True, "UPLOAD_FOLDER": str(tmp_path), "SECRET_KEY": "test"})
+
+    with app.test_request_context("/"):
+        assert get_user_role("alice") == "admin"
+        _replace_users(path, {"alice": {"password_hash": "", "role": "user"}})
+        # Same request: answered from the per-request memo
+        assert get_user_role("alice") == "admin"
+        assert get_user_role("nobody") is None
+
+    with app.test_request_context("/"):
+        assert get_user_role("alice") == "user"
+        # Saving within a request drops the memo
+        users = load_users()
+        users["alice"]["role"] = "admin"
+        save_users(users)
+        assert get_user_role("alice") == "admin"
+
+
+def test_save_users_is_atomic_and_copies_are_private(tmp_path, monkeypatch):
+    path = tmp_path / "users.json"
+    monkeypatch.setenv("USERS_FILE", str(path))
+    create_user("bob", "pw", role="user")
+    before = os.stat(path).st_ino
+
+    users = load_users()
+    users["bob"]["role"] = "admin"
+    # Not saved yet: the cache is unaffected by the caller's copy
+    assert get_user_role("bob") == "user"
+
+    save_users(users)
+    assert os.stat(path).st_ino != before
+    assert json.loads(path.read_text())["bob"]["role"] == "admin"
+    assert get_user_role("bob") == "admin"
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
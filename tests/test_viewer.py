@@ -0,0 +1,143 @@
+import os
+import threading
+
+from app import create_app
+from app.viewer import _HEADER, open_line_index, read_lines
+
+
+def _write_log(path, count):
+    with open(path, "w") as fh:
+        for i in range(count):
+            fh.write(f"line {i}\n")
+
+
+def test_line_index_lookup_and_append(tmp_path):
+    log = tmp_path / "app.log"
+    _write_log(log, 5000)
+    cache = str(tmp_path / "cache")
+
+    window = read_lines(str(log), 4000, 3, 64 * 1024, cache, index_threshold=0)
+    assert window["lines"] == ["line 4000", "line 4001", "line 4002"]
+    assert window["total_lines"] == 5000
+    assert window["next_line"] == 4003
+
+    # Appending extends the cached index instead of rebuilding it
+    with open(log, "a") as fh:
+        fh.write("line 5000\npartial")
+    with open_line_index(str(log), cache) as index:
+        assert index.line_count == 5002
+    window = read_lines(str(log), 5000, 10, 64 * 1024, cache, index_threshold=0)
+    assert window["lines"] == ["line 5000", "partial"]
+    assert window["eof"] is True
+
+
+def test_rewritten_file_rebuilds_index(tmp_path):
+    log = tmp_path / "a.txt"
+    log.write_text("aa\nbb\ncc\n")
+    cache = str(tmp_path / "cache")
+    assert read_lines(str(log), 1, 1, 1024, cache, 0)["lines"] == ["bb"]
+    log.write_text("x\ny\n")
+    assert read_lines(str(log), 1, 1, 1024, cache, 0)["lines"] == ["y"]
+    assert read_lines(str(log), 0, 10, 1024, cache, 0)["total_lines"] == 2
+
+
+def test_grown_rewrite_in_place_rebuilds_index(tmp_path):
+    log = tmp_path / "a.log"
+    log.write_text("aa\nbb\ncc\n")
+    cache = str(tmp_path / "cache")
+    assert read_lines(str(log), 0, 10, 1024, cache, 0)["total_lines"] == 3
+    ino = os.stat(log).st_ino
+    # Same inode, larger size, different line breaks before the old end
+    with open(log, "r+") as fh:
+        fh.write("a\nb\nc\nd\ne\nf\n")
+    assert os.stat(log).st_ino == ino
+    window = read_lines(str(log), 0, 10, 1024, cache, 0)
+    assert window["lines"] == ["a", "b", "c", "d", "e", "f"]
+
+
+def test_concurrent_extends_do_not_duplicate_offsets(tmp_path):
+    log = tmp_path / "app.log"
+    _write_log(log, 1000)
+    cache = str(tmp_path / "cache")
+    open_line_index(str(log), cache).close()
+    with open(log, "a") as fh:
+        for i in range(1000, 3000):
+            fh.write(f"line {i}\n")
+
+    errors = []
+
+    def view():
+        try:
+            with open_line_index(str(log), cache) as index:
+                assert index.line_count == 3000
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=view) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    assert errors == []
+    idx = os.path.join(cache, "lineindex", os.listdir(os.path.join(cache, "lineindex"))[0])
+    with open_line_index(str(log), cache) as index:
+        assert [index.line_start(i) for i in (0, 1, 2999)] == [0, 7, os.path.getsize(log) - 10]
+    assert os.path.getsize(idx) == _HEADER.size + 3000 * 8 + 8
+
+
+def test_concurrent_first_builds_in_one_process(tmp_path):
+    log = tmp_path / "app.log"
+    _write_log(log, 20000)
+    cache = str(tmp_path / "cache")
+    errors = []
+
+    def view():
+        try:
+            with open_line_index(str(log), cache) as index:
+                assert index.line_count == 20000
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=view) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    assert errors == []
+    assert [n for n in os.listdir(os.path.join(cache, "lineindex")) if n.endswith(".tmp")] == []
+
+
+def test_byte_cap_truncates_window(tmp_path):
+    log = tmp_path / "a.txt"
+    log.write_text("short\n" + "x" * 100 + "\nend\n")
+    for threshold in (0, 10**6):
+        window = read_lines(str(log), 0, 3, 20, str(tmp_path / "cache"), threshold)
+        assert window["truncated"] is True
+        assert window["lines"] == ["short"]
+
+
+def test_view_endpoint_and_large_file_guard(tmp_path):
+    _write_log(tmp_path / "big.log", 1000)
+    app = create_app({
+        "TESTING": True,
+        "UPLOAD_FOLDER": str(tmp_path),
+        "SECRET_KEY": "test",
+        "CACHE_FOLDER": str(tmp_path / "cache"),
+        "EDITOR_MAX_BYTES": 100,
+        "VIEWER_INDEX_THRESHOLD": 100,
+    })
+    client = app.test_client()
+
+    data = client.get("/api/file/big.log").get_json()
+    assert data["too_large"] is True
+    assert data["content"] == ""
+
+    data = client.get("/api/view/big.log?line=900&lines=2").get_json()
+    assert data["lines"] == ["line 900", "line 901"]
+
+    data = client.get("/api/view/big.log?offset=5&length=4").get_json()
+    assert data["content"] == "0\nli"
+    assert data["next_offset"] == 9
+
+    assert client.get("/api/view/big.log?line=abc").status_code == 400
+    assert client.get("/api/view/missing.log").status_code == 404
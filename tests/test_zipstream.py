@@ -0,0 +1,79 @@
+import io
+import os
+import zipfile
+
+from app import create_app
+from app.uploads import SESSIONS_DIRNAME
+from app.zipstream import iter_zip
+
+
+def _tree(root):
+    (root / "docs" / "empty").mkdir(parents=True)
+    (root / "docs" / "notes.txt").write_text("hello " * 1000)
+    (root / "photo.jpg").write_bytes(os.urandom(4096))
+    (root / SESSIONS_DIRNAME).mkdir()
+    (root / SESSIONS_DIRNAME / "partial").write_bytes(b"x")
+
+
+def test_iter_zip_contents_and_compression(tmp_path):
+    _tree(tmp_path)
+    data = b"".join(iter_zip(str(tmp_path), skip={SESSIONS_DIRNAME}))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        names = set(zf.namelist())
+        assert names == {"docs/empty/", "docs/notes.txt", "photo.jpg"}
+        assert zf.getinfo("photo.jpg").compress_type == zipfile.ZIP_STORED
+        notes = zf.getinfo("docs/notes.txt")
+        assert notes.compress_type == zipfile.ZIP_DEFLATED
+        assert notes.compress_size < notes.file_size
+        assert zf.read("docs/notes.txt") == b"hello " * 1000
+
+
+def test_iter_zip_keeps_files_older_than_1980(tmp_path):
+    (tmp_path / "old.txt").write_text("old")
+    (tmp_path / "new.txt").write_text("new")
+    old = 157766400  # 1975-01-01
+    os.utime(tmp_path / "old.txt", (old, old))
+    data = b"".join(iter_zip(str(tmp_path)))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        assert zf.read("old.txt") == b"old" and zf.read("new.txt") == b"new"
+        assert zf.getinfo("old.txt").date_time[0] == 1980
+
+
+def test_iter_zip_skips_symlinks(tmp_path):
+    outside = tmp_path / "outside.txt"
+    outside.write_text("secret")
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "a.txt").write_text("a")
+    os.symlink(outside, root / "link.txt")
+    data = b"".join(iter_zip(str(root)))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.namelist() == ["a.txt"]
+
+
+def test_download_zip_endpoint_streams(tmp_path):
+    _tree(tmp_path)
+    app = create_app({"TESTING": True, "UPLOAD_FOLDER": str(tmp_path), "SECRET_KEY": "test"})
+    client = app.test_client()
+
+    resp = client.get("/download-zip/docs")
+    assert resp.status_code == 200
+    assert resp.mimetype == "application/zip"
+    assert resp.is_streamed
+    assert "docs.zip" in resp.headers["Content-Disposition"]
+    with zipfile.ZipFile(io.BytesIO(resp.data)) as zf:
+        assert set(zf.namelist()) == {"empty/", "notes.txt"}
+
+    resp = client.get("/download-zip/")
+    with zipfile.ZipFile(io.BytesIO(resp.data)) as zf:
+        assert SESSIONS_DIRNAME + "/partial" not in zf.namelist()
+
+    # Folder download links redirect to the archive
+    resp = client.get("/download/docs")
+    assert resp.status_code == 302
+    assert resp.headers["Location"].endswith("/download-zip/docs")
+
+    assert client.get("/download-zip/missing").status_code == 404
+    assert client.get("/download-zip/../etc").status_code in (400, 404)